@@ -164,6 +164,7 @@ class MainPage(ctk.CTkFrame):
         self.controller = controller
         self.colors = self.controller.get_colors()
         super().__init__(parent, fg_color=self.colors["bg_light"])
+        self.token_cotacao = None  # token da cotação exibida na tela
 
         self.grid_columnconfigure(1, weight=1)
         self.grid_rowconfigure(1, weight=1)
@@ -302,7 +303,8 @@ class MainPage(ctk.CTkFrame):
         frame.grid_columnconfigure(0, weight=1)
         frame.grid_rowconfigure(0, weight=1)
         self.fig = Figure(figsize=(5, 4), dpi=100, facecolor=self.colors["frame"])
-        self.ax = self.fig.add_subplot(111)
+        self.ax = self.fig.add_subplot(211)
+        self.ax_mensal = self.fig.add_subplot(212)
         self.canvas = FigureCanvasTkAgg(self.fig, master=frame)
         self.canvas.get_tk_widget().pack(side=ctk.TOP, fill=ctk.BOTH, expand=True)
         return frame
@@ -330,20 +332,23 @@ class MainPage(ctk.CTkFrame):
         self.balance_label.configure(text=f"R$ {saldo:.2f}")
 
         # Dashboard
-        extrato, _ = bl.get_extrato(self.controller.current_user_cpf)
-        recent = "\n".join(extrato.strip().split("\n")[-10:])
+        extrato, _ = bl.get_extrato(self.controller.current_user_cpf, limite=10)
+        recent = extrato.strip()
         self.recent_transactions_text.delete("1.0", "end")
         self.recent_transactions_text.insert("1.0", recent if recent else "Nenhuma transação.")
 
+        # Uma única cotação para a tela toda; as negociações usam o token dela
+        self.token_cotacao, cotacao = bl.cotar(self.controller.current_user_cpf)
+
         # Investments
-        self.update_market_prices()
-        self.update_portfolio_display()
+        self.update_market_prices(cotacao.precos)
+        self.update_portfolio_display(cotacao.precos)
 
         # Analytics
-        self.update_analytics_chart()
+        self.update_analytics_chart(cotacao.precos)
 
-    def update_market_prices(self):
-        prices = bl.get_market_prices()
+    def update_market_prices(self, prices=None):
+        prices = prices or bl.get_market_prices()
         price_text = ""
         for cat, assets in prices.items():
             price_text += f"{cat.upper()}:\n"
@@ -351,12 +356,12 @@ class MainPage(ctk.CTkFrame):
                 price_text += f"  {asset}: R$ {price:.2f}\n"
         self.market_label.configure(text=price_text)
 
-    def update_portfolio_display(self):
+    def update_portfolio_display(self, prices=None):
         user_data = bl.get_user_data(self.controller.current_user_cpf)
         portfolio = user_data.get("portfolio", {})
         portfolio_text = ""
         total_value = 0
-        prices = bl.get_market_prices()
+        prices = prices or bl.get_market_prices()
         for cat, assets in portfolio.items():
             if assets:
                 portfolio_text += f"{cat.upper()}:\n"
@@ -368,14 +373,14 @@ class MainPage(ctk.CTkFrame):
         self.portfolio_text.delete("1.0", "end")
         self.portfolio_text.insert("1.0", portfolio_text if portfolio_text else "Nenhum ativo na carteira.")
 
-    def update_analytics_chart(self):
+    def update_analytics_chart(self, prices=None):
         user_data = bl.get_user_data(self.controller.current_user_cpf)
         if not user_data: return
 
         labels = ['Saldo em Conta']
         sizes = [user_data.get("saldo", 0)]
         portfolio_value = 0
-        prices = bl.get_market_prices()
+        prices = prices or bl.get_market_prices()
 
         for cat, assets in user_data.get("portfolio", {}).items():
             for asset, qty in assets.items():
@@ -394,9 +399,29 @@ class MainPage(ctk.CTkFrame):
             self.ax.text(0.5, 0.5, "Sem dados para exibir", ha='center', va='center', color=self.colors["text"])
         
         self.ax.axis('equal')
+        self.update_monthly_chart()
         self.fig.set_facecolor(self.colors["frame"])
         self.canvas.draw()
 
+    def update_monthly_chart(self):
+        # Lê os totais mensais já agregados em vez de percorrer o extrato
+        meses = bl.get_resumo_mensal(self.controller.current_user_cpf)[-6:]
+        self.ax_mensal.clear()
+        self.ax_mensal.set_facecolor(self.colors["frame"])
+        if not meses:
+            self.ax_mensal.axis('off')
+            return
+        self.ax_mensal.axis('on')
+        posicoes = range(len(meses))
+        entradas = [t["depositos"] + t["pix_recebidos"] + t["vendas"] + t["estornos"] for _, t in meses]
+        saidas = [t["saques"] + t["pix_enviados"] + t["compras"] for _, t in meses]
+        self.ax_mensal.bar([p - 0.2 for p in posicoes], entradas, width=0.4, label="Entradas", color=self.colors["success"])
+        self.ax_mensal.bar([p + 0.2 for p in posicoes], saidas, width=0.4, label="Saídas", color=self.colors["error"])
+        self.ax_mensal.set_xticks(list(posicoes))
+        self.ax_mensal.set_xticklabels([mes for mes, _ in meses], color=self.colors["text"])
+        self.ax_mensal.tick_params(colors=self.colors["text"])
+        self.ax_mensal.legend()
+
     def _handle_operation(self, func, entry, *args):
         try:
             val = float(entry.get())
@@ -422,7 +447,8 @@ class MainPage(ctk.CTkFrame):
             return
         try:
             quantity = float(quantity_str)
-            success, msg = trade_func(self.controller.current_user_cpf, cat, asset, quantity)
+            success, msg = trade_func(self.controller.current_user_cpf, cat, asset, quantity,
+                                      token_cotacao=self.token_cotacao)
             messagebox.showinfo("Sucesso" if success else "Erro", msg)
             if success:
                 self.asset_entry.delete(0, 'end')
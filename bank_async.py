@@ -0,0 +1,122 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Iterable, List, Optional, Set, Tuple
+
+import bank_logic as bl
+
+
+class AsyncBank:
+    """
+    Fachada assíncrona sobre bank_logic. As operações alteram as contas em
+    memória no próprio event loop (são rápidas) e a gravação em disco roda
+    num executor. Enquanto uma gravação está em andamento as operações
+    seguintes continuam sendo aplicadas; as contas que elas alteram são
+    acumuladas e gravadas juntas na gravação seguinte. Cada operação só
+    retorna depois que a gravação que a cobre terminou.
+    """
+
+    def __init__(self, executor: Optional[ThreadPoolExecutor] = None):
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="bank-async")
+        self._proprio_executor = executor is None
+        self._cpfs: Set[str] = set()
+        self._completo = False
+        self._proxima: Optional[asyncio.Future] = None
+        self._gravacao: Optional[asyncio.Task] = None
+
+    # --- Execução ---
+    async def _executar(self, funcao: Callable[..., Any], *args) -> Any:
+        with bl.persistencia_adiada() as adiamento:
+            resultado = funcao(*args)
+            cpfs, completo = adiamento.cpfs, adiamento.completo
+            adiamento.descartar()  # a gravação fica por conta de _gravar, fora do event loop
+        if not cpfs and not completo:
+            return resultado
+        sucesso, mensagem = await self._agendar(cpfs, completo)
+        return resultado if sucesso else (False, mensagem)
+
+    def _agendar(self, cpfs: Set[str], completo: bool) -> asyncio.Future:
+        self._cpfs.update(cpfs)
+        self._completo = self._completo or completo
+        if self._proxima is None:
+            self._proxima = asyncio.get_running_loop().create_future()
+        if self._gravacao is None or self._gravacao.done():
+            self._gravacao = asyncio.ensure_future(self._gravar())
+        return asyncio.shield(self._proxima)
+
+    async def _gravar(self):
+        loop = asyncio.get_running_loop()
+        while self._proxima is not None:
+            futuro, cpfs, completo = self._proxima, self._cpfs, self._completo
+            self._proxima, self._cpfs, self._completo = None, set(), False
+            try:
+                resultado = await loop.run_in_executor(
+                    self._executor, partial(bl.salvar_dados, *(() if completo else cpfs)))
+            except Exception as e:
+                resultado = (False, f"Erro ao salvar dados: {e}")
+            futuro.set_result(resultado)
+
+    async def fechar(self):
+        """Espera as gravações pendentes e encerra o executor próprio."""
+        if self._gravacao is not None:
+            await self._gravacao
+        if self._proprio_executor:
+            self._executor.shutdown(wait=True)
+
+    # --- Usuários ---
+    async def registrar_usuario(self, cpf: str, nome: str, email: str, telefone: str, senha: str,
+                                confirma_senha: str) -> Tuple[bool, str]:
+        return await self._executar(bl.registrar_usuario, cpf, nome, email, telefone, senha, confirma_senha)
+
+    async def login_user(self, cpf: str, senha: str) -> Tuple[bool, str, Optional[str]]:
+        return bl.login_user(cpf, senha)  # o login não grava
+
+    async def get_user_data(self, cpf: str):
+        return bl.get_user_data(cpf)
+
+    # --- Operações ---
+    async def depositar(self, usuario_cpf: str, valor: float,
+                        chave_idempotencia: Optional[str] = None) -> Tuple[bool, str]:
+        return await self._executar(bl.depositar, usuario_cpf, valor, chave_idempotencia)
+
+    async def sacar(self, usuario_cpf: str, valor: float, chave_idempotencia: Optional[str] = None) -> Tuple[bool, str]:
+        return await self._executar(bl.sacar, usuario_cpf, valor, chave_idempotencia)
+
+    async def pix(self, usuario_cpf: str, destino_cpf: str, valor: float,
+                  chave_idempotencia: Optional[str] = None) -> Tuple[bool, str]:
+        return await self._executar(bl.pix, usuario_cpf, destino_cpf, valor, chave_idempotencia)
+
+    async def comprar_investimento(self, usuario_cpf: str, categoria: str, ativo: str, quantidade: float,
+                                   chave_idempotencia: Optional[str] = None,
+                                   token_cotacao: Optional[str] = None) -> Tuple[bool, str]:
+        return await self._executar(bl.comprar_investimento, usuario_cpf, categoria, ativo, quantidade,
+                                    chave_idempotencia, token_cotacao)
+
+    async def vender_investimento(self, usuario_cpf: str, categoria: str, ativo: str, quantidade: float,
+                                  chave_idempotencia: Optional[str] = None,
+                                  token_cotacao: Optional[str] = None) -> Tuple[bool, str]:
+        return await self._executar(bl.vender_investimento, usuario_cpf, categoria, ativo, quantidade,
+                                    chave_idempotencia, token_cotacao)
+
+    async def executar_lote(self, operacoes: Iterable[tuple],
+                            tudo_ou_nada: bool = False) -> Tuple[bool, str, List[Tuple[bool, str]]]:
+        resultado = await self._executar(bl.executar_lote, operacoes, tudo_ou_nada)
+        return resultado if len(resultado) == 3 else (*resultado, [])
+
+    # --- Consultas (só leem memória, não esperam gravação) ---
+    async def get_extrato(self, usuario_cpf: str, limite: Optional[int] = None, offset: int = 0,
+                          cursor: Optional[int] = None) -> Tuple[str, float]:
+        return bl.get_extrato(usuario_cpf, limite, offset, cursor)
+
+    async def get_lancamentos(self, usuario_cpf: str, limite: Optional[int] = None, offset: int = 0,
+                              cursor: Optional[int] = None):
+        return bl.get_lancamentos(usuario_cpf, limite, offset, cursor)
+
+    async def get_market_prices(self):
+        return bl.get_market_prices()
+
+    async def get_cotacao(self, versao: Optional[int] = None):
+        return bl.get_cotacao(versao)
+
+    async def cotar(self, usuario_cpf: str):
+        return bl.cotar(usuario_cpf)
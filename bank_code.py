@@ -5,6 +5,9 @@ import os
 import re
 from typing import Dict, Any, Optional, Tuple
 
+from bank_cpf import validar_cpf
+from bank_ledger import Lancamento, renderizar_extrato
+
 # Constantes do sistema
 LIMITE_SAQUE = 500.0
 LIMITE_SAQUES_DIARIOS = 3
@@ -60,35 +63,6 @@ TZ = pytz.timezone("America/Sao_Paulo")
 DATA_FILE = "bank_data.json"
 
 
-def validar_cpf(cpf: str) -> bool:
-    """
-    Valida CPF usando algoritmo oficial brasileiro
-    """
-    # Remove caracteres não numéricos
-    cpf = re.sub(r'[^0-9]', '', cpf)
-    
-    # Verifica se tem 11 dígitos
-    if len(cpf) != 11:
-        return False
-    
-    # Verifica se todos os dígitos são iguais
-    if cpf == cpf[0] * 11:
-        return False
-    
-    # Calcula primeiro dígito verificador
-    soma = sum(int(cpf[i]) * (10 - i) for i in range(9))
-    resto = soma % 11
-    digito1 = 0 if resto < 2 else 11 - resto
-    
-    # Calcula segundo dígito verificador
-    soma = sum(int(cpf[i]) * (11 - i) for i in range(10))
-    resto = soma % 11
-    digito2 = 0 if resto < 2 else 11 - resto
-    
-    # Verifica se os dígitos calculados são iguais aos do CPF
-    return cpf[-2:] == f"{digito1}{digito2}"
-
-
 def validar_email(email: str) -> bool:
     """
     Valida formato de email
@@ -140,6 +114,10 @@ def carregar_dados():
             for cpf, user_data in dados_carregados.items():
                 if isinstance(user_data.get("data_contagem"), str):
                     user_data["data_contagem"] = date.fromisoformat(user_data["data_contagem"])
+                # Contas gravadas pelo bank_logic guardam o extrato como lançamentos
+                if "lancamentos" in user_data:
+                    lancamentos = (Lancamento(*lancamento) for lancamento in user_data.pop("lancamentos"))
+                    user_data["extrato"] = renderizar_extrato(lancamentos)
             
             users = dados_carregados
             print(f"{ICON_LOAD} Dados carregados com sucesso!")
@@ -0,0 +1,229 @@
+from array import array
+from collections.abc import MutableMapping
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+import math
+import numbers
+import sys
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+# Campos fixos de uma conta, na ordem em que são gravados no JSON
+CAMPOS_CONTA = ("senha", "saldo", "lancamentos", "numero_saques", "numero_transacoes_dia", "data_contagem",
+                "nome", "email", "telefone", "data_cadastro", "status", "portfolio")
+_CAMPOS = frozenset(CAMPOS_CONTA)
+
+# Quase todas as contas compartilham poucas datas de contagem (o dia de hoje,
+# ontem...), então cada data existe uma única vez em memória
+_datas: Dict[int, date] = {}
+
+
+def internar_data(valor: Any) -> Optional[date]:
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        valor = date.fromisoformat(valor)
+    return _datas.setdefault(valor.toordinal(), valor)
+
+def _internar(valor: Any) -> Any:
+    return sys.intern(valor) if isinstance(valor, str) else valor
+
+
+# --- Dinheiro em Centavos ---
+# Maior valor, em centavos, de uma operação ou de um saldo (R$ 10 trilhões): bem
+# abaixo do limite dos inteiros de 64 bits da coluna de saldos
+MAX_CENTAVOS = 10**15
+
+def para_centavos(valor: float, quantidade: float = 1) -> int:
+    """
+    Converte reais (vezes `quantidade`) em centavos inteiros, arredondando meio
+    centavo para cima. Levanta ValueError para valores não finitos (inf, nan) ou
+    acima de MAX_CENTAVOS, e TypeError para o que não é número (inclusive bool).
+    """
+    for numero in (valor, quantidade):
+        if isinstance(numero, bool) or not isinstance(numero, (numbers.Real, Decimal)):
+            raise TypeError(f"Não é um número: {numero!r}")
+    # Escalares do numpy e Decimal viram float: o repr deles não é um literal que o Decimal aceite
+    valor, quantidade = float(valor), float(quantidade)
+    if not (math.isfinite(valor) and math.isfinite(quantidade)):
+        raise ValueError(f"Valor não finito: {valor!r} x {quantidade!r}")
+    reais = Decimal(repr(valor)) if quantidade == 1 else Decimal(repr(valor)) * Decimal(repr(quantidade))
+    # Compara antes de quantizar: um expoente enorme (1e300) estouraria a precisão do Decimal
+    if abs(reais * 100) > MAX_CENTAVOS:
+        raise ValueError(f"Valor fora do limite: {valor!r} x {quantidade!r}")
+    return int((reais * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+class ColunaSaldos:
+    """
+    Saldos de todas as contas em memória, em centavos, num único array de
+    inteiros de 64 bits. Cada Conta ocupa uma posição (slot) enquanto existe;
+    posições liberadas ficam zeradas e são reaproveitadas, então somar o
+    array inteiro dá o total das contas carregadas.
+    """
+
+    def __init__(self):
+        self.valores = array('q')
+        self._livres: List[int] = []
+        self._lock = threading.Lock()
+
+    def alocar(self) -> int:
+        with self._lock:
+            if self._livres:
+                return self._livres.pop()
+            self.valores.append(0)
+            return len(self.valores) - 1
+
+    def liberar(self, slot: int):
+        with self._lock:
+            self.valores[slot] = 0
+            self._livres.append(slot)
+
+    def total_centavos(self) -> int:
+        return sum(self.valores)
+
+
+SALDOS = ColunaSaldos()
+
+
+class Conta(MutableMapping):
+    """
+    Conta de um usuário com um slot por campo, sem o dicionário de cada
+    instância. O saldo fica em centavos na coluna SALDOS (`saldo_centavos`);
+    `saldo` o expõe em reais. Os campos são lidos como atributos, mas a
+    conta também se comporta como o dicionário antigo (`conta["saldo"]`,
+    `conta.get(...)`, `dict(conta)`), então armazenamentos, interface e
+    bank_data.json continuam funcionando. Campos com valor None não existem
+    no mapeamento; chaves desconhecidas ficam em `extras`.
+    """
+    __slots__ = ("senha", "_slot", "lancamentos", "numero_saques", "numero_transacoes_dia", "_data_contagem",
+                 "nome", "email", "telefone", "data_cadastro", "status", "portfolio", "extras", "resumo")
+
+    def __init__(self, senha: Optional[str] = None, saldo: float = 0.0, lancamentos: Optional[list] = None,
+                 numero_saques: int = 0, numero_transacoes_dia: int = 0, data_contagem: Any = None,
+                 nome: Optional[str] = None, email: Optional[str] = None, telefone: Optional[str] = None,
+                 data_cadastro: Optional[str] = None, status: Optional[str] = None,
+                 portfolio: Optional[Dict[str, Dict[str, float]]] = None, extras: Optional[Dict[str, Any]] = None):
+        self.senha = senha
+        self._slot = SALDOS.alocar()
+        self.saldo = saldo
+        self.lancamentos = [] if lancamentos is None else lancamentos
+        self.numero_saques = numero_saques
+        self.numero_transacoes_dia = numero_transacoes_dia
+        self._data_contagem = internar_data(data_contagem)
+        self.nome = nome
+        self.email = email
+        self.telefone = telefone
+        self.data_cadastro = data_cadastro
+        self.status = _internar(status)
+        self.portfolio = {"cripto": {}, "acoes": {}} if portfolio is None else portfolio
+        self.extras = extras or None
+        # Totais do extrato (bank_ledger.ResumoLancamentos); só em memória, não é gravado
+        self.resumo = None
+
+    def __del__(self):
+        slot = getattr(self, "_slot", None)
+        if slot is not None:
+            SALDOS.liberar(slot)
+
+    def __reduce__(self):
+        # A posição na coluna só vale neste processo: a cópia aloca a sua
+        return Conta.de_dict, (self.para_dict(),)
+
+    @property
+    def saldo_centavos(self) -> int:
+        return SALDOS.valores[self._slot]
+
+    @saldo_centavos.setter
+    def saldo_centavos(self, centavos: int):
+        if abs(centavos) > MAX_CENTAVOS:
+            raise ValueError(f"Saldo fora do limite: {centavos} centavos")
+        SALDOS.valores[self._slot] = centavos
+
+    @property
+    def saldo(self) -> float:
+        return SALDOS.valores[self._slot] / 100
+
+    @saldo.setter
+    def saldo(self, valor: float):
+        SALDOS.valores[self._slot] = para_centavos(valor or 0)
+
+    @property
+    def data_contagem(self) -> Optional[date]:
+        return self._data_contagem
+
+    @data_contagem.setter
+    def data_contagem(self, valor: Any):
+        self._data_contagem = internar_data(valor)
+
+    @classmethod
+    def de_dict(cls, dados: Dict[str, Any]) -> "Conta":
+        extras = {chave: valor for chave, valor in dados.items() if chave not in _CAMPOS}
+        return cls(**{campo: dados[campo] for campo in CAMPOS_CONTA if campo in dados}, extras=extras)
+
+    def para_dict(self) -> Dict[str, Any]:
+        dados = {}
+        for campo in CAMPOS_CONTA:
+            valor = getattr(self, campo)
+            if valor is not None:
+                dados[campo] = valor
+        if self.extras:
+            dados.update(self.extras)
+        return dados
+
+    copy = para_dict
+
+    # --- Interface de dicionário ---
+    def __getitem__(self, chave: str) -> Any:
+        if chave in _CAMPOS:
+            valor = getattr(self, chave)
+            if valor is not None:
+                return valor
+        elif self.extras and chave in self.extras:
+            return self.extras[chave]
+        raise KeyError(chave)
+
+    def get(self, chave: str, padrao: Any = None) -> Any:
+        if chave in _CAMPOS:
+            valor = getattr(self, chave)
+            return padrao if valor is None else valor
+        return self.extras.get(chave, padrao) if self.extras else padrao
+
+    def __contains__(self, chave: object) -> bool:
+        if chave in _CAMPOS:
+            return getattr(self, chave) is not None
+        return bool(self.extras) and chave in self.extras
+
+    def __setitem__(self, chave: str, valor: Any):
+        if chave in _CAMPOS:
+            setattr(self, chave, _internar(valor) if chave == "status" else valor)
+        else:
+            if self.extras is None:
+                self.extras = {}
+            self.extras[chave] = valor
+
+    def __delitem__(self, chave: str):
+        if chave in _CAMPOS:
+            if getattr(self, chave) is None:
+                raise KeyError(chave)
+            setattr(self, chave, None)
+        elif self.extras and chave in self.extras:
+            del self.extras[chave]
+        else:
+            raise KeyError(chave)
+
+    def __iter__(self) -> Iterator[str]:
+        for campo in CAMPOS_CONTA:
+            if getattr(self, campo) is not None:
+                yield campo
+        if self.extras:
+            yield from list(self.extras)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __repr__(self) -> str:
+        return f"Conta({self.para_dict()!r})"
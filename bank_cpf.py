@@ -0,0 +1,77 @@
+from functools import lru_cache
+from operator import mul
+import re
+from typing import Iterable, List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy é opcional: sem ele a validação em massa usa o laço em Python
+    np = None
+
+_NAO_DIGITO = re.compile(r'[^0-9]')
+_PESOS_1 = (10, 9, 8, 7, 6, 5, 4, 3, 2)
+_PESOS_2 = (11, 10, 9, 8, 7, 6, 5, 4, 3, 2)
+# Quantos CPFs distintos ficam memorizados (destinos de PIX se repetem muito)
+TAMANHO_CACHE = 1 << 16
+# Só entradas com o tamanho de um CPF (com ou sem pontuação) vão para o cache:
+# uma string longa enviada pelo cliente não pode ficar presa nele
+TAMANHO_MAXIMO_CACHE = 14
+
+
+def _digito(soma: int) -> int:
+    resto = soma % 11
+    return 0 if resto < 2 else 11 - resto
+
+def validar_cpf_sem_cache(cpf: str) -> bool:
+    """Algoritmo oficial do CPF; aceita pontuação (123.456.789-09)."""
+    if len(cpf) != 11 or not cpf.isascii() or not cpf.isdigit():
+        cpf = _NAO_DIGITO.sub('', cpf)
+        if len(cpf) != 11:
+            return False
+    if cpf == cpf[0] * 11:
+        return False
+    digitos = [ord(c) - 48 for c in cpf]
+    digito1 = _digito(sum(map(mul, digitos, _PESOS_1)))
+    digito2 = _digito(sum(map(mul, digitos, _PESOS_2)))
+    return digitos[9] == digito1 and digitos[10] == digito2
+
+_validar_cpf_em_cache = lru_cache(maxsize=TAMANHO_CACHE)(validar_cpf_sem_cache)
+
+def validar_cpf(cpf: str) -> bool:
+    if len(cpf) > TAMANHO_MAXIMO_CACHE:
+        return validar_cpf_sem_cache(cpf)
+    return _validar_cpf_em_cache(cpf)
+
+validar_cpf.cache_info = _validar_cpf_em_cache.cache_info
+validar_cpf.cache_clear = _validar_cpf_em_cache.cache_clear
+
+
+def validar_cpfs(cpfs: Iterable[str]) -> Sequence[bool]:
+    """
+    Valida muitos CPFs de uma vez. Com numpy os dígitos de todos os CPFs
+    viram uma matriz N x 11 e os dígitos verificadores são calculados de uma
+    só vez (retorna um array de bool); sem numpy retorna uma lista.
+    Não passa pelo cache de validar_cpf.
+    """
+    cpfs = list(cpfs)
+    if np is None:
+        return [validar_cpf_sem_cache(cpf) for cpf in cpfs]
+    normalizados: List[str] = []
+    tamanho_ok = np.ones(len(cpfs), dtype=bool)
+    for posicao, cpf in enumerate(cpfs):
+        if len(cpf) != 11 or not cpf.isascii() or not cpf.isdigit():
+            cpf = _NAO_DIGITO.sub('', cpf)
+            if len(cpf) != 11:
+                tamanho_ok[posicao] = False
+                cpf = "00000000000"
+        normalizados.append(cpf)
+    if not normalizados:
+        return np.zeros(0, dtype=bool)
+    digitos = (np.frombuffer("".join(normalizados).encode('ascii'), dtype=np.uint8)
+               .reshape(-1, 11).astype(np.int64) - 48)
+    resto1 = digitos[:, :9] @ np.array(_PESOS_1) % 11
+    resto2 = digitos[:, :10] @ np.array(_PESOS_2) % 11
+    digito1 = np.where(resto1 < 2, 0, 11 - resto1)
+    digito2 = np.where(resto2 < 2, 0, 11 - resto2)
+    repetidos = (digitos == digitos[:, :1]).all(axis=1)
+    return tamanho_ok & ~repetidos & (digitos[:, 9] == digito1) & (digitos[:, 10] == digito2)
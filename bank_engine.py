@@ -0,0 +1,501 @@
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import bank_logic as bl
+from bank_conta import Conta
+from bank_cpf import validar_cpf
+from bank_ledger import ESTORNO, PIX_ENVIADO, PIX_RECEBIDO
+
+# Operações enviadas a um shard por mensagem; sob carga os pedidos que chegam
+# enquanto o shard trabalha saem juntos na mensagem seguinte
+MAX_OPERACOES_POR_MENSAGEM = 256
+
+
+def shard_de(cpf: str, num_shards: int) -> int:
+    """Shard dono do CPF. Estável entre execuções (o hash() do Python não é)."""
+    return zlib.crc32(cpf.encode('utf-8')) % num_shards
+
+
+def arquivo_do_shard(data_file: str, indice: int) -> str:
+    raiz, extensao = os.path.splitext(data_file)
+    return f"{raiz}.shard{indice}{extensao}"
+
+
+# --- PIX entre shards (executado dentro do processo do shard) ---
+# Protocolo em duas fases, coordenado pelo roteador:
+#   1. preparar no destino: a conta existe e pode receber;
+#   2. reservar na origem: debita e anota a pendência em `pix_pendentes` da
+#      própria conta, na mesma gravação do débito;
+#   3. creditar no destino: credita e anota o id em `pix_aplicados`, na mesma
+#      gravação (repetir o crédito com o mesmo id não credita de novo);
+#   4. concluir na origem: remove a pendência (ou estorna, se o crédito foi recusado);
+#   5. esquecer no destino: remove o id de `pix_aplicados`.
+# Se um processo cair entre 2 e 4, a pendência continua gravada na origem e o
+# roteador refaz 3 e 4 ao iniciar: o dinheiro nunca some nem é creditado duas vezes.
+
+def _pix_preparar(destino_cpf: str) -> Tuple[bool, str]:
+    if not validar_cpf(destino_cpf): return False, "CPF do destinatário inválido!"
+    if destino_cpf not in bl.users: return False, "CPF do destinatário não encontrado."
+    return True, "Destinatário apto."
+
+
+def _pix_reservar(transferencia: str, usuario_cpf: str, destino_cpf: str, valor: float,
+                  chave_idempotencia: Optional[str] = None) -> Tuple[bool, str, Optional[tuple]]:
+    with bl.travar_contas(usuario_cpf):
+        user_data = bl.users[usuario_cpf]
+        repetido = bl._repeticao(user_data, chave_idempotencia, "pix", (destino_cpf, valor))
+        if repetido is not None: return (*repetido, None)
+        centavos = bl._centavos(valor)
+        if centavos is None or centavos <= 0: return False, "Valor de PIX inválido.", None
+        agora = datetime.now(bl.TZ)
+        erro = bl.LIMITES.verificar(user_data, "pix", centavos, agora)
+        if erro: return False, erro, None
+        if centavos > user_data.saldo_centavos: return False, "Saldo insuficiente.", None
+        timestamp = agora.strftime("%Y-%m-%d %H:%M:%S")
+        bl._lancar(user_data, timestamp, PIX_ENVIADO, -centavos, destino_cpf)
+        bl.LIMITES.registrar(user_data, "pix", centavos, agora)
+        pendentes = user_data.get("pix_pendentes") or {}
+        # A chave vai junto: se o crédito for recusado, o estorno a esquece
+        pendentes[transferencia] = [destino_cpf, centavos, timestamp, chave_idempotencia]
+        user_data["pix_pendentes"] = pendentes
+        sucesso, mensagem = bl._memorizar(user_data, chave_idempotencia, "pix", (destino_cpf, valor),
+                                          (True, f"PIX de R$ {valor:.2f} enviado!"))
+        bl.salvar_dados(usuario_cpf)
+        return sucesso, mensagem, (destino_cpf, centavos, timestamp)
+
+
+def _pix_creditar(transferencia: str, usuario_cpf: str, destino_cpf: str, centavos: int,
+                  timestamp: str) -> Tuple[bool, str]:
+    with bl.travar_contas(destino_cpf):
+        user_data = bl.users.get(destino_cpf)
+        if user_data is None: return False, "CPF do destinatário não encontrado."
+        aplicados = user_data.get("pix_aplicados") or {}
+        if transferencia in aplicados:
+            return True, "Crédito já aplicado."
+        if not bl._cabe_no_saldo(user_data, centavos):
+            return False, "PIX ultrapassa o saldo máximo do destinatário."
+        bl._lancar(user_data, timestamp, PIX_RECEBIDO, centavos, usuario_cpf)
+        aplicados[transferencia] = timestamp
+        user_data["pix_aplicados"] = aplicados
+        bl.salvar_dados(destino_cpf)
+        return True, "Crédito aplicado."
+
+
+def _pix_concluir(transferencia: str, usuario_cpf: str, estornar: bool) -> Tuple[bool, str]:
+    with bl.travar_contas(usuario_cpf):
+        user_data = bl.users[usuario_cpf]
+        pendentes = user_data.get("pix_pendentes") or {}
+        pendencia = pendentes.pop(transferencia, None)
+        if pendencia is None:
+            return True, "Nada pendente."
+        if estornar:
+            # O valor volta num lançamento de estorno, e o PIX recusado deixa de contar nos limites
+            destino_cpf, centavos, timestamp = pendencia[:3]
+            bl._lancar(user_data, datetime.now(bl.TZ).strftime("%Y-%m-%d %H:%M:%S"), ESTORNO, centavos, destino_cpf)
+            reservado = bl.TZ.localize(datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S"))
+            bl.LIMITES.devolver(user_data, "pix", centavos, reservado)
+            # O sucesso memorizado na reserva não vale mais: repetir a chave refaz o PIX
+            # (pendências gravadas antes da chave ser anotada têm só três campos)
+            bl._esquecer_chave(user_data, pendencia[3] if len(pendencia) > 3 else None)
+        if pendentes:
+            user_data["pix_pendentes"] = pendentes
+        else:
+            user_data.pop("pix_pendentes", None)
+        bl.salvar_dados(usuario_cpf)
+        return True, "PIX estornado." if estornar else "PIX concluído."
+
+
+def _pix_esquecer(transferencia: str, destino_cpf: str) -> Tuple[bool, str]:
+    with bl.travar_contas(destino_cpf):
+        user_data = bl.users.get(destino_cpf)
+        aplicados = user_data.get("pix_aplicados") if user_data is not None else None
+        if not aplicados or aplicados.pop(transferencia, None) is None:
+            return True, "Nada a esquecer."
+        if aplicados:
+            user_data["pix_aplicados"] = aplicados
+        else:
+            user_data.pop("pix_aplicados", None)
+        bl.salvar_dados(destino_cpf)
+        return True, "Crédito esquecido."
+
+
+def _pix_pendentes() -> List[tuple]:
+    """(transferência, origem, destino, centavos, timestamp) de cada PIX reservado e não concluído."""
+    return [(transferencia, cpf, *pendencia[:3])
+            for cpf, user_data in list(bl.users.items())
+            for transferencia, pendencia in (user_data.get("pix_pendentes") or {}).items()]
+
+
+# Resultado do carregamento (ou da migração) deste processo de shard
+_carga: Tuple[bool, str] = (True, "")
+
+
+def _get_carga() -> Tuple[bool, str]:
+    return _carga
+
+
+def _get_user_data(cpf: str) -> Optional[Conta]:
+    # A conta é copiada para o roteador; alterá-la lá não afeta o shard
+    return bl.get_user_data(cpf)
+
+
+OPERACOES_SHARD: Dict[str, Callable[..., Any]] = {
+    "registrar_usuario": bl.registrar_usuario,
+    "registrar_usuarios_em_lote": bl.registrar_usuarios_em_lote,
+    "login_user": bl.login_user,
+    "get_user_data": _get_user_data,
+    "depositar": bl.depositar,
+    "sacar": bl.sacar,
+    "pix": bl.pix,
+    "comprar_investimento": bl.comprar_investimento,
+    "vender_investimento": bl.vender_investimento,
+    "get_extrato": bl.get_extrato,
+    "get_lancamentos": bl.get_lancamentos,
+    "total_em_custodia": bl.total_em_custodia,
+    "reconciliar": bl.reconciliar,
+    "pix_preparar": _pix_preparar,
+    "pix_reservar": _pix_reservar,
+    "pix_creditar": _pix_creditar,
+    "pix_concluir": _pix_concluir,
+    "pix_esquecer": _pix_esquecer,
+    "pix_pendentes": _pix_pendentes,
+    "carga": _get_carga,
+}
+
+
+def _marcar_falha(resultado: Any, mensagem: str) -> Any:
+    """Troca o sucesso de um resultado (True, msg, ...) pela falha da gravação."""
+    if isinstance(resultado, tuple) and resultado and resultado[0] is True:
+        return (False, mensagem, *resultado[2:])
+    return resultado
+
+
+def _migrar_legado(indice: int, num_shards: int, data_file: str) -> Tuple[bool, str]:
+    """
+    Primeira execução do shard sobre dados gravados sem o motor: lê `data_file`
+    e grava no arquivo do shard só as contas que pertencem a ele. Cada shard
+    migra uma única vez (quando o seu arquivo ainda não existe); o arquivo
+    antigo não é alterado.
+    """
+    bl.DATA_FILE = data_file
+    sucesso, mensagem = bl.carregar_dados()
+    if not sucesso:
+        return False, mensagem
+    proprias = {cpf: bl.users[cpf] for cpf in list(bl.users) if shard_de(cpf, num_shards) == indice}
+    bl.DATA_FILE = arquivo_do_shard(data_file, indice)
+    bl.users = proprias
+    return bl.salvar_dados()
+
+
+def _carregar_shard(indice: int, num_shards: int, data_file: str) -> Tuple[bool, str]:
+    bl.DATA_FILE = arquivo_do_shard(data_file, indice)
+    if not bl._get_armazenamento().existe():
+        bl.DATA_FILE = data_file
+        if bl._get_armazenamento().existe():
+            sucesso, mensagem = _migrar_legado(indice, num_shards, data_file)
+            if not sucesso:
+                return False, f"Falha ao migrar {data_file}: {mensagem}"
+        bl.DATA_FILE = arquivo_do_shard(data_file, indice)
+    sucesso, mensagem = bl.carregar_dados()
+    # Arquivo do shard ainda inexistente é um shard novo; qualquer outra falha não
+    if not sucesso and bl._erro_carga is not None:
+        return False, mensagem
+    return True, mensagem
+
+
+def _servir_shard(indice: int, num_shards: int, data_file: str, modo: str, conexao):
+    """Laço do processo de um shard: recebe listas de operações e responde com os resultados."""
+    global _carga
+    bl.MODO_PERSISTENCIA = modo
+    _carga = _carregar_shard(indice, num_shards, data_file)
+    if not _carga[0]:
+        # Nada é gravado por cima dos dados que não puderam ser lidos ou migrados
+        bl.users, bl._erro_carga = {}, _carga[1]
+    while True:
+        try:
+            mensagem = conexao.recv()
+        except EOFError:
+            break
+        if mensagem is None:
+            break
+        resultados = []
+        # Uma gravação por mensagem; a resposta só sai depois dela
+        with bl.persistencia_adiada() as adiamento:
+            for operacao, args in mensagem:
+                try:
+                    resultados.append((True, OPERACOES_SHARD[operacao](*args)))
+                except Exception as e:
+                    resultados.append((False, e))
+        if not adiamento.resultado[0]:
+            resultados = [(ok, _marcar_falha(valor, adiamento.resultado[1]) if ok else valor)
+                          for ok, valor in resultados]
+        conexao.send(resultados)
+    conexao.close()
+
+
+class _Shard:
+    """Lado do roteador de um shard: o processo, a conexão e as respostas aguardadas."""
+
+    def __init__(self, contexto, indice: int, num_shards: int, data_file: str, modo: str):
+        self.conexao, conexao_filho = contexto.Pipe()
+        self.processo = contexto.Process(target=_servir_shard, args=(indice, num_shards, data_file, modo, conexao_filho),
+                                         name=f"bank-shard-{indice}", daemon=True)
+        self.processo.start()
+        conexao_filho.close()
+        self.fila: "queue.SimpleQueue[Optional[tuple]]" = queue.SimpleQueue()
+        self.aguardando: deque = deque()
+        self._envio = threading.Thread(target=self._enviar, name=f"bank-shard-{indice}-envio", daemon=True)
+        self._recepcao = threading.Thread(target=self._receber, name=f"bank-shard-{indice}-recepcao", daemon=True)
+        self._envio.start()
+        self._recepcao.start()
+
+    def _enviar(self):
+        while True:
+            pedido = self.fila.get()
+            pedidos = [pedido]
+            while pedido is not None and len(pedidos) < MAX_OPERACOES_POR_MENSAGEM:
+                try:
+                    pedido = self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                pedidos.append(pedido)
+            encerrar = pedidos[-1] is None
+            if encerrar:
+                pedidos.pop()
+            if pedidos:
+                # Anotado antes de enviar: a recepção casa as respostas na ordem das mensagens
+                self.aguardando.append([futuro for futuro, _ in pedidos])
+                try:
+                    self.conexao.send([operacao for _, operacao in pedidos])
+                except (OSError, ValueError) as e:
+                    for futuro, _ in pedidos:
+                        futuro.set_exception(e)
+                    encerrar = True
+            if encerrar:
+                try:
+                    self.conexao.send(None)
+                except (OSError, ValueError):
+                    pass
+                return
+
+    def _receber(self):
+        while True:
+            try:
+                resultados = self.conexao.recv()
+            except (EOFError, OSError):
+                erro = ConnectionError("Processo do shard encerrado.")
+                while self.aguardando:
+                    for futuro in self.aguardando.popleft():
+                        futuro.set_exception(erro)
+                return
+            for futuro, (ok, valor) in zip(self.aguardando.popleft(), resultados):
+                if ok:
+                    futuro.set_result(valor)
+                else:
+                    futuro.set_exception(valor)
+
+    def submeter(self, operacao: str, args: tuple) -> Future:
+        futuro = Future()
+        self.fila.put((futuro, (operacao, args)))
+        return futuro
+
+    def encerrar(self, timeout: Optional[float] = None):
+        self.fila.put(None)
+        self._envio.join(timeout)
+        self.processo.join(timeout)
+        self.conexao.close()
+
+
+class MotorShards:
+    """
+    Motor de transações em vários processos. As contas são repartidas entre
+    `num_shards` processos pelo hash do CPF; cada shard carrega e grava só as
+    suas contas (em `bank_data.shardN.json`, no modo de persistência dado) e
+    executa as operações sem disputar o GIL com os demais. Este objeto é o
+    roteador: encaminha cada operação ao shard dono da conta e coordena os
+    PIX entre shards. Pode ser usado por várias threads ao mesmo tempo.
+
+    O número de shards define onde cada conta mora: reabra os mesmos dados
+    sempre com o mesmo `num_shards`. Na primeira execução sobre um `data_file`
+    gravado sem o motor, cada shard copia dele as suas contas. Se algum shard
+    não conseguir carregar ou migrar os dados, o motor não sobe (RuntimeError).
+    """
+
+    def __init__(self, num_shards: Optional[int] = None, data_file: Optional[str] = None,
+                 modo: Optional[str] = None):
+        self.num_shards = num_shards or os.cpu_count() or 1
+        data_file, modo = data_file or bl.DATA_FILE, modo or bl.MODO_PERSISTENCIA
+        contexto = multiprocessing.get_context("spawn")
+        # Os filhos importam bank_logic de novo: sem isto cada um leria o DATA_FILE padrão ao importar
+        anterior = os.environ.get("BANK_CARGA_INICIAL")
+        os.environ["BANK_CARGA_INICIAL"] = "0"
+        try:
+            self._shards = [_Shard(contexto, indice, self.num_shards, data_file, modo)
+                            for indice in range(self.num_shards)]
+        finally:
+            if anterior is None:
+                os.environ.pop("BANK_CARGA_INICIAL", None)
+            else:
+                os.environ["BANK_CARGA_INICIAL"] = anterior
+        falhas = [f"shard {indice}: {mensagem}" for indice, (sucesso, mensagem) in enumerate(self._em_todos("carga"))
+                  if not sucesso]
+        if falhas:
+            self.fechar()
+            raise RuntimeError("; ".join(falhas))
+        self.recuperar()
+
+    # --- Roteamento ---
+    def shard_de(self, cpf: str) -> int:
+        return shard_de(cpf, self.num_shards)
+
+    def submeter(self, cpf: str, operacao: str, *args) -> Future:
+        """Envia a operação ao shard dono do CPF sem esperar a resposta."""
+        return self._shards[self.shard_de(cpf)].submeter(operacao, (cpf, *args))
+
+    def _chamar(self, indice: int, operacao: str, *args) -> Any:
+        return self._shards[indice].submeter(operacao, args).result()
+
+    def _em_todos(self, operacao: str, *args) -> List[Any]:
+        futuros = [shard.submeter(operacao, args) for shard in self._shards]
+        return [futuro.result() for futuro in futuros]
+
+    def fechar(self, timeout: Optional[float] = 10.0):
+        for shard in self._shards:
+            shard.encerrar(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    # --- Usuários ---
+    def registrar_usuario(self, cpf: str, nome: str, email: str, telefone: str, senha: str,
+                          confirma_senha: str) -> Tuple[bool, str]:
+        return self.submeter(cpf, "registrar_usuario", nome, email, telefone, senha, confirma_senha).result()
+
+    def registrar_usuarios_em_lote(self, registros: Iterable[Dict[str, str]]) -> Tuple[bool, str, List[Tuple[int, str]]]:
+        """
+        Como bl.registrar_usuarios_em_lote; cada shard valida, cadastra e grava
+        a sua parte do lote (os shards já rodam em paralelo entre si).
+        """
+        partes: List[List[Dict[str, str]]] = [[] for _ in range(self.num_shards)]
+        posicoes: List[List[int]] = [[] for _ in range(self.num_shards)]
+        for posicao, registro in enumerate(registros):
+            try:
+                indice = self.shard_de(str(registro["cpf"]))
+            except (KeyError, TypeError):
+                indice = 0  # malformado: qualquer shard o rejeita
+            partes[indice].append(registro)
+            posicoes[indice].append(posicao)
+        futuros = [self._shards[indice].submeter("registrar_usuarios_em_lote", (partes[indice], 1))
+                   for indice in range(self.num_shards) if partes[indice]]
+        indices = [indice for indice in range(self.num_shards) if partes[indice]]
+        sucesso, rejeitados, falhas = True, [], []
+        for indice, futuro in zip(indices, futuros):
+            ok, mensagem, rejeitados_shard = futuro.result()
+            sucesso = sucesso and ok
+            if not ok:
+                falhas.append(mensagem)
+            rejeitados.extend((posicoes[indice][posicao], erro) for posicao, erro in rejeitados_shard)
+        rejeitados.sort()
+        total = sum(map(len, partes))
+        if not sucesso:
+            return False, "; ".join(falhas), rejeitados
+        return True, f"{total - len(rejeitados)} usuários cadastrados, {len(rejeitados)} rejeitados.", rejeitados
+
+    def login_user(self, cpf: str, senha: str) -> Tuple[bool, str, Optional[str]]:
+        return self.submeter(cpf, "login_user", senha).result()
+
+    def get_user_data(self, cpf: str) -> Optional[Conta]:
+        """Cópia da conta no momento da consulta."""
+        return self.submeter(cpf, "get_user_data").result()
+
+    # --- Operações ---
+    def depositar(self, usuario_cpf: str, valor: float, chave_idempotencia: Optional[str] = None) -> Tuple[bool, str]:
+        return self.submeter(usuario_cpf, "depositar", valor, chave_idempotencia).result()
+
+    def sacar(self, usuario_cpf: str, valor: float, chave_idempotencia: Optional[str] = None) -> Tuple[bool, str]:
+        return self.submeter(usuario_cpf, "sacar", valor, chave_idempotencia).result()
+
+    # A cotação de uma versão é a mesma em todos os processos (mesma semente do feed), e os
+    # shards aceitam os tokens emitidos aqui (herdam BANK_MERCADO_SEGREDO do ambiente)
+    def comprar_investimento(self, usuario_cpf: str, categoria: str, ativo: str, quantidade: float,
+                             chave_idempotencia: Optional[str] = None,
+                             token_cotacao: Optional[str] = None) -> Tuple[bool, str]:
+        return self.submeter(usuario_cpf, "comprar_investimento", categoria, ativo, quantidade,
+                             chave_idempotencia, token_cotacao).result()
+
+    def vender_investimento(self, usuario_cpf: str, categoria: str, ativo: str, quantidade: float,
+                            chave_idempotencia: Optional[str] = None,
+                            token_cotacao: Optional[str] = None) -> Tuple[bool, str]:
+        return self.submeter(usuario_cpf, "vender_investimento", categoria, ativo, quantidade,
+                             chave_idempotencia, token_cotacao).result()
+
+    def get_cotacao(self, versao: Optional[int] = None):
+        return bl.get_cotacao(versao)
+
+    def cotar(self, usuario_cpf: str):
+        return bl.cotar(usuario_cpf)
+
+    def pix(self, usuario_cpf: str, destino_cpf: str, valor: float,
+            chave_idempotencia: Optional[str] = None) -> Tuple[bool, str]:
+        origem, destino = self.shard_de(usuario_cpf), self.shard_de(destino_cpf)
+        if origem == destino:
+            return self._chamar(origem, "pix", usuario_cpf, destino_cpf, valor, chave_idempotencia)
+        sucesso, mensagem = self._chamar(destino, "pix_preparar", destino_cpf)
+        if not sucesso:
+            return False, mensagem
+        transferencia = uuid.uuid4().hex
+        sucesso, mensagem, pendencia = self._chamar(origem, "pix_reservar", transferencia, usuario_cpf,
+                                                    destino_cpf, valor, chave_idempotencia)
+        if not sucesso or pendencia is None:  # falha ou repetição de um PIX já feito
+            return sucesso, mensagem
+        creditado, motivo = self._liquidar(transferencia, usuario_cpf, *pendencia)
+        return (True, mensagem) if creditado else (False, f"PIX estornado: {motivo}")
+
+    def _liquidar(self, transferencia: str, usuario_cpf: str, destino_cpf: str, centavos: int,
+                  timestamp: str) -> Tuple[bool, str]:
+        """Fases 3 a 5 de um PIX entre shards já reservado na origem."""
+        creditado, motivo = self._chamar(self.shard_de(destino_cpf), "pix_creditar", transferencia, usuario_cpf,
+                                         destino_cpf, centavos, timestamp)
+        self._chamar(self.shard_de(usuario_cpf), "pix_concluir", transferencia, usuario_cpf, not creditado)
+        if creditado:
+            # Não precisa esperar: se não chegar, o id só ocupa espaço na conta do destino
+            self._shards[self.shard_de(destino_cpf)].submeter("pix_esquecer", (transferencia, destino_cpf))
+        return creditado, motivo
+
+    def recuperar(self) -> int:
+        """Conclui os PIX entre shards que ficaram reservados (queda no meio do protocolo)."""
+        pendentes = [pendencia for pendencias in self._em_todos("pix_pendentes") for pendencia in pendencias]
+        for pendencia in pendentes:
+            self._liquidar(*pendencia)
+        return len(pendentes)
+
+    # --- Consultas ---
+    def get_extrato(self, usuario_cpf: str, limite: Optional[int] = None, offset: int = 0,
+                    cursor: Optional[int] = None) -> Tuple[str, float]:
+        return self.submeter(usuario_cpf, "get_extrato", limite, offset, cursor).result()
+
+    def get_lancamentos(self, usuario_cpf: str, limite: Optional[int] = None, offset: int = 0,
+                        cursor: Optional[int] = None):
+        return self.submeter(usuario_cpf, "get_lancamentos", limite, offset, cursor).result()
+
+    def total_em_custodia(self) -> float:
+        return round(sum(self._em_todos("total_em_custodia")), 2)
+
+    def reconciliar(self) -> Tuple[bool, str]:
+        resultados = self._em_todos("reconciliar")
+        divergentes = [f"shard {indice}: {mensagem}" for indice, (sucesso, mensagem) in enumerate(resultados)
+                       if not sucesso]
+        if divergentes:
+            return False, "; ".join(divergentes)
+        return True, f"Conciliação ok em {self.num_shards} shards: R$ {self.total_em_custodia():.2f} em custódia."
@@ -0,0 +1,130 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import csv
+import os
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from bank_ledger import COMPRA, PIX_ENVIADO, SAQUE, Lancamento, Momento, filtrar_periodo, numerar_periodo, renderizar
+
+FORMATOS = ("csv", "ofx")
+COLUNAS_CSV = ("timestamp", "tipo", "valor", "saldo_apos", "contraparte", "quantidade", "preco")
+CONTAS_POR_LOTE = 64
+
+
+# --- Geradores de Linhas ---
+def _reais(valor: Optional[float]) -> str:
+    return "" if valor is None else f"{valor:.2f}"
+
+def linhas_csv(lancamentos: Iterable[Lancamento]) -> Iterator[Tuple[str, ...]]:
+    yield COLUNAS_CSV
+    for ts, tipo, valor, saldo_apos, contraparte, quantidade, preco in lancamentos:
+        yield (ts, tipo, _reais(valor), _reais(saldo_apos), contraparte or "",
+               "" if quantidade is None else repr(quantidade), _reais(preco))
+
+def _data_ofx(timestamp: str) -> str:
+    return timestamp.replace("-", "").replace(" ", "").replace(":", "")
+
+def linhas_ofx(lancamentos: Iterable[Tuple[int, Lancamento]], cpf: str, saldo: float,
+               inicio: Optional[str] = None, fim: Optional[str] = None) -> Iterator[str]:
+    """
+    Extrato no formato OFX 1.02 (SGML), uma linha de cada vez. `lancamentos`
+    traz cada lançamento com a sua posição no extrato completo (numerar_periodo),
+    que forma o FITID: o mesmo lançamento tem o mesmo FITID em qualquer período.
+    """
+    yield ("OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nSECURITY:NONE\nENCODING:USASCII\n"
+           "CHARSET:1252\nCOMPRESSION:NONE\nOLDFILEUID:NONE\nNEWFILEUID:NONE\n\n")
+    yield "<OFX>\n<BANKMSGSRSV1>\n<STMTTRNRS>\n<TRNUID>1\n<STATUS>\n<CODE>0\n<SEVERITY>INFO\n</STATUS>\n"
+    yield f"<STMTRS>\n<CURDEF>BRL\n<BANKACCTFROM>\n<BANKID>0000\n<ACCTID>{cpf}\n<ACCTTYPE>CHECKING\n</BANKACCTFROM>\n"
+    yield "<BANKTRANLIST>\n"
+    if inicio:
+        yield f"<DTSTART>{_data_ofx(inicio)}\n"
+    if fim:
+        yield f"<DTEND>{_data_ofx(fim)}\n"
+    for posicao, lancamento in lancamentos:
+        if not lancamento.timestamp:
+            continue  # linha legada sem data não é uma transação OFX válida
+        tipo = "DEBIT" if lancamento.tipo in (SAQUE, PIX_ENVIADO, COMPRA) else "CREDIT"
+        yield (f"<STMTTRN>\n<TRNTYPE>{tipo}\n<DTPOSTED>{_data_ofx(lancamento.timestamp)}\n"
+               f"<TRNAMT>{lancamento.valor:.2f}\n<FITID>{cpf}-{posicao}\n"
+               f"<MEMO>{renderizar(lancamento).split(' - ', 1)[-1]}\n</STMTTRN>\n")
+    yield "</BANKTRANLIST>\n"
+    yield f"<LEDGERBAL>\n<BALAMT>{saldo:.2f}\n</LEDGERBAL>\n"
+    yield "</STMTRS>\n</STMTTRNRS>\n</BANKMSGSRSV1>\n</OFX>\n"
+
+
+# --- Exportação ---
+def _abrir(destino: Union[str, IO[str]], formato: str):
+    if not isinstance(destino, str):
+        return destino, False
+    if formato == "ofx":
+        return open(destino, "w", encoding="cp1252", errors="replace", newline=""), True
+    return open(destino, "w", encoding="utf-8", newline=""), True
+
+def exportar(lancamentos: Iterable[Lancamento], destino: Union[str, IO[str]], formato: str = "csv",
+             cpf: str = "", saldo: float = 0.0, inicio: Optional[Momento] = None,
+             fim: Optional[Momento] = None) -> int:
+    """
+    Grava os lançamentos entre `inicio` e `fim` em `destino` (caminho ou
+    arquivo aberto), lendo e escrevendo um de cada vez. Retorna quantos
+    lançamentos foram exportados.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    exportados = 0
+
+    def contar(lancamentos):
+        nonlocal exportados
+        for lancamento in lancamentos:
+            exportados += 1
+            yield lancamento
+
+    f, fechar = _abrir(destino, formato)
+    try:
+        if formato == "csv":
+            csv.writer(f).writerows(linhas_csv(contar(filtrar_periodo(lancamentos, inicio, fim))))
+        else:
+            # Numerados antes do filtro: o FITID não pode depender do período exportado
+            f.writelines(linhas_ofx(contar(numerar_periodo(lancamentos, inicio, fim)), cpf, saldo,
+                                    None if inicio is None else str(inicio), None if fim is None else str(fim)))
+    finally:
+        if fechar:
+            f.close()
+    return exportados
+
+
+def _exportar_lote(lote: List[Tuple[str, float, List[Lancamento]]], diretorio: str, formato: str,
+                   inicio: Optional[Momento], fim: Optional[Momento]) -> Dict[str, int]:
+    return {cpf: exportar(lancamentos, os.path.join(diretorio, f"{cpf}.{formato}"), formato, cpf, saldo, inicio, fim)
+            for cpf, saldo, lancamentos in lote}
+
+def exportar_contas(contas: Iterable[Tuple[str, float, List[Lancamento]]], diretorio: str, formato: str = "csv",
+                    inicio: Optional[Momento] = None, fim: Optional[Momento] = None,
+                    processos: Optional[int] = None) -> Dict[str, int]:
+    """
+    Exporta cada conta de `contas` (cpf, saldo, lançamentos) para
+    `diretorio/<cpf>.<formato>`, em lotes distribuídos entre processos.
+    No máximo dois lotes por processo ficam pendentes, então `contas` pode
+    ser um gerador que lê as contas do armazenamento aos poucos.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    os.makedirs(diretorio, exist_ok=True)
+    processos = processos or os.cpu_count() or 1
+    resultado: Dict[str, int] = {}
+    pendentes = set()
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        lote = []
+        for conta in contas:
+            lote.append(conta)
+            if len(lote) < CONTAS_POR_LOTE:
+                continue
+            if len(pendentes) >= 2 * processos:
+                prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    resultado.update(futuro.result())
+            pendentes.add(executor.submit(_exportar_lote, lote, diretorio, formato, inicio, fim))
+            lote = []
+        if lote:
+            pendentes.add(executor.submit(_exportar_lote, lote, diretorio, formato, inicio, fim))
+        for futuro in pendentes:
+            resultado.update(futuro.result())
+    return resultado
@@ -0,0 +1,284 @@
+import re
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from heapq import merge
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+# --- Tipos de Lançamento ---
+DEPOSITO = "Depósito"
+SAQUE = "Saque"
+PIX_ENVIADO = "PIX Enviado"
+PIX_RECEBIDO = "PIX Recebido"
+COMPRA = "Compra"
+VENDA = "Venda"
+LEGADO = "Legado"  # linha do extrato antigo que não pôde ser interpretada
+ESTORNO = "Estorno"  # devolução de um PIX que o destino recusou
+# A posição de cada tipo é gravada no snapshot binário: tipos novos entram no fim
+TIPOS = (DEPOSITO, SAQUE, PIX_ENVIADO, PIX_RECEBIDO, COMPRA, VENDA, LEGADO, ESTORNO)
+
+
+class Lancamento(NamedTuple):
+    """
+    Um lançamento do extrato. `valor` tem sinal (+ entrada, - saída) e
+    `contraparte` é o CPF da outra ponta de um PIX ou o ativo negociado.
+    Em JSON é gravado como uma lista na ordem dos campos.
+    """
+    timestamp: str
+    tipo: str
+    valor: float
+    saldo_apos: Optional[float] = None
+    contraparte: Optional[str] = None
+    quantidade: Optional[float] = None
+    preco: Optional[float] = None
+
+
+def renderizar(lancamento: Lancamento) -> str:
+    """Formata o lançamento como a linha do extrato textual."""
+    ts, tipo, valor = lancamento.timestamp, lancamento.tipo, lancamento.valor
+    if tipo == DEPOSITO:
+        return f"{ts} - Depósito: +R$ {valor:.2f}"
+    if tipo == SAQUE:
+        return f"{ts} - Saque: -R$ {-valor:.2f}"
+    if tipo == PIX_ENVIADO:
+        return f"{ts} - PIX Enviado para {lancamento.contraparte}: -R$ {-valor:.2f}"
+    if tipo == PIX_RECEBIDO:
+        return f"{ts} - PIX Recebido de {lancamento.contraparte}: +R$ {valor:.2f}"
+    if tipo == ESTORNO:
+        return f"{ts} - Estorno de PIX para {lancamento.contraparte}: +R$ {valor:.2f}"
+    if tipo == COMPRA:
+        return (f"{ts} - Compra {lancamento.contraparte}: {lancamento.quantidade} un. "
+                f"a R$ {lancamento.preco:.2f} (-R$ {-valor:.2f})")
+    if tipo == VENDA:
+        return (f"{ts} - Venda {lancamento.contraparte}: {lancamento.quantidade} un. "
+                f"a R$ {lancamento.preco:.2f} (+R$ {valor:.2f})")
+    return f"{ts} - {lancamento.contraparte}" if ts else lancamento.contraparte
+
+def renderizar_extrato(lancamentos: Iterable[Lancamento]) -> str:
+    return "".join(renderizar(lancamento) + "\n" for lancamento in lancamentos)
+
+
+# --- Importação do Extrato Textual ---
+# Formatos gravados por bank_logic e, com ícones, por bank_code
+_TIMESTAMP = r"(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) - (?:\S+ )?"
+_VALOR = r"[+-]?R\$ (?P<valor>\d+(?:\.\d+)?)"
+_PADROES = (
+    (DEPOSITO, re.compile(_TIMESTAMP + r"Depósito: " + _VALOR + r"$")),
+    (SAQUE, re.compile(_TIMESTAMP + r"Saque: " + _VALOR + r"$")),
+    (PIX_ENVIADO, re.compile(_TIMESTAMP + r"PIX (?:Enviado )?para (?P<cp>\S+): " + _VALOR + r"$")),
+    (PIX_RECEBIDO, re.compile(_TIMESTAMP + r"PIX [Rr]ecebido de (?P<cp>\S+): " + _VALOR + r"$")),
+    (ESTORNO, re.compile(_TIMESTAMP + r"Estorno de PIX para (?P<cp>\S+): " + _VALOR + r"$")),
+    # Transferência entre contas do bank_code: em bank_logic esse papel é do PIX
+    (PIX_ENVIADO, re.compile(_TIMESTAMP + r"Transferência para (?P<cp>\S+): " + _VALOR + r"$")),
+    (PIX_RECEBIDO, re.compile(_TIMESTAMP + r"Transferência recebida de (?P<cp>\S+): " + _VALOR + r"$")),
+    (COMPRA, re.compile(_TIMESTAMP + r"Compra (?P<cp>\S+): (?P<qtd>\S+) un\. a R\$ (?P<preco>\d+(?:\.\d+)?) "
+                                     r"\(-R\$ (?P<valor>\d+(?:\.\d+)?)\)$")),
+    (VENDA, re.compile(_TIMESTAMP + r"Venda (?P<cp>\S+): (?P<qtd>\S+) un\. a R\$ (?P<preco>\d+(?:\.\d+)?) "
+                                    r"\(\+R\$ (?P<valor>\d+(?:\.\d+)?)\)$")),
+)
+_SAIDAS = (SAQUE, PIX_ENVIADO, COMPRA)
+_LINHA_COM_DATA = re.compile(r"(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) - (?P<resto>.*)$")
+
+
+def _interpretar_linha(linha: str) -> Lancamento:
+    for tipo, padrao in _PADROES:
+        m = padrao.match(linha)
+        if m:
+            valor = float(m["valor"])
+            grupos = m.groupdict()
+            return Lancamento(
+                m["ts"], tipo, -valor if tipo in _SAIDAS else valor, None, grupos.get("cp"),
+                float(grupos["qtd"]) if grupos.get("qtd") else None,
+                float(grupos["preco"]) if grupos.get("preco") else None)
+    m = _LINHA_COM_DATA.match(linha)
+    if m:
+        return Lancamento(m["ts"], LEGADO, 0.0, None, m["resto"])
+    return Lancamento("", LEGADO, 0.0, None, linha)
+
+
+def importar_extrato(extrato: str, saldo_final: float) -> List[Lancamento]:
+    """
+    Converte o extrato textual em lançamentos. O texto antigo não registra o
+    saldo após cada operação, então ele é reconstruído de trás para frente a
+    partir de `saldo_final`.
+    """
+    lancamentos = [_interpretar_linha(linha) for linha in extrato.splitlines() if linha.strip()]
+    saldo = saldo_final
+    for posicao in range(len(lancamentos) - 1, -1, -1):
+        lancamentos[posicao] = lancamentos[posicao]._replace(saldo_apos=round(saldo, 2))
+        saldo -= lancamentos[posicao].valor
+    return lancamentos
+
+
+# --- Índice de Consulta ---
+Momento = Union[date, datetime, str]
+
+
+def _chave_inicio(momento: Momento) -> str:
+    if isinstance(momento, datetime):
+        return momento.strftime("%Y-%m-%d %H:%M:%S")
+    return momento.isoformat() if isinstance(momento, date) else momento
+
+def _chave_fim(momento: Momento) -> str:
+    """Primeira chave depois de `momento`; uma data inclui o dia inteiro."""
+    if isinstance(momento, datetime):
+        return (momento + timedelta(seconds=1)).strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(momento, date):
+        return (momento + timedelta(days=1)).isoformat()
+    return momento + "\uffff"
+
+def filtrar_periodo(lancamentos: Iterable[Lancamento], inicio: Optional[Momento] = None,
+                    fim: Optional[Momento] = None) -> Iterator[Lancamento]:
+    """Gera, sem montar listas, os lançamentos entre `inicio` e `fim` (inclusive)."""
+    for _, lancamento in numerar_periodo(lancamentos, inicio, fim):
+        yield lancamento
+
+def numerar_periodo(lancamentos: Iterable[Lancamento], inicio: Optional[Momento] = None,
+                    fim: Optional[Momento] = None) -> Iterator[Tuple[int, Lancamento]]:
+    """Como filtrar_periodo, junto com a posição de cada lançamento no extrato completo."""
+    chave_inicio = None if inicio is None else _chave_inicio(inicio)
+    chave_fim = None if fim is None else _chave_fim(fim)
+    for posicao, lancamento in enumerate(lancamentos):
+        if chave_inicio is not None and lancamento.timestamp < chave_inicio:
+            continue
+        if chave_fim is not None and lancamento.timestamp >= chave_fim:
+            continue
+        yield posicao, lancamento
+
+
+class IndiceLancamentos:
+    """
+    Índices de uma lista de lançamentos: os timestamps em ordem (para busca
+    binária por período) e as posições de cada tipo e de cada contraparte.
+    Acompanha a lista por referência e indexa só os lançamentos acrescentados
+    desde a última consulta.
+    """
+
+    def __init__(self, lancamentos: Sequence[Lancamento]):
+        self.lancamentos = lancamentos
+        self._timestamps: List[str] = []
+        self._por_tipo: Dict[str, List[int]] = {}
+        self._por_contraparte: Dict[str, List[int]] = {}
+        self._ordenado = True
+
+    def atualizar(self):
+        if len(self.lancamentos) < len(self._timestamps):
+            self.__init__(self.lancamentos)  # lista encolheu: reindexa do zero
+        for posicao in range(len(self._timestamps), len(self.lancamentos)):
+            lancamento = self.lancamentos[posicao]
+            if self._timestamps and lancamento.timestamp < self._timestamps[-1]:
+                self._ordenado = False  # relógio voltou: períodos passam a ser filtrados linearmente
+            self._timestamps.append(lancamento.timestamp)
+            self._por_tipo.setdefault(lancamento.tipo, []).append(posicao)
+            if lancamento.contraparte is not None:
+                self._por_contraparte.setdefault(lancamento.contraparte, []).append(posicao)
+
+    def consultar(self, inicio: Optional[Momento] = None, fim: Optional[Momento] = None,
+                  tipos: Optional[Iterable[str]] = None, contraparte: Optional[str] = None) -> List[Lancamento]:
+        """Lançamentos entre `inicio` e `fim` (inclusive) dos `tipos` e da `contraparte` pedidos."""
+        self.atualizar()
+        chave_inicio = None if inicio is None else _chave_inicio(inicio)
+        chave_fim = None if fim is None else _chave_fim(fim)
+        if self._ordenado:
+            primeira = 0 if chave_inicio is None else bisect_left(self._timestamps, chave_inicio)
+            ultima = len(self._timestamps) if chave_fim is None else bisect_left(self._timestamps, chave_fim)
+        else:
+            primeira, ultima = 0, len(self._timestamps)
+
+        if contraparte is not None:
+            candidatas = [self._por_contraparte.get(contraparte, [])]
+        elif tipos is not None:
+            candidatas = [self._por_tipo.get(tipo, []) for tipo in set(tipos)]
+        else:
+            candidatas = None
+
+        if candidatas is None:
+            posicoes = range(primeira, ultima)
+        else:
+            posicoes = merge(*(lista[bisect_left(lista, primeira):bisect_left(lista, ultima)] for lista in candidatas))
+
+        tipos = None if tipos is None or contraparte is None else set(tipos)
+        resultado = []
+        for posicao in posicoes:
+            lancamento = self.lancamentos[posicao]
+            if tipos is not None and lancamento.tipo not in tipos:
+                continue
+            if not self._ordenado and ((chave_inicio is not None and lancamento.timestamp < chave_inicio) or
+                                       (chave_fim is not None and lancamento.timestamp >= chave_fim)):
+                continue
+            resultado.append(lancamento)
+        return resultado
+
+
+# --- Resumos por Período ---
+# Total (sem sinal) acumulado por tipo de lançamento, além da contagem de operações
+CAMPOS_RESUMO = {DEPOSITO: "depositos", SAQUE: "saques", PIX_ENVIADO: "pix_enviados",
+                 PIX_RECEBIDO: "pix_recebidos", COMPRA: "compras", VENDA: "vendas", ESTORNO: "estornos"}
+# Posição de cada total na lista gravada por período; a última é a contagem
+_POSICOES_RESUMO = {tipo: posicao for posicao, tipo in enumerate(CAMPOS_RESUMO)}
+
+
+class ResumoLancamentos:
+    """
+    Totais diários ("AAAA-MM-DD") e mensais ("AAAA-MM") de uma lista de
+    lançamentos, no dicionário `estado`: {"somados": n, "diario": {dia:
+    [centavos por tipo..., operações]}, "mensal": {...}}. Só os lançamentos
+    acrescentados desde a última atualização são somados, então um lançamento
+    novo custa O(1) e um relatório O(períodos). Os totais ficam só em memória:
+    somados quando a conta é carregada, eles não aumentam o que cada operação grava.
+    """
+
+    def __init__(self, lancamentos: Sequence[Lancamento], estado: Optional[Dict[str, Any]] = None):
+        self.lancamentos = lancamentos
+        self.estado = {"somados": 0, "diario": {}, "mensal": {}} if estado is None else estado
+
+    @property
+    def diario(self) -> Dict[str, List[int]]:
+        return self.estado["diario"]
+
+    @property
+    def mensal(self) -> Dict[str, List[int]]:
+        return self.estado["mensal"]
+
+    def atualizar(self):
+        somados = self.estado["somados"]
+        if len(self.lancamentos) < somados:
+            # Lista encolheu sem passar por `descontar`: soma tudo de novo
+            self.diario.clear()
+            self.mensal.clear()
+            somados = 0
+        for posicao in range(somados, len(self.lancamentos)):
+            self._somar(self.lancamentos[posicao], 1)
+        self.estado["somados"] = len(self.lancamentos)
+
+    def descontar(self, removidos: Sequence[Lancamento]):
+        """Retira dos totais os últimos lançamentos da lista, que estão para ser removidos."""
+        self.atualizar()
+        for lancamento in removidos:
+            self._somar(lancamento, -1)
+        self.estado["somados"] -= len(removidos)
+
+    def _somar(self, lancamento: Lancamento, sinal: int):
+        posicao = _POSICOES_RESUMO.get(lancamento.tipo)
+        if posicao is None or not lancamento.timestamp:
+            return
+        dia = lancamento.timestamp[:10]
+        centavos = round(abs(lancamento.valor) * 100)
+        for tabela, periodo in ((self.diario, dia), (self.mensal, dia[:7])):
+            totais = tabela.get(periodo)
+            if totais is None:
+                totais = tabela[periodo] = [0] * (len(CAMPOS_RESUMO) + 1)
+            totais[posicao] += sinal * centavos
+            totais[-1] += sinal
+
+    def periodos(self, tabela: Dict[str, List[int]], inicio: Optional[str] = None,
+                 fim: Optional[str] = None) -> List[Tuple[str, Dict[str, float]]]:
+        """Linhas (período, totais em R$) de `tabela` em ordem, com `inicio` e `fim` inclusive."""
+        self.atualizar()
+        linhas = []
+        for periodo in sorted(tabela):
+            if (inicio is None or periodo >= inicio) and (fim is None or periodo[:len(fim)] <= fim):
+                totais = tabela[periodo]
+                resumo = {campo: centavos / 100 for campo, centavos in zip(CAMPOS_RESUMO.values(), totais)}
+                resumo["operacoes"] = totais[-1]
+                linhas.append((periodo, resumo))
+        return linhas
@@ -0,0 +1,145 @@
+from datetime import date, datetime, time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from bank_conta import Conta
+
+# Operações que contam no limite diário de transações
+OPERACOES_CONTADAS = frozenset(("depositar", "sacar", "pix"))
+NOMES_OPERACOES = {"depositar": "depósito", "sacar": "saque", "pix": "PIX",
+                   "comprar": "compra", "vender": "venda"}
+
+
+class Janela(NamedTuple):
+    """
+    Limite numa janela deslizante de `segundos`: no máximo `max_operacoes`
+    operações e/ou `max_valor` reais somados das `operacoes` indicadas.
+    """
+    nome: str
+    operacoes: frozenset
+    segundos: int
+    max_operacoes: Optional[int] = None
+    max_valor: Optional[float] = None
+
+
+def _estimar(estado: Optional[List[float]], segundos: int, instante: float) -> List[float]:
+    """
+    Quantidade e centavos na janela que termina em `instante`. A janela é
+    estimada por dois baldes fixos de `segundos` (o atual e o anterior, este
+    pesado pela fração que ainda cai na janela): O(1) e sem guardar cada operação.
+    """
+    if not estado:
+        return [0, 0]
+    inicio, quantidade, centavos, quantidade_anterior, centavos_anterior = estado
+    balde = instante - instante % segundos
+    if balde == inicio + segundos:
+        quantidade_anterior, centavos_anterior, quantidade, centavos = quantidade, centavos, 0, 0
+    elif balde != inicio:
+        return [0, 0]
+    peso = 1 - (instante - balde) / segundos
+    return [quantidade_anterior * peso + quantidade, centavos_anterior * peso + centavos]
+
+
+def _acumular(estado: Optional[List[float]], segundos: int, instante: float, centavos: int) -> List[float]:
+    balde = instante - instante % segundos
+    if not estado or balde > estado[0] + segundos:
+        return [balde, 1, centavos, 0, 0]
+    if balde == estado[0] + segundos:
+        return [balde, 1, centavos, estado[1], estado[2]]
+    return [estado[0], estado[1] + 1, estado[2] + centavos, estado[3], estado[4]]
+
+
+def _descontar(estado: List[float], segundos: int, instante: float, centavos: int) -> List[float]:
+    """Retira de `estado` uma operação acumulada em `instante`, se o balde dela ainda está guardado."""
+    inicio, quantidade, valor, quantidade_anterior, valor_anterior = estado
+    balde = instante - instante % segundos
+    if balde == inicio:
+        return [inicio, max(quantidade - 1, 0), max(valor - centavos, 0), quantidade_anterior, valor_anterior]
+    if balde == inicio - segundos:
+        return [inicio, quantidade, valor, max(quantidade_anterior - 1, 0), max(valor_anterior - centavos, 0)]
+    return estado
+
+
+class PoliticaLimites:
+    """
+    Limites de todas as operações num só lugar. Os contadores diários são
+    os da própria conta (numero_transacoes_dia e numero_saques) e valem para
+    o dia em data_contagem: num dia novo eles são lidos como zero e
+    reiniciados na primeira operação, sem varrer as contas à meia-noite. As
+    janelas deslizantes guardam dois baldes por janela em "limites" na conta.
+    `verificar` e `registrar` custam O(1) por operação.
+    """
+
+    def __init__(self, transacoes_dia: int, saques_dia: int, teto_por_operacao: Dict[str, float],
+                 pix_noturno: float, inicio_noturno: time, janelas: Sequence[Janela] = ()):
+        self.transacoes_dia = transacoes_dia
+        self.saques_dia = saques_dia
+        self.teto_por_operacao = teto_por_operacao
+        self.pix_noturno = pix_noturno
+        self.inicio_noturno = inicio_noturno
+        self.janelas: List[Janela] = list(janelas)
+
+    @staticmethod
+    def contadores_do_dia(user_data: Conta, hoje: date) -> Tuple[int, int]:
+        """(transações, saques) de `hoje`; contadores de outro dia valem zero."""
+        if user_data.data_contagem != hoje:
+            return 0, 0
+        return user_data.numero_transacoes_dia, user_data.numero_saques
+
+    def verificar(self, user_data: Conta, operacao: str, centavos: int, agora: datetime) -> Optional[str]:
+        """Mensagem do primeiro limite que a operação estouraria, ou None."""
+        transacoes, saques = self.contadores_do_dia(user_data, agora.date())
+        if operacao in OPERACOES_CONTADAS and transacoes >= self.transacoes_dia:
+            return "Limite diário de transações atingido!"
+        if operacao == "sacar" and saques >= self.saques_dia:
+            return "Limite de saques diários atingido!"
+        teto = self.teto_por_operacao.get(operacao)
+        if teto is not None and centavos > round(teto * 100):
+            return f"Limite por {NOMES_OPERACOES.get(operacao, operacao)}: R$ {teto:.2f}."
+        if operacao == "pix" and agora.time() >= self.inicio_noturno and centavos > round(self.pix_noturno * 100):
+            return (f"PIX acima de R$ {self.pix_noturno:.2f} não permitido após "
+                    f"{self.inicio_noturno.strftime('%H:%M')}.")
+        if self.janelas:
+            estados = user_data.get("limites") or {}
+            instante = agora.timestamp()
+            for janela in self.janelas:
+                if operacao not in janela.operacoes:
+                    continue
+                quantidade, acumulado = _estimar(estados.get(janela.nome), janela.segundos, instante)
+                if janela.max_operacoes is not None and quantidade + 1 > janela.max_operacoes:
+                    return f"Limite de {janela.max_operacoes} operações em {janela.nome} atingido!"
+                if janela.max_valor is not None and acumulado + centavos > round(janela.max_valor * 100):
+                    return f"Limite de R$ {janela.max_valor:.2f} em {janela.nome} atingido!"
+        return None
+
+    def registrar(self, user_data: Conta, operacao: str, centavos: int, agora: datetime):
+        """Conta a operação já aprovada por `verificar` (chame com a conta travada)."""
+        hoje = agora.date()
+        if user_data.data_contagem != hoje:
+            user_data.numero_transacoes_dia = 0
+            user_data.numero_saques = 0
+            user_data.data_contagem = hoje
+        if operacao in OPERACOES_CONTADAS:
+            user_data.numero_transacoes_dia += 1
+        if operacao == "sacar":
+            user_data.numero_saques += 1
+        aplicaveis = [janela for janela in self.janelas if operacao in janela.operacoes]
+        if aplicaveis:
+            estados = user_data.get("limites") or {}
+            instante = agora.timestamp()
+            for janela in aplicaveis:
+                estados[janela.nome] = _acumular(estados.get(janela.nome), janela.segundos, instante, centavos)
+            user_data["limites"] = estados
+
+    def devolver(self, user_data: Conta, operacao: str, centavos: int, quando: datetime):
+        """Desfaz o `registrar` de uma operação feita em `quando` e depois estornada (chame com a conta travada)."""
+        if user_data.data_contagem == quando.date():
+            if operacao in OPERACOES_CONTADAS and user_data.numero_transacoes_dia > 0:
+                user_data.numero_transacoes_dia -= 1
+            if operacao == "sacar" and user_data.numero_saques > 0:
+                user_data.numero_saques -= 1
+        estados = user_data.get("limites")
+        if estados:
+            instante = quando.timestamp()
+            for janela in self.janelas:
+                if operacao in janela.operacoes and estados.get(janela.nome):
+                    estados[janela.nome] = _descontar(estados[janela.nome], janela.segundos, instante, centavos)
@@ -1,10 +1,25 @@
-from datetime import datetime, date
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, time as hora_do_dia
 import pytz
-import json
+import math
 import os
 import re
-import random
-from typing import Dict, Any, Optional, Tuple
+import secrets
+import threading
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from bank_ledger import (COMPRA, DEPOSITO, PIX_ENVIADO, PIX_RECEBIDO, SAQUE, VENDA,
+                         IndiceLancamentos, Lancamento, Momento, ResumoLancamentos, renderizar_extrato)
+from bank_conta import MAX_CENTAVOS, SALDOS, Conta, para_centavos
+from bank_cpf import validar_cpf, validar_cpfs
+from bank_export import exportar, exportar_contas
+from bank_limites import PoliticaLimites
+from bank_mercado import Cotacao, FeedMercado
+from bank_snapshot import ArmazenamentoBinario
+from bank_storage import (ArmazenamentoJson, ArmazenamentoJournal, ArmazenamentoShards, ArmazenamentoSqlite,
+                          ContasLazy, GroupCommit, contas_em_memoria)
 
 # --- Constantes do Sistema ---
 LIMITE_SAQUE = 500.0
@@ -14,8 +29,40 @@ LIMITE_PIX_NOTURNO = 500.0
 HORA_LIMITE_PIX = 23
 MINUTO_LIMITE_PIX = 59
 DATA_FILE = "bank_data.json"
+# Chaves de idempotência: por conta, as mais recentes valem por IDEMPOTENCIA_TTL segundos
+IDEMPOTENCIA_TTL = 24 * 3600
+IDEMPOTENCIA_MAX_CHAVES = 100
 TZ = pytz.timezone("America/Sao_Paulo")
 
+# Todos os limites de operação, aplicados por PoliticaLimites. Janelas
+# deslizantes extras: LIMITES.janelas.append(Janela("1 hora", frozenset({"pix"}), 3600, max_valor=2000.0))
+LIMITES = PoliticaLimites(transacoes_dia=LIMITE_TRANSACOES_DIARIAS, saques_dia=LIMITE_SAQUES_DIARIOS,
+                          teto_por_operacao={"sacar": LIMITE_SAQUE}, pix_noturno=LIMITE_PIX_NOTURNO,
+                          inicio_noturno=hora_do_dia(HORA_LIMITE_PIX, MINUTO_LIMITE_PIX))
+
+# --- Persistência ---
+# "json": reescreve DATA_FILE inteiro a cada operação
+# "journal": acrescenta um registro por operação em DATA_FILE + ".journal"
+# "shards": contas particionadas por hash do CPF em NUM_SHARDS arquivos
+# "sqlite": contas, extrato e portfólio em tabelas de bank_data.db, lidas sob demanda
+# "binario": snapshot binário em bank_data.bin, mapeado em memória e decodificado sob demanda
+MODO_PERSISTENCIA = os.environ.get("BANK_PERSISTENCIA", "json")
+JOURNAL_CHECKPOINT_A_CADA = 1000
+JOURNAL_FSYNC = False
+NUM_SHARDS = 16
+# JSON sem indentação (produção); o padrão continua legível
+JSON_COMPACTO = os.environ.get("BANK_JSON_COMPACTO") == "1"
+# Group commit: salvamentos concorrentes viram uma única gravação por janela
+# Carregamento sob demanda (json/journal): índice CPF -> offset em DATA_FILE + ".idx"
+CARREGAMENTO_LAZY = os.environ.get("BANK_LAZY") == "1"
+GROUP_COMMIT = os.environ.get("BANK_GROUP_COMMIT") == "1"
+GROUP_COMMIT_JANELA_MS = 5.0
+GROUP_COMMIT_MAX_OPERACOES = 64
+GROUP_COMMIT_MAX_FILA = 1024
+# Com BANK_CARGA_INICIAL=0 importar o módulo não lê DATA_FILE (os processos de
+# bank_engine escolhem o próprio arquivo e chamam carregar_dados depois)
+CARGA_INICIAL = os.environ.get("BANK_CARGA_INICIAL", "1") != "0"
+
 # --- Mercado Simulado ---
 # Preços base e volatilidade para simulação
 SIMULATED_MARKET = {
@@ -29,21 +76,21 @@ SIMULATED_MARKET = {
     }
 }
 
+# Os preços mudam a cada tick; uma cotação vale por MERCADO_VALIDADE_TICKS ticks
+# para quem negocia com o token que recebeu junto com ela
+MERCADO_TICK_SEGUNDOS = 1.0
+MERCADO_VALIDADE_TICKS = 2
+MERCADO_SEMENTE = 0
+# Assina os tokens de cotação. Fica no ambiente para que os processos de
+# bank_engine, que herdam o ambiente, aceitem os tokens emitidos pelo roteador
+MERCADO_SEGREDO = os.environ.setdefault("BANK_MERCADO_SEGREDO", secrets.token_hex(32))
+
 # Armazenamento de usuários em memória
 users = {}
+# Índices de consulta do extrato por CPF (só em memória, montados na primeira consulta)
+_indices_lancamentos: Dict[str, IndiceLancamentos] = {}
 
 # --- Funções de Validação ---
-def validar_cpf(cpf: str) -> bool:
-    cpf = re.sub(r'[^0-9]', '', cpf)
-    if len(cpf) != 11 or cpf == cpf[0] * 11: return False
-    soma = sum(int(cpf[i]) * (10 - i) for i in range(9))
-    resto = soma % 11
-    digito1 = 0 if resto < 2 else 11 - resto
-    soma = sum(int(cpf[i]) * (11 - i) for i in range(10))
-    resto = soma % 11
-    digito2 = 0 if resto < 2 else 11 - resto
-    return cpf[-2:] == f"{digito1}{digito2}"
-
 def validar_email(email: str) -> bool:
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
@@ -53,187 +100,697 @@ def validar_telefone(telefone: str) -> bool:
     return len(telefone) in [10, 11]
 
 # --- Persistência de Dados ---
-def salvar_dados():
+_armazenamento = None
+# Serializa as gravações dos armazenamentos que não aceitam chamadas concorrentes
+_trava_gravacao = threading.Lock()
+_config_armazenamento = None
+# Bytes escritos (None se o armazenamento não informa) e duração do último salvamento
+ultima_gravacao: Dict[str, Any] = {"bytes": None, "segundos": 0.0}
+# Erro do último carregar_dados que falhou: enquanto existir, salvar_dados não grava,
+# para que o `users` vazio não substitua os dados que não puderam ser lidos
+_erro_carga: Optional[str] = None
+
+def _criar_armazenamento():
+    armazenamento = _criar_armazenamento_base()
+    if GROUP_COMMIT:
+        return GroupCommit(armazenamento, janela_ms=GROUP_COMMIT_JANELA_MS,
+                           max_operacoes=GROUP_COMMIT_MAX_OPERACOES, max_fila=GROUP_COMMIT_MAX_FILA)
+    return armazenamento
+
+def _criar_armazenamento_base():
+    if MODO_PERSISTENCIA == "journal":
+        return ArmazenamentoJournal(DATA_FILE, checkpoint_a_cada=JOURNAL_CHECKPOINT_A_CADA, fsync=JOURNAL_FSYNC,
+                                    lazy=CARREGAMENTO_LAZY, compacto=JSON_COMPACTO)
+    if MODO_PERSISTENCIA == "shards":
+        return ArmazenamentoShards(os.path.splitext(DATA_FILE)[0] + "_shards", num_shards=NUM_SHARDS,
+                                   caminho_legado=DATA_FILE, compacto=JSON_COMPACTO)
+    if MODO_PERSISTENCIA == "binario":
+        return ArmazenamentoBinario(os.path.splitext(DATA_FILE)[0] + ".bin")
+    if MODO_PERSISTENCIA == "sqlite":
+        return ArmazenamentoSqlite(os.path.splitext(DATA_FILE)[0] + ".db")
+    if MODO_PERSISTENCIA == "json":
+        return ArmazenamentoJson(DATA_FILE, lazy=CARREGAMENTO_LAZY, compacto=JSON_COMPACTO)
+    raise ValueError(f"Modo de persistência desconhecido: {MODO_PERSISTENCIA}")
+
+def _get_armazenamento():
+    global _armazenamento, _config_armazenamento
+    config = (MODO_PERSISTENCIA, DATA_FILE, CARREGAMENTO_LAZY, JSON_COMPACTO, GROUP_COMMIT)
+    if _armazenamento is None or _config_armazenamento != config:
+        if _armazenamento is not None:
+            _armazenamento.fechar()
+        _armazenamento = _criar_armazenamento()
+        _config_armazenamento = config
+    return _armazenamento
+
+class _Adiamento:
+    """Contas alteradas dentro de um bloco `persistencia_adiada`, gravadas ao sair dele."""
+    __slots__ = ("cpfs", "completo", "descartado", "resultado")
+
+    def __init__(self):
+        self.cpfs = set()
+        self.completo = False
+        self.descartado = False
+        self.resultado: Tuple[bool, str] = (True, "Nada a salvar.")
+
+    def descartar(self):
+        """Sai do bloco sem gravar (as alterações já foram desfeitas por quem chamou)."""
+        self.descartado = True
+
+_local = threading.local()
+
+@contextmanager
+def persistencia_adiada():
+    """
+    Dentro do bloco, salvar_dados (nesta thread) só anota as contas
+    alteradas; ao sair, uma única gravação cobre todas. Blocos aninhados
+    pertencem ao mais externo. O resultado da gravação fica em `resultado`.
+    Se o bloco terminar com uma exceção, nada é gravado.
+    """
+    adiamento = getattr(_local, "adiamento", None)
+    if adiamento is not None:
+        yield adiamento
+        return
+    adiamento = _local.adiamento = _Adiamento()
     try:
-        dados_para_salvar = {}
-        for cpf, user_data in users.items():
-            dados_para_salvar[cpf] = user_data.copy()
-            if isinstance(user_data.get("data_contagem"), date):
-                dados_para_salvar[cpf]["data_contagem"] = user_data["data_contagem"].isoformat()
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(dados_para_salvar, f, indent=2, ensure_ascii=False)
-        return True, "Dados salvos com sucesso!"
+        yield adiamento
+    except BaseException:
+        # Um estado deixado pela metade por uma exceção não deve chegar ao disco
+        adiamento.descartar()
+        raise
+    finally:
+        _local.adiamento = None
+        if not adiamento.descartado and (adiamento.completo or adiamento.cpfs):
+            adiamento.resultado = salvar_dados(*(() if adiamento.completo else adiamento.cpfs))
+
+def salvar_dados(*cpfs: str) -> Tuple[bool, str]:
+    """Persiste os dados; `cpfs` indica as contas alteradas (nenhum = todas)."""
+    adiamento = getattr(_local, "adiamento", None)
+    if adiamento is not None:
+        if cpfs:
+            adiamento.cpfs.update(cpfs)
+        else:
+            adiamento.completo = True
+        return True, "Gravação adiada."
+    if _erro_carga is not None:
+        return False, f"Dados não foram carregados; nada foi salvo para não sobrescrevê-los ({_erro_carga})"
+    try:
+        inicio = time.perf_counter()
+        armazenamento = _get_armazenamento()
+        if isinstance(armazenamento, GroupCommit):
+            # O group commit foi feito para receber salvamentos concorrentes e agrupá-los
+            escritos = armazenamento.salvar(users, cpfs or None)
+        else:
+            with _trava_gravacao:
+                escritos = armazenamento.salvar(users, cpfs or None)
+        segundos = time.perf_counter() - inicio
+        ultima_gravacao.update(bytes=escritos, segundos=segundos)
+        if escritos is None:
+            return True, f"Dados salvos com sucesso! ({segundos * 1000:.1f} ms)"
+        return True, f"Dados salvos com sucesso! ({escritos} bytes em {segundos * 1000:.1f} ms)"
     except Exception as e:
         return False, f"Erro ao salvar dados: {e}"
 
 def carregar_dados():
-    global users
-    if not os.path.exists(DATA_FILE):
-        return False, "Arquivo de dados não encontrado."
+    global users, _armazenamento, _erro_carga
+    _erro_carga = None
     try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            dados_carregados = json.load(f)
-        for cpf, user_data in dados_carregados.items():
-            if isinstance(user_data.get("data_contagem"), str):
-                user_data["data_contagem"] = date.fromisoformat(user_data["data_contagem"])
-            # Garante que usuários antigos tenham a estrutura de portfólio
-            if "portfolio" not in user_data:
-                user_data["portfolio"] = {"cripto": {}, "acoes": {}}
-        users = dados_carregados
+        if _armazenamento is not None:
+            _armazenamento.fechar()
+            _armazenamento = None
+        armazenamento = _get_armazenamento()
+        if not armazenamento.existe():
+            return False, "Arquivo de dados não encontrado."
+        # Nos modos sqlite, binario ou lazy `users` é um mapa sob demanda: nenhuma conta é lida aqui
+        users = armazenamento.carregar()
+        _indices_lancamentos.clear()
         return True, "Dados carregados com sucesso!"
     except Exception as e:
         users = {}
+        _erro_carga = str(e)
         return False, f"Erro ao carregar dados: {e}"
 
 # --- Lógica de Mercado ---
+MERCADO = FeedMercado(SIMULATED_MARKET, tick_segundos=MERCADO_TICK_SEGUNDOS, validade_ticks=MERCADO_VALIDADE_TICKS,
+                      semente=MERCADO_SEMENTE, segredo=MERCADO_SEGREDO.encode('utf-8'))
+
 def get_market_prices() -> Dict[str, Any]:
-    """Simula a flutuação dos preços do mercado."""
-    market_now = {}
-    for category, assets in SIMULATED_MARKET.items():
-        market_now[category] = {}
-        for asset, data in assets.items():
-            price = data["price"]
-            volatility = data["volatility"]
-            change = random.uniform(-volatility, volatility)
-            new_price = price * (1 + change)
-            market_now[category][asset] = round(new_price, 2)
-    return market_now
+    """Preços da cotação vigente (os mesmos para todos até o próximo tick; não altere)."""
+    return MERCADO.cotacao().precos
+
+def get_cotacao(versao: Optional[int] = None) -> Optional[Cotacao]:
+    """Cotação vigente com a sua versão, ou a da `versao` pedida (None se expirou)."""
+    return MERCADO.cotacao(versao)
+
+def cotar(usuario_cpf: str) -> Tuple[str, Cotacao]:
+    """Cotação vigente e o token com que `usuario_cpf` negocia pelo preço dela."""
+    return MERCADO.emitir(usuario_cpf)
+
+def _preco_negociado(usuario_cpf: str, categoria: str, ativo: str, token_cotacao: Optional[str],
+                     compra: bool) -> Tuple[Optional[float], str]:
+    """
+    Preço da negociação: o da cotação do token ou, sem ele, o vigente. Um
+    preço fixado que ficou melhor para o cliente que o vigente é recusado:
+    escolher entre as cotações válidas não pode render lucro garantido.
+    """
+    vigente = MERCADO.cotacao().precos[categoria][ativo]
+    if token_cotacao is None:
+        return vigente, ""
+    cotacao = MERCADO.resgatar(token_cotacao, usuario_cpf)
+    if cotacao is None:
+        return None, "Cotação inválida ou expirada; consulte os preços novamente."
+    preco = cotacao.precos[categoria][ativo]
+    if (preco < vigente) if compra else (preco > vigente):
+        return None, "O preço mudou; consulte os preços novamente."
+    return preco, ""
+
+# --- Concorrência ---
+# Travas por conta, distribuídas em faixas pelo hash do CPF: contas diferentes
+# quase sempre caem em travas diferentes e o número de travas não cresce
+NUM_TRAVAS = 4096
+_travas = [threading.RLock() for _ in range(NUM_TRAVAS)]
+
+@contextmanager
+def travar_contas(*cpfs: str):
+    """
+    Trava as contas dadas durante o bloco. As travas são sempre adquiridas
+    em ordem crescente de índice, então duas operações que envolvem as
+    mesmas contas (um PIX de A para B e outro de B para A) não entram em
+    deadlock. As travas são reentrantes.
+    """
+    indices = sorted({hash(cpf) % NUM_TRAVAS for cpf in cpfs})
+    for indice in indices:
+        _travas[indice].acquire()
+    try:
+        yield
+    finally:
+        for indice in reversed(indices):
+            _travas[indice].release()
 
 # --- Gestão de Usuários ---
+def _validar_cadastro(cpf: str, nome: str, email: str, telefone: str, senha: str, confirma_senha: str) -> Optional[str]:
+    """Valida os campos do cadastro (sem consultar `users`); retorna a mensagem de erro ou None."""
+    if not validar_cpf(cpf): return "CPF inválido!"
+    return _validar_campos(nome, email, telefone, senha, confirma_senha)
+
+def _validar_campos(nome: str, email: str, telefone: str, senha: str, confirma_senha: str) -> Optional[str]:
+    if not nome.strip(): return "Nome é obrigatório!"
+    if not validar_email(email): return "Email inválido!"
+    if not validar_telefone(telefone): return "Telefone inválido!"
+    if not (senha.isdigit() and len(senha) == 4): return "Senha inválida! Deve ter 4 dígitos."
+    if senha != confirma_senha: return "Senhas não coincidem!"
+    return None
+
+def _nova_conta(nome: str, email: str, telefone: str, senha: str, data_cadastro: str) -> Conta:
+    return Conta(
+        senha=senha, saldo=0.0, numero_saques=0, numero_transacoes_dia=0,
+        data_contagem=datetime.now(TZ).date(), nome=nome, email=email, telefone=telefone,
+        data_cadastro=data_cadastro,
+        status="ativo",
+    )
+
 def registrar_usuario(cpf: str, nome: str, email: str, telefone: str, senha: str, confirma_senha: str) -> Tuple[bool, str]:
-    if not validar_cpf(cpf): return False, "CPF inválido!"
-    if cpf in users: return False, "CPF já cadastrado!"
-    if not nome.strip(): return False, "Nome é obrigatório!"
-    if not validar_email(email): return False, "Email inválido!"
-    if not validar_telefone(telefone): return False, "Telefone inválido!"
-    if not (senha.isdigit() and len(senha) == 4): return False, "Senha inválida! Deve ter 4 dígitos."
-    if senha != confirma_senha: return False, "Senhas não coincidem!"
-
-    users[cpf] = {
-        "senha": senha, "saldo": 0.0, "extrato": "",
-        "numero_saques": 0, "numero_transacoes_dia": 0,
-        "data_contagem": date.today(), "nome": nome, "email": email, "telefone": telefone,
-        "data_cadastro": datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S"),
-        "status": "ativo",
-        "portfolio": {
-            "cripto": {},
-            "acoes": {}
-        }
-    }
-    salvar_dados()
-    return True, "Usuário cadastrado com sucesso!"
+    with travar_contas(cpf):
+        if not validar_cpf(cpf): return False, "CPF inválido!"
+        if cpf in users: return False, "CPF já cadastrado!"
+        erro = _validar_cadastro(cpf, nome, email, telefone, senha, confirma_senha)
+        if erro: return False, erro
+
+        users[cpf] = _nova_conta(nome, email, telefone, senha, datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S"))
+        salvar_dados(cpf)
+        return True, "Usuário cadastrado com sucesso!"
+
+# Abaixo disso a validação em lote roda no próprio processo
+LOTE_MINIMO_PARALELO = 20_000
+REGISTROS_POR_TAREFA = 5_000
+
+def _campos_cadastro(registro: Dict[str, str]) -> Tuple[str, str, str, str, str, str]:
+    senha = registro.get("senha", "")
+    return (registro.get("cpf", ""), registro.get("nome", ""), registro.get("email", ""),
+            registro.get("telefone", ""), senha, registro.get("confirma_senha", senha))
+
+def _validar_registros(registros: List[Dict[str, str]]) -> List[Optional[str]]:
+    campos = []
+    for registro in registros:
+        try:
+            campos.append(_campos_cadastro(registro))
+        except AttributeError:
+            campos.append(None)
+    # Os CPFs do lote são validados de uma vez, sem passar pelo cache de validar_cpf
+    cpfs_validos = validar_cpfs([c[0] if c is not None and isinstance(c[0], str) else "" for c in campos])
+    erros = []
+    for registro, cpf_valido in zip(campos, cpfs_validos):
+        try:
+            if registro is None:
+                erros.append("Registro malformado!")
+            elif not cpf_valido:
+                erros.append("CPF inválido!")
+            else:
+                erros.append(_validar_campos(*registro[1:]))
+        except (AttributeError, TypeError):
+            erros.append("Registro malformado!")
+    return erros
+
+def registrar_usuarios_em_lote(registros: Iterable[Dict[str, str]],
+                               processos: Optional[int] = None) -> Tuple[bool, str, List[Tuple[int, str]]]:
+    """
+    Cadastra vários usuários de uma vez. Cada registro é um dicionário com
+    cpf, nome, email, telefone, senha e, opcionalmente, confirma_senha. Os
+    registros são validados (em vários processos, se forem muitos), os válidos
+    são inseridos e tudo é salvo numa única gravação. Retorna o sucesso, um
+    resumo e a lista (posição do registro, erro) dos rejeitados.
+    """
+    registros = list(registros)
+    if len(registros) < LOTE_MINIMO_PARALELO or processos == 1:
+        validacao = _validar_registros(registros)
+    else:
+        partes = [registros[inicio:inicio + REGISTROS_POR_TAREFA]
+                  for inicio in range(0, len(registros), REGISTROS_POR_TAREFA)]
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            validacao = [erro for parte in executor.map(_validar_registros, partes) for erro in parte]
+
+    data_cadastro = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
+    rejeitados, novos, vistos = [], [], set()
+    for posicao, (registro, erro) in enumerate(zip(registros, validacao)):
+        if erro is None:
+            cpf, nome, email, telefone, senha, _ = _campos_cadastro(registro)
+            with travar_contas(cpf):
+                if cpf in vistos:
+                    erro = "CPF repetido no lote!"
+                elif cpf in users:
+                    erro = "CPF já cadastrado!"
+                else:
+                    users[cpf] = _nova_conta(nome, email, telefone, senha, data_cadastro)
+                    novos.append(cpf)
+                    vistos.add(cpf)
+                    continue
+        rejeitados.append((posicao, erro))
+
+    if novos:
+        sucesso, mensagem = salvar_dados(*novos)
+        if not sucesso:
+            return False, mensagem, rejeitados
+    return True, f"{len(novos)} usuários cadastrados, {len(rejeitados)} rejeitados.", rejeitados
 
 def login_user(cpf: str, senha: str) -> Tuple[bool, str, Optional[str]]:
-    user = users.get(cpf)
-    if user and user["senha"] == senha:
-        if user.get("status") == "bloqueado":
-            return False, "Conta bloqueada!", None
-        hoje = date.today()
-        if user.get("data_contagem") != hoje:
-            user["numero_transacoes_dia"] = 0
-            user["numero_saques"] = 0
-            user["data_contagem"] = hoje
-            salvar_dados()
-        return True, f"Login bem-sucedido!", cpf
-    return False, "CPF ou senha inválidos!", None
-
-def get_user_data(cpf: str) -> Optional[Dict[str, Any]]:
+    with travar_contas(cpf):
+        user = users.get(cpf)
+        if user is not None and user.senha == senha:
+            if user.status == "bloqueado":
+                return False, "Conta bloqueada!", None
+            # Nada a gravar: os contadores diários valem para o dia em data_contagem
+            # e viram zero sozinhos num dia novo (ver get_contadores_do_dia)
+            return True, f"Login bem-sucedido!", cpf
+        return False, "CPF ou senha inválidos!", None
+
+def get_user_data(cpf: str) -> Optional[Conta]:
     return users.get(cpf)
 
+def get_contadores_do_dia(cpf: str) -> Tuple[int, int]:
+    """(transações, saques) de hoje; calculados na leitura, sem gravar a virada do dia."""
+    return LIMITES.contadores_do_dia(users[cpf], datetime.now(TZ).date())
+
 # --- Operações Financeiras ---
-def depositar(usuario_cpf: str, valor: float) -> Tuple[bool, str]:
-    if valor <= 0: return False, "Valor de depósito inválido."
-    user_data = users[usuario_cpf]
-    if user_data["numero_transacoes_dia"] >= LIMITE_TRANSACOES_DIARIAS:
-        return False, f"Limite diário de transações atingido!"
-    timestamp = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
-    user_data["saldo"] += valor
-    user_data["extrato"] += f"{timestamp} - Depósito: +R$ {valor:.2f}\n"
-    user_data["numero_transacoes_dia"] += 1
-    salvar_dados()
-    return True, f"Depósito de R$ {valor:.2f} realizado!"
-
-def sacar(usuario_cpf: str, valor: float) -> Tuple[bool, str]:
-    user_data = users[usuario_cpf]
-    if user_data["numero_transacoes_dia"] >= LIMITE_TRANSACOES_DIARIAS: return False, f"Limite diário de transações atingido!"
-    if user_data["numero_saques"] >= LIMITE_SAQUES_DIARIOS: return False, f"Limite de saques diários atingido!"
-    if valor <= 0: return False, "Valor de saque inválido."
-    if valor > user_data["saldo"]: return False, "Saldo insuficiente."
-    if valor > LIMITE_SAQUE: return False, f"Limite por saque: R$ {LIMITE_SAQUE:.2f}."
-    timestamp = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
-    user_data["saldo"] -= valor
-    user_data["extrato"] += f"{timestamp} - Saque: -R$ {valor:.2f}\n"
-    user_data["numero_saques"] += 1
-    user_data["numero_transacoes_dia"] += 1
-    salvar_dados()
-    return True, f"Saque de R$ {valor:.2f} realizado!"
-
-def pix(usuario_cpf: str, destino_cpf: str, valor: float) -> Tuple[bool, str]:
-    user_data = users[usuario_cpf]
-    if not validar_cpf(destino_cpf): return False, "CPF do destinatário inválido!"
-    if destino_cpf not in users: return False, "CPF do destinatário não encontrado."
-    if usuario_cpf == destino_cpf: return False, "Não é possível enviar PIX para si mesmo."
-    if valor > user_data["saldo"]: return False, "Saldo insuficiente."
-    # ... (outras validações de limite e horário)
-    timestamp = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
-    user_data["saldo"] -= valor
-    user_data["extrato"] += f"{timestamp} - PIX Enviado para {destino_cpf}: -R$ {valor:.2f}\n"
-    users[destino_cpf]["saldo"] += valor
-    users[destino_cpf]["extrato"] += f"{timestamp} - PIX Recebido de {usuario_cpf}: +R$ {valor:.2f}\n"
-    salvar_dados()
-    return True, f"PIX de R$ {valor:.2f} enviado!"
-
-def get_extrato(usuario_cpf: str) -> Tuple[str, float]:
+def _lancar(user_data: Conta, timestamp: str, tipo: str, centavos: int, contraparte: Optional[str] = None,
+            quantidade: Optional[float] = None, preco: Optional[float] = None):
+    """
+    Move `centavos` (com sinal) no saldo da conta, acrescenta o lançamento ao
+    extrato e o soma aos totais diários e mensais gravados com a conta.
+    """
+    user_data.saldo_centavos += centavos
+    user_data.lancamentos.append(Lancamento(timestamp, tipo, centavos / 100, user_data.saldo, contraparte, quantidade, preco))
+    _resumo(user_data).atualizar()
+
+def _centavos(valor: float, quantidade: float = 1) -> Optional[int]:
+    """Centavos de um valor recebido de fora; None se não for um número finito até MAX_CENTAVOS."""
+    try:
+        return para_centavos(valor, quantidade)
+    except (TypeError, ValueError, ArithmeticError):
+        return None
+
+def _quantidade_valida(quantidade: float) -> bool:
+    if isinstance(quantidade, bool):
+        return False
+    try:
+        return math.isfinite(quantidade) and quantidade > 0
+    except TypeError:
+        return False
+
+def _cabe_no_saldo(user_data: Conta, centavos: int) -> bool:
+    return user_data.saldo_centavos + centavos <= MAX_CENTAVOS
+
+# --- Idempotência ---
+# Cada conta guarda em "idempotencia" as chaves das suas últimas operações
+# bem-sucedidas: chave -> [expira em, operação, resultado, parâmetros]. A chave é
+# anotada antes de salvar_dados, então vai para o disco na mesma gravação da operação.
+def _repeticao(user_data: Conta, chave: Optional[str], operacao: str,
+               parametros: tuple) -> Optional[Tuple[bool, str]]:
+    """
+    Resultado original se a chave já foi usada (e não expirou) nesta conta. A
+    mesma chave com outra operação ou outros parâmetros (valor, destino...) é recusada.
+    """
+    if chave is None:
+        return None
+    cache = user_data.get("idempotencia")
+    registro = cache.get(chave) if cache else None
+    if registro is None or registro[0] < time.time():
+        return None
+    if registro[1] != operacao:
+        return False, "Chave de idempotência já usada em outra operação."
+    # Registros gravados antes dos parâmetros serem anotados só comparam a operação
+    if len(registro) > 3 and registro[3] != list(parametros):
+        return False, "Chave de idempotência já usada com outros parâmetros."
+    return tuple(registro[2])
+
+def _memorizar(user_data: Conta, chave: Optional[str], operacao: str, parametros: tuple,
+               resultado: Tuple[bool, str]) -> Tuple[bool, str]:
+    if chave is None:
+        return resultado
+    agora = time.time()
+    cache = user_data.get("idempotencia") or {}
+    cache.pop(chave, None)
+    # Inseridas em ordem de expiração: as expiradas e as excedentes estão no início
+    while cache and (len(cache) >= IDEMPOTENCIA_MAX_CHAVES or next(iter(cache.values()))[0] < agora):
+        del cache[next(iter(cache))]
+    cache[chave] = [agora + IDEMPOTENCIA_TTL, operacao, list(resultado), list(parametros)]
+    user_data["idempotencia"] = cache
+    return resultado
+
+def _esquecer_chave(user_data: Conta, chave: Optional[str]):
+    """Remove a chave, para que a operação desfeita depois de memorizada possa ser repetida."""
+    cache = user_data.get("idempotencia")
+    if chave is None or not cache or cache.pop(chave, None) is None:
+        return
+    if cache:
+        user_data["idempotencia"] = cache
+    else:
+        user_data.pop("idempotencia", None)
+
+def depositar(usuario_cpf: str, valor: float, chave_idempotencia: Optional[str] = None) -> Tuple[bool, str]:
+    with travar_contas(usuario_cpf):
+        centavos = _centavos(valor)
+        if centavos is None or centavos <= 0: return False, "Valor de depósito inválido."
+        user_data = users[usuario_cpf]
+        repetido = _repeticao(user_data, chave_idempotencia, "depositar", (valor,))
+        if repetido is not None: return repetido
+        if not _cabe_no_saldo(user_data, centavos): return False, "Depósito ultrapassa o saldo máximo da conta."
+        agora = datetime.now(TZ)
+        erro = LIMITES.verificar(user_data, "depositar", centavos, agora)
+        if erro: return False, erro
+        _lancar(user_data, agora.strftime("%Y-%m-%d %H:%M:%S"), DEPOSITO, centavos)
+        LIMITES.registrar(user_data, "depositar", centavos, agora)
+        resultado = _memorizar(user_data, chave_idempotencia, "depositar", (valor,), (True, f"Depósito de R$ {valor:.2f} realizado!"))
+        salvar_dados(usuario_cpf)
+        return resultado
+
+def sacar(usuario_cpf: str, valor: float, chave_idempotencia: Optional[str] = None) -> Tuple[bool, str]:
+    with travar_contas(usuario_cpf):
+        user_data = users[usuario_cpf]
+        repetido = _repeticao(user_data, chave_idempotencia, "sacar", (valor,))
+        if repetido is not None: return repetido
+        centavos = _centavos(valor)
+        if centavos is None or centavos <= 0: return False, "Valor de saque inválido."
+        agora = datetime.now(TZ)
+        erro = LIMITES.verificar(user_data, "sacar", centavos, agora)
+        if erro: return False, erro
+        if centavos > user_data.saldo_centavos: return False, "Saldo insuficiente."
+        _lancar(user_data, agora.strftime("%Y-%m-%d %H:%M:%S"), SAQUE, -centavos)
+        LIMITES.registrar(user_data, "sacar", centavos, agora)
+        resultado = _memorizar(user_data, chave_idempotencia, "sacar", (valor,), (True, f"Saque de R$ {valor:.2f} realizado!"))
+        salvar_dados(usuario_cpf)
+        return resultado
+
+def pix(usuario_cpf: str, destino_cpf: str, valor: float, chave_idempotencia: Optional[str] = None) -> Tuple[bool, str]:
+    with travar_contas(usuario_cpf, destino_cpf):
+        user_data = users[usuario_cpf]
+        repetido = _repeticao(user_data, chave_idempotencia, "pix", (destino_cpf, valor))
+        if repetido is not None: return repetido
+        if not validar_cpf(destino_cpf): return False, "CPF do destinatário inválido!"
+        if destino_cpf not in users: return False, "CPF do destinatário não encontrado."
+        if usuario_cpf == destino_cpf: return False, "Não é possível enviar PIX para si mesmo."
+        centavos = _centavos(valor)
+        if centavos is None or centavos <= 0: return False, "Valor de PIX inválido."
+        agora = datetime.now(TZ)
+        erro = LIMITES.verificar(user_data, "pix", centavos, agora)
+        if erro: return False, erro
+        if centavos > user_data.saldo_centavos: return False, "Saldo insuficiente."
+        if not _cabe_no_saldo(users[destino_cpf], centavos): return False, "PIX ultrapassa o saldo máximo do destinatário."
+        timestamp = agora.strftime("%Y-%m-%d %H:%M:%S")
+        _lancar(user_data, timestamp, PIX_ENVIADO, -centavos, destino_cpf)
+        _lancar(users[destino_cpf], timestamp, PIX_RECEBIDO, centavos, usuario_cpf)
+        LIMITES.registrar(user_data, "pix", centavos, agora)
+        resultado = _memorizar(user_data, chave_idempotencia, "pix", (destino_cpf, valor), (True, f"PIX de R$ {valor:.2f} enviado!"))
+        salvar_dados(usuario_cpf, destino_cpf)
+        return resultado
+
+def get_lancamentos(usuario_cpf: str, limite: Optional[int] = None, offset: int = 0,
+                    cursor: Optional[int] = None) -> Tuple[List[Lancamento], Optional[int]]:
+    """
+    Janela do extrato contada a partir do lançamento mais recente, em ordem
+    cronológica. `offset` pula os `offset` lançamentos mais novos; `cursor` é a
+    posição devolvida pela página anterior e continua válido mesmo que novos
+    lançamentos sejam feitos. Retorna os lançamentos e o cursor da próxima
+    página (None quando não há mais lançamentos antigos).
+    A lista é indexada por posição, então o custo depende só do tamanho da janela.
+    """
+    lancamentos = users[usuario_cpf].lancamentos
+    fim = len(lancamentos) if cursor is None else min(cursor, len(lancamentos))
+    fim = max(fim - max(offset, 0), 0)
+    inicio = 0 if limite is None else max(fim - max(limite, 0), 0)
+    return lancamentos[inicio:fim], inicio if inicio > 0 else None
+
+def consultar_lancamentos(usuario_cpf: str, inicio: Optional[Momento] = None, fim: Optional[Momento] = None,
+                          tipos: Optional[Iterable[str]] = None, contraparte: Optional[str] = None) -> List[Lancamento]:
+    """
+    Lançamentos da conta entre `inicio` e `fim` (inclusive; datas cobrem o dia
+    inteiro), opcionalmente só dos `tipos` e da `contraparte` (CPF ou ativo) pedidos.
+    """
+    lancamentos = users[usuario_cpf].lancamentos
+    indice = _indices_lancamentos.get(usuario_cpf)
+    if indice is None or indice.lancamentos is not lancamentos:
+        indice = _indices_lancamentos[usuario_cpf] = IndiceLancamentos(lancamentos)
+    if isinstance(tipos, str):
+        tipos = (tipos,)
+    return indice.consultar(inicio, fim, tipos, contraparte)
+
+def _resumo(user_data: Conta) -> ResumoLancamentos:
+    """Totais da conta, montados ao carregá-la; uma conta sem eles (ex.: cópia de outro processo) soma o histórico uma vez."""
+    resumo = user_data.resumo
+    if resumo is None or resumo.lancamentos is not user_data.lancamentos:
+        resumo = user_data.resumo = ResumoLancamentos(user_data.lancamentos)
+    return resumo
+
+def get_resumo_mensal(usuario_cpf: str, inicio: Optional[str] = None,
+                      fim: Optional[str] = None) -> List[Tuple[str, Dict[str, float]]]:
+    """Totais por mês ("AAAA-MM") de depósitos, saques, PIX, compras, vendas e operações."""
+    with travar_contas(usuario_cpf):
+        resumo = _resumo(users[usuario_cpf])
+        return resumo.periodos(resumo.mensal, inicio, fim)
+
+def get_resumo_diario(usuario_cpf: str, inicio: Optional[str] = None,
+                      fim: Optional[str] = None) -> List[Tuple[str, Dict[str, float]]]:
+    """Totais por dia ("AAAA-MM-DD"); `inicio` e `fim` aceitam também um mês inteiro ("AAAA-MM")."""
+    with travar_contas(usuario_cpf):
+        resumo = _resumo(users[usuario_cpf])
+        return resumo.periodos(resumo.diario, inicio, fim)
+
+def get_extrato(usuario_cpf: str, limite: Optional[int] = None, offset: int = 0,
+                cursor: Optional[int] = None) -> Tuple[str, float]:
+    """Extrato textual; com `limite`, `offset` ou `cursor` renderiza só a janela pedida (ver get_lancamentos)."""
     user_data = users[usuario_cpf]
-    saldo = user_data.get("saldo", 0.0)
-    extrato = user_data.get("extrato", "Sem movimentações.")
+    saldo = user_data.saldo
+    lancamentos, _ = get_lancamentos(usuario_cpf, limite, offset, cursor)
+    extrato = renderizar_extrato(lancamentos)
     return extrato if extrato.strip() else "Sem movimentações.", saldo
 
+# --- Custódia e Conciliação ---
+def total_em_custodia() -> float:
+    """Soma dos saldos das contas em memória, numa única passada pela coluna de saldos."""
+    return SALDOS.total_centavos() / 100
+
+def reconciliar() -> Tuple[bool, str]:
+    """
+    Confere, numa passada, se o saldo de cada conta em memória bate com o
+    saldo após o último lançamento do extrato e se a soma das contas bate com
+    o total da coluna de saldos.
+    """
+    divergentes, soma = [], 0
+    for cpf, user_data in list(contas_em_memoria(users).items()):
+        soma += user_data.saldo_centavos
+        if user_data.lancamentos and user_data.lancamentos[-1].saldo_apos is not None:
+            if para_centavos(user_data.lancamentos[-1].saldo_apos) != user_data.saldo_centavos:
+                divergentes.append(cpf)
+    if soma != SALDOS.total_centavos():
+        return False, f"Soma das contas (R$ {soma / 100:.2f}) difere da coluna de saldos (R$ {total_em_custodia():.2f})."
+    if divergentes:
+        return False, f"Saldo diverge do extrato em {len(divergentes)} conta(s): {', '.join(divergentes[:10])}"
+    return True, f"Conciliação ok: R$ {soma / 100:.2f} em custódia."
+
+# --- Exportação do Extrato ---
+def exportar_extrato(usuario_cpf: str, destino, formato: str = "csv", inicio: Optional[Momento] = None,
+                     fim: Optional[Momento] = None) -> Tuple[bool, str]:
+    """Grava o extrato em CSV ou OFX no caminho ou arquivo `destino`, em fluxo."""
+    try:
+        user_data = users[usuario_cpf]
+        total = exportar(user_data.lancamentos, destino, formato, usuario_cpf,
+                         user_data.saldo, inicio, fim)
+        return True, f"{total} lançamentos exportados!"
+    except Exception as e:
+        return False, f"Erro ao exportar extrato: {e}"
+
+def _contas_para_exportar():
+    for cpf in list(users):
+        # Em mapas sob demanda a conta é lida e descartada, sem encher o cache
+        user_data = users.ler(cpf) if isinstance(users, ContasLazy) else users.get(cpf)
+        if user_data is not None:
+            yield cpf, user_data.saldo, user_data.lancamentos
+
+def exportar_todos_extratos(diretorio: str, formato: str = "csv", inicio: Optional[Momento] = None,
+                            fim: Optional[Momento] = None, processos: Optional[int] = None) -> Tuple[bool, str]:
+    """Exporta o extrato de todas as contas para `diretorio/<cpf>.<formato>` usando vários processos."""
+    try:
+        resultado = exportar_contas(_contas_para_exportar(), diretorio, formato, inicio, fim, processos)
+        return True, f"{len(resultado)} extratos exportados ({sum(resultado.values())} lançamentos)!"
+    except Exception as e:
+        return False, f"Erro ao exportar extratos: {e}"
+
 # --- Operações de Investimento ---
-def comprar_investimento(usuario_cpf: str, categoria: str, ativo: str, quantidade: float) -> Tuple[bool, str]:
-    user_data = users[usuario_cpf]
-    precos_atuais = get_market_prices()
-    preco_unitario = precos_atuais[categoria][ativo]
-    custo_total = preco_unitario * quantidade
+def comprar_investimento(usuario_cpf: str, categoria: str, ativo: str, quantidade: float,
+                         chave_idempotencia: Optional[str] = None, token_cotacao: Optional[str] = None) -> Tuple[bool, str]:
+    """Compra ao preço da cotação do `token_cotacao` (a que o usuário viu, ver `cotar`) ou, sem ele, da vigente."""
+    with travar_contas(usuario_cpf):
+        user_data = users[usuario_cpf]
+        repetido = _repeticao(user_data, chave_idempotencia, "comprar", (categoria, ativo, quantidade))
+        if repetido is not None: return repetido
+        if not _quantidade_valida(quantidade): return False, "Quantidade inválida."
+        preco_unitario, erro = _preco_negociado(usuario_cpf, categoria, ativo, token_cotacao, compra=True)
+        if preco_unitario is None: return False, erro
+        custo_centavos = _centavos(preco_unitario, quantidade)
+        if custo_centavos is None: return False, "Valor da compra inválido."
+        agora = datetime.now(TZ)
+        erro = LIMITES.verificar(user_data, "comprar", custo_centavos, agora)
+        if erro: return False, erro
 
-    if user_data["saldo"] < custo_total:
-        return False, "Saldo insuficiente para a compra."
+        if user_data.saldo_centavos < custo_centavos:
+            return False, "Saldo insuficiente para a compra."
 
-    # Deduz do saldo e adiciona ao extrato
-    user_data["saldo"] -= custo_total
-    timestamp = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
-    user_data["extrato"] += f"{timestamp} - Compra {ativo}: {quantidade} un. a R$ {preco_unitario:.2f} (-R$ {custo_total:.2f})\n"
+        # Deduz do saldo e adiciona ao extrato
+        _lancar(user_data, agora.strftime("%Y-%m-%d %H:%M:%S"), COMPRA, -custo_centavos, ativo, quantidade, preco_unitario)
+        LIMITES.registrar(user_data, "comprar", custo_centavos, agora)
 
-    # Adiciona ao portfólio
-    portfolio_cat = user_data["portfolio"][categoria]
-    portfolio_cat[ativo] = portfolio_cat.get(ativo, 0) + quantidade
+        # Adiciona ao portfólio
+        portfolio_cat = user_data.portfolio[categoria]
+        portfolio_cat[ativo] = portfolio_cat.get(ativo, 0) + quantidade
     
-    salvar_dados()
-    return True, f"Compra de {quantidade} {ativo} realizada com sucesso!"
+        resultado = _memorizar(user_data, chave_idempotencia, "comprar", (categoria, ativo, quantidade),
+                               (True, f"Compra de {quantidade} {ativo} realizada com sucesso!"))
+        salvar_dados(usuario_cpf)
+        return resultado
 
-def vender_investimento(usuario_cpf: str, categoria: str, ativo: str, quantidade: float) -> Tuple[bool, str]:
-    user_data = users[usuario_cpf]
-    portfolio_cat = user_data["portfolio"][categoria]
+def vender_investimento(usuario_cpf: str, categoria: str, ativo: str, quantidade: float,
+                        chave_idempotencia: Optional[str] = None, token_cotacao: Optional[str] = None) -> Tuple[bool, str]:
+    """Vende ao preço da cotação do `token_cotacao` (a que o usuário viu, ver `cotar`) ou, sem ele, da vigente."""
+    with travar_contas(usuario_cpf):
+        user_data = users[usuario_cpf]
+        repetido = _repeticao(user_data, chave_idempotencia, "vender", (categoria, ativo, quantidade))
+        if repetido is not None: return repetido
+        if not _quantidade_valida(quantidade): return False, "Quantidade inválida."
+        portfolio_cat = user_data.portfolio[categoria]
 
-    if ativo not in portfolio_cat or portfolio_cat[ativo] < quantidade:
-        return False, "Quantidade de ativo insuficiente para a venda."
+        if ativo not in portfolio_cat or portfolio_cat[ativo] < quantidade:
+            return False, "Quantidade de ativo insuficiente para a venda."
 
-    precos_atuais = get_market_prices()
-    preco_unitario = precos_atuais[categoria][ativo]
-    valor_total = preco_unitario * quantidade
+        preco_unitario, erro = _preco_negociado(usuario_cpf, categoria, ativo, token_cotacao, compra=False)
+        if preco_unitario is None: return False, erro
+        valor_centavos = _centavos(preco_unitario, quantidade)
+        if valor_centavos is None: return False, "Valor da venda inválido."
+        if not _cabe_no_saldo(user_data, valor_centavos): return False, "Venda ultrapassa o saldo máximo da conta."
+        agora = datetime.now(TZ)
+        erro = LIMITES.verificar(user_data, "vender", valor_centavos, agora)
+        if erro: return False, erro
 
-    # Deduz do portfólio
-    portfolio_cat[ativo] -= quantidade
-    if portfolio_cat[ativo] == 0:
-        del portfolio_cat[ativo]
+        # Deduz do portfólio
+        portfolio_cat[ativo] -= quantidade
+        if portfolio_cat[ativo] == 0:
+            del portfolio_cat[ativo]
 
-    # Adiciona ao saldo e ao extrato
-    user_data["saldo"] += valor_total
-    timestamp = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
-    user_data["extrato"] += f"{timestamp} - Venda {ativo}: {quantidade} un. a R$ {preco_unitario:.2f} (+R$ {valor_total:.2f})\n"
+        # Adiciona ao saldo e ao extrato
+        _lancar(user_data, agora.strftime("%Y-%m-%d %H:%M:%S"), VENDA, valor_centavos, ativo, quantidade, preco_unitario)
+        LIMITES.registrar(user_data, "vender", valor_centavos, agora)
     
-    salvar_dados()
-    return True, f"Venda de {quantidade} {ativo} realizada com sucesso!"
+        resultado = _memorizar(user_data, chave_idempotencia, "vender", (categoria, ativo, quantidade),
+                               (True, f"Venda de {quantidade} {ativo} realizada com sucesso!"))
+        salvar_dados(usuario_cpf)
+        return resultado
+
+# --- Lotes de Operações ---
+# Nome da operação -> função; os argumentos seguem a assinatura da função
+OPERACOES_LOTE = {
+    "depositar": depositar, "sacar": sacar, "pix": pix,
+    "comprar": comprar_investimento, "vender": vender_investimento,
+}
+
+def _capturar(user_data: Conta) -> tuple:
+    return (user_data.saldo_centavos, len(user_data.lancamentos), user_data.numero_saques,
+            user_data.numero_transacoes_dia, user_data.data_contagem,
+            {categoria: dict(ativos) for categoria, ativos in user_data.portfolio.items()},
+            dict(user_data.get("idempotencia") or {}), dict(user_data.get("limites") or {}))
+
+def _restaurar(user_data: Conta, estado: tuple):
+    (user_data.saldo_centavos, lancamentos, user_data.numero_saques, user_data.numero_transacoes_dia,
+     user_data.data_contagem, user_data.portfolio, idempotencia, limites) = estado
+    _resumo(user_data).descontar(user_data.lancamentos[lancamentos:])
+    del user_data.lancamentos[lancamentos:]
+    # Uma chave anotada ou um limite consumido por operação desfeita não pode sobreviver ao lote
+    for chave, valor in (("idempotencia", idempotencia), ("limites", limites)):
+        if valor:
+            user_data[chave] = valor
+        else:
+            user_data.pop(chave, None)
+
+def executar_lote(operacoes: Iterable[tuple], tudo_ou_nada: bool = False) -> Tuple[bool, str, List[Tuple[bool, str]]]:
+    """
+    Executa em ordem operações como ("depositar", cpf, valor),
+    ("pix", cpf, destino, valor) ou ("comprar", cpf, categoria, ativo,
+    quantidade) (a chave de idempotência, se houver, vai por último), com as
+    mesmas validações das chamadas avulsas, e grava uma
+    única vez no fim. Com `tudo_ou_nada`, a primeira falha desfaz as
+    operações anteriores e nada é gravado; senão as falhas são só reportadas.
+    Retorna o sucesso, um resumo e o resultado de cada operação executada.
+    Com `tudo_ou_nada` todas as contas do lote ficam travadas até o fim,
+    para que nenhuma outra thread altere uma conta que pode ser restaurada.
+    """
+    operacoes = list(operacoes)
+    resultados: List[Tuple[bool, str]] = []
+    estados: Dict[str, tuple] = {}
+    contas = {arg for operacao in operacoes for arg in operacao[1:] if isinstance(arg, str)} if tudo_ou_nada else ()
+    with travar_contas(*contas), persistencia_adiada() as adiamento:
+        for operacao in operacoes:
+            nome, *args = operacao
+            funcao = OPERACOES_LOTE.get(nome)
+            if funcao is None:
+                resultado = (False, f"Operação desconhecida: {nome}")
+            else:
+                if tudo_ou_nada:
+                    for cpf in args:
+                        if isinstance(cpf, str) and cpf not in estados and cpf in users:
+                            estados[cpf] = _capturar(users[cpf])
+                try:
+                    resultado = funcao(*args)
+                except Exception as e:
+                    # Qualquer exceção conta como falha da operação (e desfaz o lote com tudo_ou_nada)
+                    resultado = (False, f"Operação inválida: {e!r}")
+            resultados.append(resultado)
+            if tudo_ou_nada and not resultado[0]:
+                for cpf, estado in estados.items():
+                    _restaurar(users[cpf], estado)
+                adiamento.descartar()
+                return False, f"Operação {len(resultados)} falhou; lote desfeito.", resultados
+    falhas = sum(1 for sucesso, _ in resultados if not sucesso)
+    sucesso, mensagem = adiamento.resultado
+    if not sucesso:
+        return False, mensagem, resultados
+    return falhas == 0, f"{len(resultados) - falhas} operações realizadas, {falhas} falharam.", resultados
 
 # Carregar os dados ao iniciar o módulo
-carregar_dados()
\ No newline at end of file
+if CARGA_INICIAL:
+    carregar_dados()
\ No newline at end of file
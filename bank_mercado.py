@@ -0,0 +1,98 @@
+from collections import OrderedDict
+import hashlib
+import hmac
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+
+class Cotacao(NamedTuple):
+    """Preços de um tick do mercado. `precos` é compartilhado entre os leitores: não altere."""
+    versao: int
+    precos: Dict[str, Dict[str, float]]
+
+
+class FeedMercado:
+    """
+    Feed de preços que avança a cada `tick_segundos`. A versão de uma
+    cotação é o número do tick (segundos desde a época / tick), e os preços
+    de uma versão são sorteados com uma semente derivada dela: qualquer
+    processo com a mesma `semente` calcula a mesma cotação para a mesma
+    versão. A cotação vigente é sorteada uma vez por tick e servida do cache
+    em O(1); as das últimas `validade_ticks` versões continuam disponíveis
+    para que uma negociação use o preço que o usuário viu.
+
+    Como os preços de qualquer versão são previsíveis, uma negociação só fixa
+    o preço de uma cotação emitida para o próprio titular (`emitir`): o token
+    é assinado com `segredo`, e processos com o mesmo segredo aceitam os
+    tokens uns dos outros.
+    """
+
+    def __init__(self, ativos: Dict[str, Dict[str, Dict[str, float]]], tick_segundos: float = 1.0,
+                 validade_ticks: int = 2, semente: int = 0, segredo: bytes = b"",
+                 relogio: Callable[[], float] = time.time):
+        self.ativos = ativos
+        self.tick_segundos = tick_segundos
+        self.validade_ticks = validade_ticks
+        self.semente = semente
+        self.segredo = segredo
+        self.relogio = relogio
+        self._atual: Optional[Cotacao] = None
+        self._cache: "OrderedDict[int, Cotacao]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def versao_atual(self) -> int:
+        return int(self.relogio() // self.tick_segundos)
+
+    def cotacao(self, versao: Optional[int] = None) -> Optional[Cotacao]:
+        """A cotação vigente ou a da `versao` pedida; None se ela expirou ou ainda não existe."""
+        vigente = self.versao_atual()
+        if versao is None:
+            atual = self._atual
+            if atual is not None and atual.versao == vigente:
+                return atual
+            versao = vigente
+        elif not vigente - self.validade_ticks <= versao <= vigente:
+            return None
+        return self._obter(versao)
+
+    def emitir(self, titular: str) -> Tuple[str, Cotacao]:
+        """Cotação vigente e o token que permite a `titular` negociar pelo preço dela."""
+        cotacao = self.cotacao()
+        return f"{cotacao.versao}.{self._assinar(titular, cotacao.versao)}", cotacao
+
+    def resgatar(self, token: str, titular: str) -> Optional[Cotacao]:
+        """Cotação do `token` emitido para `titular`; None se ele é inválido, de outro titular ou expirou."""
+        versao, _, assinatura = str(token).partition(".")
+        try:
+            versao_numero = int(versao)
+        except ValueError:
+            return None
+        if not hmac.compare_digest(assinatura.encode('utf-8'), self._assinar(titular, versao_numero).encode('utf-8')):
+            return None
+        return self.cotacao(versao_numero)
+
+    def _assinar(self, titular: str, versao: int) -> str:
+        return hmac.new(self.segredo, f"{titular}:{versao}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def _obter(self, versao: int) -> Cotacao:
+        with self._lock:
+            cotacao = self._cache.get(versao)
+            if cotacao is None:
+                cotacao = self._cache[versao] = Cotacao(versao, self._sortear(versao))
+                while len(self._cache) > self.validade_ticks + 1:
+                    self._cache.popitem(last=False)
+            if self._atual is None or versao > self._atual.versao:
+                self._atual = cotacao
+            return cotacao
+
+    def _sortear(self, versao: int) -> Dict[str, Dict[str, float]]:
+        aleatorio = random.Random(f"{self.semente}:{versao}")
+        precos: Dict[str, Dict[str, Any]] = {}
+        for categoria, ativos in self.ativos.items():
+            precos[categoria] = {}
+            for ativo, dados in ativos.items():
+                variacao = aleatorio.uniform(-dados["volatility"], dados["volatility"])
+                precos[categoria][ativo] = round(dados["price"] * (1 + variacao), 2)
+        return precos
@@ -0,0 +1,246 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import secrets
+import sys
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import bank_logic as bl
+
+WORKERS_PADRAO = 32
+TAMANHO_MAXIMO_CORPO = 1 << 20
+
+
+class Sessoes:
+    """Tokens de sessão emitidos no login -> CPF do usuário."""
+
+    def __init__(self):
+        self._tokens: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def abrir(self, cpf: str) -> str:
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._tokens[token] = cpf
+        return token
+
+    def cpf(self, token: str) -> Optional[str]:
+        with self._lock:
+            return self._tokens.get(token)
+
+    def fechar(self, token: str):
+        with self._lock:
+            self._tokens.pop(token, None)
+
+
+class ErroRequisicao(Exception):
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _token_cotacao(corpo: Dict[str, Any]) -> Optional[str]:
+    """Token da cotação que o cliente recebeu em GET /mercado, se informado."""
+    return str(corpo["cotacao"]) if corpo.get("cotacao") is not None else None
+
+
+def _resposta(resultado: Tuple[bool, str], **extras) -> Dict[str, Any]:
+    return {"sucesso": resultado[0], "mensagem": resultado[1], **extras}
+
+
+class BancoHandler(BaseHTTPRequestHandler):
+    """Rotas JSON sobre bank_logic. HTTP/1.1: a conexão fica aberta entre requisições."""
+    protocol_version = "HTTP/1.1"
+    # Conexão ociosa por mais que isso é fechada e libera o worker
+    timeout = 30
+    # Cabeçalho e corpo saem em writes separados; com Nagle cada resposta esperaria o ACK atrasado (~40 ms)
+    disable_nagle_algorithm = True
+    server: "ServidorBanco"
+
+    # --- Infraestrutura ---
+    def log_message(self, formato, *args):
+        pass  # uma linha por requisição atrapalharia a medição de carga
+
+    def _corpo(self) -> Dict[str, Any]:
+        try:
+            tamanho = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            tamanho = -1
+        if tamanho < 0 or tamanho > TAMANHO_MAXIMO_CORPO:
+            # O corpo fica sem ler: na mesma conexão ele seria tomado pela próxima requisição
+            self.close_connection = True
+            if tamanho < 0:
+                raise ErroRequisicao(400, "Content-Length inválido.")
+            raise ErroRequisicao(413, "Corpo da requisição grande demais.")
+        if not tamanho:
+            return {}
+        try:
+            corpo = json.loads(self.rfile.read(tamanho))
+        except (ValueError, UnicodeDecodeError):
+            raise ErroRequisicao(400, "JSON inválido.")
+        if not isinstance(corpo, dict):
+            raise ErroRequisicao(400, "O corpo deve ser um objeto JSON.")
+        return corpo
+
+    def _cpf_autenticado(self) -> str:
+        autorizacao = self.headers.get("Authorization", "")
+        cpf = self.server.sessoes.cpf(autorizacao[7:]) if autorizacao.startswith("Bearer ") else None
+        if cpf is None:
+            raise ErroRequisicao(401, "Sessão inválida; faça login.")
+        return cpf
+
+    def _chave(self) -> Optional[str]:
+        """Chave de idempotência do cliente: repetir a requisição com ela devolve o resultado original."""
+        return self.headers.get("Idempotency-Key")
+
+    def _enviar(self, status: int, dados: Dict[str, Any]):
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _despachar(self, metodo: str):
+        url = urlsplit(self.path)
+        rota = ROTAS.get((metodo, url.path))
+        try:
+            # Lê o corpo antes de qualquer erro, para que a conexão continue utilizável
+            corpo = self._corpo()
+            if rota is None:
+                raise ErroRequisicao(404, "Rota não encontrada.")
+            if metodo == "GET":
+                corpo.update({chave: valores[-1] for chave, valores in parse_qs(url.query).items()})
+            self._enviar(200, rota(self, corpo))
+        except ErroRequisicao as e:
+            self._enviar(e.status, {"sucesso": False, "mensagem": str(e)})
+        except (KeyError, TypeError, ValueError) as e:
+            self._enviar(400, {"sucesso": False, "mensagem": f"Parâmetros inválidos: {e}"})
+        except Exception as e:
+            # Responde mesmo a um erro inesperado, em vez de derrubar a conexão keep-alive sem resposta
+            self.log_error("Erro em %s %s: %r", metodo, url.path, e)
+            self._enviar(500, {"sucesso": False, "mensagem": "Erro interno."})
+
+    def do_GET(self):
+        self._despachar("GET")
+
+    def do_POST(self):
+        self._despachar("POST")
+
+    # --- Rotas ---
+    def registrar(self, corpo):
+        return _resposta(bl.registrar_usuario(str(corpo["cpf"]), corpo["nome"], corpo["email"], corpo["telefone"],
+                                              str(corpo["senha"]), str(corpo.get("confirma_senha", corpo["senha"]))))
+
+    def login(self, corpo):
+        sucesso, mensagem, cpf = bl.login_user(str(corpo["cpf"]), str(corpo["senha"]))
+        return _resposta((sucesso, mensagem), token=self.server.sessoes.abrir(cpf) if sucesso else None)
+
+    def logout(self, corpo):
+        self._cpf_autenticado()
+        self.server.sessoes.fechar(self.headers["Authorization"][7:])
+        return _resposta((True, "Sessão encerrada."))
+
+    def depositar(self, corpo):
+        return _resposta(bl.depositar(self._cpf_autenticado(), float(corpo["valor"]), self._chave()))
+
+    def sacar(self, corpo):
+        return _resposta(bl.sacar(self._cpf_autenticado(), float(corpo["valor"]), self._chave()))
+
+    def pix(self, corpo):
+        return _resposta(bl.pix(self._cpf_autenticado(), str(corpo["destino"]), float(corpo["valor"]), self._chave()))
+
+    def comprar(self, corpo):
+        return _resposta(bl.comprar_investimento(self._cpf_autenticado(), corpo["categoria"], corpo["ativo"],
+                                                 float(corpo["quantidade"]), self._chave(), _token_cotacao(corpo)))
+
+    def vender(self, corpo):
+        return _resposta(bl.vender_investimento(self._cpf_autenticado(), corpo["categoria"], corpo["ativo"],
+                                                float(corpo["quantidade"]), self._chave(), _token_cotacao(corpo)))
+
+    def extrato(self, corpo):
+        cpf = self._cpf_autenticado()
+        limite = int(corpo["limite"]) if corpo.get("limite") is not None else None
+        cursor = int(corpo["cursor"]) if corpo.get("cursor") is not None else None
+        lancamentos, proximo = bl.get_lancamentos(cpf, limite, int(corpo.get("offset", 0)), cursor)
+        return {"sucesso": True, "mensagem": "", "saldo": bl.get_user_data(cpf).saldo,
+                "lancamentos": [lancamento._asdict() for lancamento in lancamentos], "cursor": proximo}
+
+    def saldo(self, corpo):
+        return {"sucesso": True, "mensagem": "", "saldo": bl.get_user_data(self._cpf_autenticado()).saldo}
+
+    def mercado(self, corpo):
+        token, cotacao = bl.cotar(self._cpf_autenticado())
+        return {"sucesso": True, "mensagem": "", "versao": cotacao.versao, "cotacao": token, "precos": cotacao.precos}
+
+
+ROTAS = {
+    ("POST", "/registrar"): BancoHandler.registrar,
+    ("POST", "/login"): BancoHandler.login,
+    ("POST", "/logout"): BancoHandler.logout,
+    ("POST", "/depositar"): BancoHandler.depositar,
+    ("POST", "/sacar"): BancoHandler.sacar,
+    ("POST", "/pix"): BancoHandler.pix,
+    ("POST", "/comprar"): BancoHandler.comprar,
+    ("POST", "/vender"): BancoHandler.vender,
+    ("GET", "/extrato"): BancoHandler.extrato,
+    ("GET", "/saldo"): BancoHandler.saldo,
+    ("GET", "/mercado"): BancoHandler.mercado,
+}
+
+
+class ServidorBanco(HTTPServer):
+    """
+    Servidor HTTP com um pool fixo de `workers` threads. Cada conexão
+    keep-alive ocupa um worker enquanto está aberta; conexões além disso
+    esperam na fila até `2 * workers` e, acima, aguardam no backlog do socket.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, endereco: Tuple[str, int], workers: int = WORKERS_PADRAO):
+        super().__init__(endereco, BancoHandler)
+        self.sessoes = Sessoes()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bank-http")
+        self._vagas = threading.BoundedSemaphore(2 * workers)
+
+    def process_request(self, request, client_address):
+        self._vagas.acquire()
+        self._pool.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._vagas.release()
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+
+def iniciar(host: str = "127.0.0.1", porta: int = 8080, workers: int = WORKERS_PADRAO) -> ServidorBanco:
+    """Cria o servidor e o põe para atender numa thread; retorna-o (use .shutdown() para parar)."""
+    servidor = ServidorBanco((host, porta), workers)
+    threading.Thread(target=servidor.serve_forever, name="bank-http-accept", daemon=True).start()
+    return servidor
+
+
+if __name__ == "__main__":
+    porta = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else WORKERS_PADRAO
+    servidor = ServidorBanco(("127.0.0.1", porta), workers)
+    print(f"EpicBank API em http://127.0.0.1:{porta} ({workers} workers)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
@@ -0,0 +1,351 @@
+"""
+Snapshot binário do mapa de usuários.
+
+Layout do arquivo (little-endian):
+
+    cabeçalho   MAGIC | versão u16 | nº de contas u32 | offset da tabela de strings u64 | offset do índice u64
+    registros   para cada conta: tamanho u32 + registro
+    strings     nº de strings u32 | offsets u64[n + 1] | bytes UTF-8 concatenados
+    índice      nº de contas × (CPF de 16 bytes, offset do registro u64), ordenado por CPF
+
+Cada registro começa com os campos numéricos de largura fixa e referências
+(u32) para a tabela de strings, onde valores repetidos (status, senha, ativos,
+datas de cadastro, contrapartes) aparecem uma única vez. Os lançamentos do
+extrato são entradas de largura fixa (a versão 1 guardava o extrato textual).
+O arquivo é lido via mmap: abrir o snapshot só lê o cabeçalho, e cada conta é
+decodificada quando acessada, com busca binária no índice. Ao regravar, a
+tabela de strings do snapshot anterior é o começo da nova, de modo que os
+registros das contas que não foram carregadas são copiados sem decodificar.
+"""
+from datetime import date
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+from typing import Callable, Dict, Any, Iterator, List, Optional
+
+from bank_ledger import TIPOS, Lancamento
+from bank_storage import ArmazenamentoJson, ContasLazy, contas_em_memoria, desserializar_conta, gravar_json
+
+MAGIC = b"EPBK"
+VERSAO = 2
+VERSOES_LIDAS = (1, 2)
+
+_CABECALHO = struct.Struct("<4sHIQQ")
+_TAMANHO = struct.Struct("<I")
+_QUANTIDADE = struct.Struct("<H")
+_OFFSET = struct.Struct("<Q")
+_ENTRADA_INDICE = struct.Struct("<16sQ")
+# saldo, numero_saques, numero_transacoes_dia, data_contagem (ordinal, 0 = ausente),
+# status, senha, nome, email, telefone, data_cadastro
+_FIXO = struct.Struct("<dIIi6I")
+_POSICAO = struct.Struct("<IId")
+# timestamp, tipo, valor, saldo_apos, contraparte, quantidade, preco (NaN / SEM_STRING = ausente)
+_LANCAMENTO = struct.Struct("<19sBddIdd")
+SEM_STRING = 0xFFFFFFFF
+
+CAMPOS_STRING = ("status", "senha", "nome", "email", "telefone", "data_cadastro")
+CAMPOS_FIXOS = ("saldo", "numero_saques", "numero_transacoes_dia", "data_contagem") + CAMPOS_STRING
+
+
+class _TabelaStrings:
+    def __init__(self, valores: Optional[List[str]] = None):
+        """`valores` mantém os ids de uma tabela existente (para copiar registros que a usam)."""
+        self.valores: List[str] = list(valores or ())
+        self.ids: Dict[str, int] = {}
+        for numero, valor in enumerate(self.valores):
+            self.ids.setdefault(valor, numero)
+
+    def id(self, valor: str) -> int:
+        try:
+            return self.ids[valor]
+        except KeyError:
+            self.ids[valor] = len(self.valores)
+            self.valores.append(valor)
+            return self.ids[valor]
+
+    def codificar(self) -> bytes:
+        dados = [valor.encode('utf-8') for valor in self.valores]
+        offsets, posicao = [], 0
+        for bruto in dados:
+            offsets.append(posicao)
+            posicao += len(bruto)
+        offsets.append(posicao)
+        return (_TAMANHO.pack(len(dados)) + struct.pack(f"<{len(offsets)}Q", *offsets) + b"".join(dados))
+
+
+def _opcional(valor: Optional[float]) -> float:
+    return math.nan if valor is None else valor
+
+def _ausente(valor: float) -> Optional[float]:
+    return None if math.isnan(valor) else valor
+
+
+def _codificar_conta(user_data: Dict[str, Any], strings: _TabelaStrings) -> bytes:
+    data_contagem = user_data.get("data_contagem")
+    if isinstance(data_contagem, str):
+        data_contagem = date.fromisoformat(data_contagem)
+    partes = [_FIXO.pack(
+        float(user_data.get("saldo", 0.0)),
+        user_data.get("numero_saques", 0),
+        user_data.get("numero_transacoes_dia", 0),
+        data_contagem.toordinal() if data_contagem else 0,
+        *(strings.id(user_data.get(campo) or "") for campo in CAMPOS_STRING))]
+
+    lancamentos = user_data.get("lancamentos", ())
+    partes.append(_TAMANHO.pack(len(lancamentos)))
+    partes.extend(_LANCAMENTO.pack(
+        ts.encode('ascii'), TIPOS.index(tipo), valor, _opcional(saldo_apos),
+        SEM_STRING if contraparte is None else strings.id(contraparte), _opcional(quantidade), _opcional(preco))
+        for ts, tipo, valor, saldo_apos, contraparte, quantidade, preco in lancamentos)
+
+    posicoes = [(strings.id(categoria), strings.id(ativo), float(quantidade))
+                for categoria, ativos in user_data.get("portfolio", {}).items()
+                for ativo, quantidade in ativos.items()]
+    partes.append(_QUANTIDADE.pack(len(posicoes)))
+    partes.extend(_POSICAO.pack(*posicao) for posicao in posicoes)
+
+    # Campos que o formato não conhece vão como JSON, para não se perderem
+    extras = {k: v for k, v in user_data.items() if k not in CAMPOS_FIXOS and k not in ("lancamentos", "portfolio")}
+    bruto = json.dumps(extras, ensure_ascii=False, separators=(",", ":")).encode('utf-8') if extras else b""
+    partes.append(_TAMANHO.pack(len(bruto)))
+    partes.append(bruto)
+    return b"".join(partes)
+
+
+def gravar_snapshot(caminho: str, users: Dict[str, Dict[str, Any]], strings_base: Optional[List[str]] = None,
+                    ler_bruto: Optional[Callable[[str], Optional[bytes]]] = None) -> int:
+    """
+    Grava o snapshot binário atomicamente e retorna os bytes escritos. As
+    contas que não estão em memória são copiadas com `ler_bruto`, que devolve
+    o registro já codificado com a tabela de strings `strings_base`.
+    """
+    em_memoria = contas_em_memoria(users)
+    strings = _TabelaStrings(strings_base)
+    indice = []
+    temporario = caminho + ".tmp"
+    with open(temporario, 'wb') as f:
+        f.write(_CABECALHO.pack(MAGIC, VERSAO, 0, 0, 0))
+        for cpf in list(users):
+            chave = cpf.encode('utf-8')
+            if len(chave) > 16:
+                raise ValueError(f"CPF muito longo para o snapshot binário: {cpf!r}")
+            user_data = em_memoria.get(cpf)
+            registro = ler_bruto(cpf) if user_data is None and ler_bruto is not None else None
+            if registro is None:
+                registro = _codificar_conta(user_data if user_data is not None else users[cpf], strings)
+            indice.append((chave, f.tell()))
+            f.write(_TAMANHO.pack(len(registro)))
+            f.write(registro)
+        offset_strings = f.tell()
+        f.write(strings.codificar())
+        offset_indice = f.tell()
+        indice.sort()
+        f.write(b"".join(_ENTRADA_INDICE.pack(chave, offset) for chave, offset in indice))
+        escritos = f.tell()
+        f.seek(0)
+        f.write(_CABECALHO.pack(MAGIC, VERSAO, len(indice), offset_strings, offset_indice))
+    os.replace(temporario, caminho)
+    return escritos
+
+
+class SnapshotBinario:
+    """Leitura sob demanda de um snapshot binário mapeado em memória."""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._arquivo = open(caminho, 'rb')
+        self._mapa = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.versao, self.num_contas, self._offset_strings, self._offset_indice = _CABECALHO.unpack_from(self._mapa, 0)
+        if magic != MAGIC or self.versao not in VERSOES_LIDAS:
+            self.fechar()
+            raise ValueError(f"Snapshot binário inválido ou de versão desconhecida: {caminho}")
+        self._num_strings = _TAMANHO.unpack_from(self._mapa, self._offset_strings)[0]
+        self._inicio_textos = self._offset_strings + _TAMANHO.size + (self._num_strings + 1) * _OFFSET.size
+        self._strings: Dict[int, str] = {}
+
+    def fechar(self):
+        if self._mapa is not None:
+            self._mapa.close()
+            self._mapa = None
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def _string(self, numero: int) -> str:
+        try:
+            return self._strings[numero]
+        except KeyError:
+            base = self._offset_strings + _TAMANHO.size + numero * _OFFSET.size
+            inicio, fim = struct.unpack_from("<QQ", self._mapa, base)
+            valor = self._mapa[self._inicio_textos + inicio:self._inicio_textos + fim].decode('utf-8')
+            return self._strings.setdefault(numero, valor)
+
+    def _localizar(self, cpf: str) -> Optional[int]:
+        alvo = cpf.encode('utf-8').ljust(16, b"\0")
+        baixo, alto = 0, self.num_contas
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            chave, offset = _ENTRADA_INDICE.unpack_from(self._mapa, self._offset_indice + meio * _ENTRADA_INDICE.size)
+            if chave < alvo:
+                baixo = meio + 1
+            elif chave > alvo:
+                alto = meio
+            else:
+                return offset
+        return None
+
+    def strings(self) -> List[str]:
+        """A tabela de strings inteira, na ordem dos ids."""
+        return [self._string(numero) for numero in range(self._num_strings)]
+
+    def bruto(self, cpf: str) -> Optional[bytes]:
+        """Registro da conta como está no arquivo (sem o tamanho na frente)."""
+        offset = self._localizar(cpf)
+        if offset is None:
+            return None
+        tamanho = _TAMANHO.unpack_from(self._mapa, offset)[0]
+        return self._mapa[offset + _TAMANHO.size:offset + _TAMANHO.size + tamanho]
+
+    def cpfs(self) -> Iterator[str]:
+        for posicao in range(self.num_contas):
+            chave, _ = _ENTRADA_INDICE.unpack_from(self._mapa, self._offset_indice + posicao * _ENTRADA_INDICE.size)
+            yield chave.rstrip(b"\0").decode('utf-8')
+
+    def get(self, cpf: str) -> Optional[Dict[str, Any]]:
+        offset = self._localizar(cpf)
+        if offset is None:
+            return None
+        return self._decodificar(offset + _TAMANHO.size)
+
+    def _decodificar(self, posicao: int) -> Dict[str, Any]:
+        mapa = self._mapa
+        saldo, numero_saques, numero_transacoes_dia, data_contagem, *ids = _FIXO.unpack_from(mapa, posicao)
+        posicao += _FIXO.size
+        user_data = {
+            "saldo": saldo, "numero_saques": numero_saques, "numero_transacoes_dia": numero_transacoes_dia,
+            "data_contagem": date.fromordinal(data_contagem) if data_contagem else None,
+        }
+        for campo, numero in zip(CAMPOS_STRING, ids):
+            user_data[campo] = self._string(numero)
+
+        tamanho = _TAMANHO.unpack_from(mapa, posicao)[0]
+        posicao += _TAMANHO.size
+        if self.versao == 1:
+            user_data["extrato"] = mapa[posicao:posicao + tamanho].decode('utf-8')
+            posicao += tamanho
+        else:
+            lancamentos = []
+            for ts, tipo, valor, saldo_apos, contraparte, quantidade, preco in _LANCAMENTO.iter_unpack(
+                    mapa[posicao:posicao + tamanho * _LANCAMENTO.size]):
+                lancamentos.append(Lancamento(
+                    ts.rstrip(b"\0").decode('ascii'), TIPOS[tipo], valor, _ausente(saldo_apos),
+                    None if contraparte == SEM_STRING else self._string(contraparte),
+                    _ausente(quantidade), _ausente(preco)))
+            user_data["lancamentos"] = lancamentos
+            posicao += tamanho * _LANCAMENTO.size
+
+        quantidade = _QUANTIDADE.unpack_from(mapa, posicao)[0]
+        posicao += _QUANTIDADE.size
+        portfolio = {"cripto": {}, "acoes": {}}
+        for _ in range(quantidade):
+            categoria, ativo, qtd = _POSICAO.unpack_from(mapa, posicao)
+            posicao += _POSICAO.size
+            portfolio.setdefault(self._string(categoria), {})[self._string(ativo)] = qtd
+        user_data["portfolio"] = portfolio
+
+        tamanho = _TAMANHO.unpack_from(mapa, posicao)[0]
+        posicao += _TAMANHO.size
+        if tamanho:
+            user_data.update(json.loads(mapa[posicao:posicao + tamanho].decode('utf-8')))
+        return user_data
+
+    def para_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {cpf: self.get(cpf) for cpf in self.cpfs()}
+
+
+# --- Armazenamento ---
+class ArmazenamentoBinario:
+    """
+    Snapshot completo no formato binário, com contas decodificadas sob demanda.
+    Strings que nenhuma conta usa mais continuam na tabela até o arquivo ser
+    regravado a partir de um mapa inteiro em memória (ex.: pelos conversores).
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._snapshot: Optional[SnapshotBinario] = None
+        # Protege o snapshot aberto e a troca do arquivo ao salvar: quem lê nunca
+        # vê o arquivo fechado e toma contas existentes por inexistentes
+        self._lock_leitura = threading.RLock()
+
+    def existe(self) -> bool:
+        return os.path.exists(self.caminho)
+
+    def carregar(self) -> ContasLazy:
+        with self._lock_leitura:
+            self.fechar()
+            self._snapshot = SnapshotBinario(self.caminho)
+        return ContasLazy(self.buscar_conta, self.listar_cpfs)
+
+    def buscar_conta(self, cpf: str) -> Optional[Dict[str, Any]]:
+        with self._lock_leitura:
+            user_data = self._snapshot.get(cpf) if self._snapshot is not None else None
+        return desserializar_conta(user_data) if user_data is not None else None
+
+    def listar_cpfs(self) -> List[str]:
+        with self._lock_leitura:
+            return list(self._snapshot.cpfs()) if self._snapshot is not None else []
+
+    def _ler_bruto(self, cpf: str) -> Optional[bytes]:
+        with self._lock_leitura:
+            return self._snapshot.bruto(cpf) if self._snapshot is not None else None
+
+    def salvar(self, users: Dict[str, Dict[str, Any]], cpfs=None) -> int:
+        """Reescreve o snapshot inteiro; contas não carregadas são copiadas do arquivo atual sem decodificar."""
+        with self._lock_leitura:
+            copiar = self._snapshot is not None and self._snapshot.versao == VERSAO
+            strings_base = self._snapshot.strings() if copiar else None
+        temporario = self.caminho + ".novo"
+        escritos = gravar_snapshot(temporario, users, strings_base, self._ler_bruto if copiar else None)
+        with self._lock_leitura:
+            self.fechar()
+            os.replace(temporario, self.caminho)
+            # Reabre para que contas ainda não carregadas continuem acessíveis
+            self._snapshot = SnapshotBinario(self.caminho)
+        return escritos
+
+    def fechar(self):
+        with self._lock_leitura:
+            if self._snapshot is not None:
+                self._snapshot.fechar()
+                self._snapshot = None
+
+
+# --- Conversores ---
+def json_para_binario(caminho_json: str, caminho_bin: str) -> int:
+    users = ArmazenamentoJson(caminho_json).carregar()
+    gravar_snapshot(caminho_bin, users)
+    return len(users)
+
+def binario_para_json(caminho_bin: str, caminho_json: str) -> int:
+    snapshot = SnapshotBinario(caminho_bin)
+    try:
+        users = {cpf: desserializar_conta(user_data) for cpf, user_data in snapshot.para_dict().items()}
+    finally:
+        snapshot.fechar()
+    gravar_json(caminho_json, users)
+    return len(users)
+
+
+if __name__ == "__main__":
+    conversores = {"para-binario": json_para_binario, "para-json": binario_para_json}
+    if len(sys.argv) != 4 or sys.argv[1] not in conversores:
+        print("Uso: python bank_snapshot.py para-binario <bank_data.json> <bank_data.bin>")
+        print("     python bank_snapshot.py para-json <bank_data.bin> <bank_data.json>")
+        sys.exit(1)
+    total = conversores[sys.argv[1]](sys.argv[2], sys.argv[3])
+    print(f"{total} contas convertidas para {sys.argv[3]}.")
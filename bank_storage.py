@@ -0,0 +1,758 @@
+from collections import deque
+from collections.abc import MutableMapping
+from datetime import date
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, Any, Callable, Iterable, Iterator, Optional
+
+from bank_conta import Conta
+from bank_ledger import Lancamento, ResumoLancamentos, importar_extrato
+
+# Campos que só crescem por acréscimo: o journal grava apenas o trecho novo
+CAMPOS_INCREMENTAIS = ("lancamentos",)
+
+
+# --- Conversão de Contas ---
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, Conta):
+        return obj.para_dict()
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"Objeto não serializável: {type(obj).__name__}")
+
+def serializar_conta(user_data: Dict[str, Any]) -> Dict[str, Any]:
+    conta = user_data.copy()
+    if isinstance(conta.get("data_contagem"), date):
+        conta["data_contagem"] = conta["data_contagem"].isoformat()
+    return conta
+
+def desserializar_conta(user_data: Dict[str, Any]) -> Conta:
+    """
+    Normaliza a conta lida do armazenamento (dicionário ou Conta) e a devolve
+    como Conta, com os totais diários e mensais somados na mesma carga.
+    """
+    if isinstance(user_data.get("data_contagem"), str):
+        user_data["data_contagem"] = date.fromisoformat(user_data["data_contagem"])
+    # Garante que usuários antigos tenham a estrutura de portfólio
+    if "portfolio" not in user_data:
+        user_data["portfolio"] = {"cripto": {}, "acoes": {}}
+    lancamentos = [l if isinstance(l, Lancamento) else Lancamento(*l) for l in user_data.get("lancamentos", ())]
+    # Extrato textual antigo (ou trecho dele reaplicado de um journal antigo) vira lançamentos
+    extrato = user_data.pop("extrato", None)
+    if extrato:
+        lancamentos.extend(importar_extrato(extrato, user_data.get("saldo", 0.0)))
+    user_data["lancamentos"] = lancamentos
+    # Totais gravados por versões anteriores: são refeitos a partir dos lançamentos
+    user_data.pop("resumo", None)
+    conta = user_data if isinstance(user_data, Conta) else Conta.de_dict(user_data)
+    conta.resumo = ResumoLancamentos(lancamentos)
+    conta.resumo.atualizar()
+    return conta
+
+
+# --- Carregamento sob Demanda ---
+class ContasLazy(MutableMapping):
+    """
+    Mapa CPF -> conta que só busca uma conta no armazenamento quando ela é
+    acessada. Contas já carregadas (ou criadas nesta sessão) ficam em cache.
+    """
+
+    def __init__(self, buscar: Callable[[str], Optional[Dict[str, Any]]], listar: Callable[[], Iterable[str]]):
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._buscar = buscar
+        self._listar = listar
+
+    def __getitem__(self, cpf: str) -> Dict[str, Any]:
+        try:
+            return self._cache[cpf]
+        except KeyError:
+            pass
+        user_data = self._buscar(cpf)
+        if user_data is None:
+            raise KeyError(cpf)
+        return self._cache.setdefault(cpf, user_data)
+
+    def __setitem__(self, cpf: str, user_data: Dict[str, Any]):
+        self._cache[cpf] = user_data
+
+    def __delitem__(self, cpf: str):
+        del self._cache[cpf]
+
+    def __iter__(self) -> Iterator[str]:
+        cache = list(self._cache)
+        yield from cache
+        vistos = set(cache)
+        for cpf in self._listar():
+            if cpf not in vistos:
+                yield cpf
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def ler(self, cpf: str) -> Optional[Dict[str, Any]]:
+        """Lê a conta sem guardá-la no cache (para varreduras que passam por todas as contas)."""
+        user_data = self._cache.get(cpf)
+        return user_data if user_data is not None else self._buscar(cpf)
+
+    def carregada(self, cpf: str) -> bool:
+        return cpf in self._cache
+
+    def carregadas(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self._cache)
+
+
+# --- Snapshot JSON ---
+def _escrever_json(f, users: Dict[str, Dict[str, Any]], compacto: bool = False,
+                   ler_bruto: Optional[Callable[[str], bytes]] = None) -> Dict[str, list]:
+    """
+    Serializa as contas direto no arquivo binário `f`, uma de cada vez, sem
+    montar uma cópia de `users`. Contas que não estão em memória são copiadas
+    com `ler_bruto`. Retorna o índice CPF -> [offset, tamanho] de cada conta.
+    """
+    em_memoria = contas_em_memoria(users)
+    if compacto:
+        opcoes, separador, recuo, dois_pontos = {"separators": (",", ":")}, b",", b"", b":"
+    else:
+        opcoes, separador, recuo, dois_pontos = {"indent": 2}, b",", b"\n  ", b": "
+    indice = {}
+    f.write(b"{")
+    for numero, cpf in enumerate(list(users)):
+        user_data = em_memoria.get(cpf)
+        if user_data is not None:
+            texto = json.dumps(user_data, ensure_ascii=False, default=_json_default, **opcoes)
+            # Strings JSON não contêm quebras de linha literais, então o recuo é seguro
+            bruto = (texto if compacto else texto.replace("\n", "\n  ")).encode('utf-8')
+        else:
+            bruto = ler_bruto(cpf)
+        f.write((separador if numero else b"") + recuo + json.dumps(cpf).encode('utf-8') + dois_pontos)
+        indice[cpf] = [f.tell(), len(bruto)]
+        f.write(bruto)
+    f.write(b"}\n" if compacto else b"\n}\n")
+    return indice
+
+def gravar_json(caminho: str, users: Dict[str, Dict[str, Any]], compacto: bool = False) -> int:
+    """Grava as contas em um arquivo temporário e o troca atomicamente pelo original."""
+    temporario = caminho + ".tmp"
+    with open(temporario, 'wb') as f:
+        _escrever_json(f, users, compacto)
+        escritos = f.tell()
+    os.replace(temporario, caminho)
+    return escritos
+
+def contas_em_memoria(users: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return users.carregadas() if isinstance(users, ContasLazy) else users
+
+
+class ArmazenamentoJson:
+    """
+    Grava o mapa de usuários inteiro em um único arquivo JSON.
+
+    Com `compacto=True` o JSON é gravado sem indentação. Com `lazy=True` um
+    índice `<caminho>.idx` guarda o offset e o tamanho em bytes de cada conta. O
+    carregamento então não lê nada: cada conta é lida do disco (seek + parse
+    de um único registro) na primeira vez em que é acessada, e ao salvar as
+    contas que nunca foram carregadas são copiadas byte a byte do arquivo antigo.
+    As leituras sob demanda podem vir de várias threads ao mesmo tempo.
+    """
+
+    def __init__(self, caminho: str, lazy: bool = False, compacto: bool = False):
+        self.caminho = caminho
+        self.caminho_indice = caminho + ".idx"
+        self.lazy = lazy
+        self.compacto = compacto
+        self._indice: Optional[Dict[str, list]] = None
+        # Contas de um arquivo sem índice válido (formato antigo), lidas por inteiro
+        self._legado: Optional[Dict[str, Any]] = None
+        self._leitor = None
+        # Protege o índice, o leitor compartilhado (seek + read) e a troca do arquivo ao salvar
+        self._lock_leitura = threading.RLock()
+
+    def existe(self) -> bool:
+        return os.path.exists(self.caminho)
+
+    def carregar(self) -> Dict[str, Dict[str, Any]]:
+        if self.lazy:
+            with self._lock_leitura:
+                self.fechar()
+                self._indice = None
+                self._legado = None
+            return ContasLazy(self.buscar_conta, self.listar_cpfs)
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            dados_carregados = json.load(f)
+        return {cpf: desserializar_conta(user_data) for cpf, user_data in dados_carregados.items()}
+
+    def salvar(self, users: Dict[str, Dict[str, Any]], cpfs: Optional[Iterable[str]] = None) -> int:
+        """Reescreve o arquivo inteiro (`cpfs` é ignorado) e retorna os bytes escritos."""
+        if self.lazy:
+            return self._salvar_indexado(users)
+        return gravar_json(self.caminho, users, self.compacto)
+
+    def fechar(self):
+        with self._lock_leitura:
+            if self._leitor is not None:
+                self._leitor.close()
+                self._leitor = None
+
+    # --- Acesso indexado ---
+    def listar_cpfs(self) -> Iterable[str]:
+        with self._lock_leitura:
+            indice = self._garantir_indice()
+            return list(self._legado) if self._legado is not None else list(indice)
+
+    def buscar_conta(self, cpf: str) -> Optional[Dict[str, Any]]:
+        bruto = self._ler_bruto(cpf)
+        if bruto is None:
+            return None
+        return desserializar_conta(json.loads(bruto))
+
+    def _ler_bruto(self, cpf: str) -> Optional[bytes]:
+        with self._lock_leitura:
+            indice = self._garantir_indice()
+            if self._legado is not None:
+                if cpf not in self._legado:
+                    return None
+                return json.dumps(self._legado[cpf], ensure_ascii=False).encode('utf-8')
+            posicao = indice.get(cpf)
+            if posicao is None:
+                return None
+            if self._leitor is None:
+                self._leitor = open(self.caminho, 'rb')
+            self._leitor.seek(posicao[0])
+            return self._leitor.read(posicao[1])
+
+    def _garantir_indice(self) -> Dict[str, list]:
+        """Carrega o índice na primeira chamada; quem chama segura `_lock_leitura`."""
+        if self._indice is not None:
+            return self._indice
+        if not os.path.exists(self.caminho):
+            self._indice, self._legado = {}, None
+            return self._indice
+        estado = os.stat(self.caminho)
+        try:
+            with open(self.caminho_indice, 'r', encoding='utf-8') as f:
+                indice = json.load(f)
+            if indice["tamanho"] == estado.st_size and indice["mtime_ns"] == estado.st_mtime_ns:
+                self._indice, self._legado = indice["contas"], None
+                return self._indice
+        except (OSError, ValueError, KeyError):
+            pass
+        # Índice ausente ou desatualizado: lê o arquivo inteiro uma única vez;
+        # o próximo salvamento regrava no formato indexado.
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            legado = json.load(f)
+        # Só publica o índice depois que tudo foi lido
+        self._indice, self._legado = {}, legado
+        return self._indice
+
+    def _salvar_indexado(self, users: Dict[str, Dict[str, Any]]) -> int:
+        temporario = self.caminho + ".tmp"
+        with open(temporario, 'wb') as f:
+            indice = _escrever_json(f, users, self.compacto, self._ler_bruto)
+            escritos = f.tell()
+        # Leitores esperam a troca: entre o replace e o novo índice os offsets antigos não valem
+        with self._lock_leitura:
+            self.fechar()
+            os.replace(temporario, self.caminho)
+            estado = os.stat(self.caminho)
+            temporario = self.caminho_indice + ".tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump({"tamanho": estado.st_size, "mtime_ns": estado.st_mtime_ns, "contas": indice}, f, separators=(",", ":"))
+            os.replace(temporario, self.caminho_indice)
+            self._indice, self._legado = indice, None
+        return escritos
+
+
+# --- Journal (write-ahead log) ---
+class ArmazenamentoJournal(ArmazenamentoJson):
+    """
+    Acrescenta um registro compacto por operação em `<caminho>.journal` e só
+    reescreve o snapshot completo a cada `checkpoint_a_cada` registros.
+
+    Cada linha do journal é um objeto {cpf: {"=": campos, "+": {campo: [offset, trecho]}}}
+    com o estado das contas tocadas pela operação. Os campos incrementais
+    (lançamentos) levam apenas o trecho acrescentado desde a última gravação, junto
+    com o offset onde ele começa, de modo que reaplicar um registro é idempotente.
+    """
+
+    def __init__(self, caminho: str, checkpoint_a_cada: int = 1000, fsync: bool = False,
+                 lazy: bool = False, compacto: bool = False):
+        super().__init__(caminho, lazy=lazy, compacto=compacto)
+        self.caminho_journal = caminho + ".journal"
+        self.checkpoint_a_cada = checkpoint_a_cada
+        self.fsync = fsync
+        self._arquivo = None
+        self._registros = 0
+        # cpf -> {campo incremental: tamanho já persistido}
+        self._persistido: Dict[str, Dict[str, int]] = {}
+
+    def existe(self) -> bool:
+        return super().existe() or os.path.exists(self.caminho_journal)
+
+    def carregar(self) -> Dict[str, Dict[str, Any]]:
+        self.fechar()
+        self._persistido = {}
+        users = super().carregar() if super().existe() else {}
+        self._registros = self._reaplicar(users)
+        for cpf, user_data in contas_em_memoria(users).items():
+            self._persistido[cpf] = self._tamanhos(user_data)
+        return users
+
+    def buscar_conta(self, cpf: str) -> Optional[Dict[str, Any]]:
+        user_data = super().buscar_conta(cpf)
+        if user_data is not None:
+            self._persistido[cpf] = self._tamanhos(user_data)
+        return user_data
+
+    def salvar(self, users: Dict[str, Dict[str, Any]], cpfs: Optional[Iterable[str]] = None) -> int:
+        if cpfs is None or self._registros >= self.checkpoint_a_cada:
+            return self.checkpoint(users)
+        registro = {}
+        for cpf in cpfs:
+            registro[cpf] = self._delta(cpf, users[cpf])
+        if self._arquivo is None:
+            self._arquivo = open(self.caminho_journal, 'a', encoding='utf-8')
+        linha = json.dumps(registro, ensure_ascii=False, separators=(",", ":"), default=_json_default) + "\n"
+        self._arquivo.write(linha)
+        self._arquivo.flush()
+        if self.fsync:
+            os.fsync(self._arquivo.fileno())
+        self._registros += 1
+        # Conta o que foi de fato gravado: a conta pode ter recebido lançamentos
+        # durante a gravação (AsyncBank grava numa thread enquanto o loop segue)
+        for cpf, delta in registro.items():
+            self._persistido[cpf] = {campo: offset + len(trecho) for campo, (offset, trecho) in delta["+"].items()}
+        return len(linha.encode('utf-8'))
+
+    def checkpoint(self, users: Dict[str, Dict[str, Any]]) -> int:
+        """Grava o snapshot completo e descarta o journal já coberto por ele."""
+        # Tamanhos tomados antes da gravação: o que for acrescentado durante ela volta
+        # no próximo registro (reaplicar um trecho que o snapshot já tem é inofensivo)
+        persistido = {cpf: self._tamanhos(user_data) for cpf, user_data in list(contas_em_memoria(users).items())}
+        escritos = super().salvar(users)
+        self.fechar()
+        # Se o processo cair antes do truncamento, o replay do journal sobre o
+        # novo snapshot é inofensivo, pois os registros são idempotentes.
+        open(self.caminho_journal, 'w', encoding='utf-8').close()
+        self._registros = 0
+        self._persistido = persistido
+        return escritos
+
+    def fechar(self):
+        super().fechar()
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def _tamanhos(self, user_data: Dict[str, Any]) -> Dict[str, int]:
+        return {campo: len(user_data.get(campo, ())) for campo in CAMPOS_INCREMENTAIS}
+
+    def _delta(self, cpf: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        persistido = self._persistido.get(cpf, {})
+        campos, acrescimos = {}, {}
+        for campo, valor in user_data.items():
+            if campo in CAMPOS_INCREMENTAIS:
+                offset = persistido.get(campo, 0)
+                if offset > len(valor):
+                    offset = 0
+                acrescimos[campo] = [offset, valor[offset:]]
+            else:
+                campos[campo] = valor
+        return {"=": campos, "+": acrescimos}
+
+    def _reaplicar(self, users: Dict[str, Dict[str, Any]]) -> int:
+        if not os.path.exists(self.caminho_journal):
+            return 0
+        with open(self.caminho_journal, 'rb') as f:
+            conteudo = f.read()
+        completo = conteudo.rfind(b"\n") + 1
+        linhas = conteudo[:completo].splitlines()
+        if completo < len(conteudo):
+            # Uma última linha sem "\n" é uma gravação interrompida, não corrupção: se ela
+            # estiver inteira é reaplicada, senão é cortada antes que o próximo registro
+            # seja acrescentado colado a ela
+            try:
+                json.loads(conteudo[completo:])
+            except ValueError:
+                os.truncate(self.caminho_journal, completo)
+            else:
+                linhas.append(conteudo[completo:])
+                with open(self.caminho_journal, 'ab') as f:
+                    f.write(b"\n")
+        aplicados = 0
+        tocadas = {}
+        for linha in linhas:
+            registro = json.loads(linha)
+            for cpf, delta in registro.items():
+                user_data = tocadas[cpf] = users.setdefault(cpf, {})
+                user_data.update(delta["="])
+                for campo, (offset, trecho) in delta["+"].items():
+                    user_data[campo] = user_data.get(campo, type(trecho)())[:offset] + trecho
+            aplicados += 1
+        for cpf, user_data in tocadas.items():
+            users[cpf] = desserializar_conta(user_data)
+        return aplicados
+
+
+# --- Shards ---
+class ArmazenamentoShards:
+    """
+    Particiona as contas pelo hash do CPF em `num_shards` arquivos JSON dentro
+    de um diretório. Cada salvamento reescreve apenas os shards das contas
+    alteradas (no PIX, os do remetente e do destinatário), então o custo de
+    uma gravação é limitado ao tamanho do shard. O carregamento lê os shards
+    um após o outro: o parse do JSON segura o GIL, então threads não o aceleram.
+
+    Cada arquivo de shard é trocado atomicamente, mas uma operação que toca
+    dois shards não é atômica entre eles.
+    """
+
+    def __init__(self, diretorio: str, num_shards: int = 16, caminho_legado: Optional[str] = None,
+                 compacto: bool = False):
+        self.caminho = diretorio
+        self.compacto = compacto
+        self.caminho_manifesto = os.path.join(diretorio, "shards.json")
+        self.caminho_legado = caminho_legado
+        self.num_shards = num_shards
+        # shards que precisam ser gravados no próximo salvamento e CPFs de cada shard
+        self._pendentes = set()
+        self._membros: Dict[int, set] = {numero: set() for numero in range(num_shards)}
+        self._lock = threading.Lock()
+
+    def existe(self) -> bool:
+        if os.path.exists(self.caminho_manifesto):
+            return True
+        return self.caminho_legado is not None and os.path.exists(self.caminho_legado)
+
+    def shard(self, cpf: str) -> int:
+        return zlib.crc32(cpf.encode('utf-8')) % self.num_shards
+
+    def caminho_shard(self, numero: int) -> str:
+        return os.path.join(self.caminho, f"shard_{numero:03d}.json")
+
+    def carregar(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.caminho_manifesto):
+            # Primeira execução sobre um bank_data.json: o próximo salvamento cria todos os shards
+            users = ArmazenamentoJson(self.caminho_legado).carregar()
+            self._pendentes = set(range(self.num_shards))
+            return users
+        with open(self.caminho_manifesto, 'r', encoding='utf-8') as f:
+            self.num_shards = json.load(f)["num_shards"]
+        self._pendentes = set()
+        self._membros = {numero: set() for numero in range(self.num_shards)}
+        users = {}
+        for numero in range(self.num_shards):
+            parte = self._carregar_shard(numero)
+            self._membros[numero] = set(parte)
+            users.update(parte)
+        return users
+
+    def _carregar_shard(self, numero: int) -> Dict[str, Dict[str, Any]]:
+        caminho = self.caminho_shard(numero)
+        if not os.path.exists(caminho):
+            return {}
+        with open(caminho, 'r', encoding='utf-8') as f:
+            parte = json.load(f)
+        return {cpf: desserializar_conta(user_data) for cpf, user_data in parte.items()}
+
+    def salvar(self, users: Dict[str, Dict[str, Any]], cpfs: Optional[Iterable[str]] = None) -> int:
+        with self._lock:
+            if not os.path.exists(self.caminho_manifesto):
+                os.makedirs(self.caminho, exist_ok=True)
+                self._pendentes = set(range(self.num_shards))
+            if cpfs is None or self._pendentes:
+                # Salvamento completo: recalcula a que shard pertence cada conta
+                self._membros = {numero: set() for numero in range(self.num_shards)}
+                for cpf in list(users):
+                    self._membros[self.shard(cpf)].add(cpf)
+                shards = set(range(self.num_shards)) if cpfs is None else self._pendentes
+            else:
+                shards = set()
+            for cpf in cpfs or ():
+                numero = self.shard(cpf)
+                self._membros[numero].add(cpf)
+                shards.add(numero)
+            escritos = 0
+            for numero in shards:
+                contas = {cpf: users[cpf] for cpf in self._membros[numero]}
+                escritos += gravar_json(self.caminho_shard(numero), contas, self.compacto)
+            if not os.path.exists(self.caminho_manifesto):
+                with open(self.caminho_manifesto, 'w', encoding='utf-8') as f:
+                    json.dump({"num_shards": self.num_shards}, f)
+            self._pendentes = set()
+            return escritos
+
+    def fechar(self):
+        pass
+
+
+# --- SQLite ---
+COLUNAS_CONTA = ("senha", "saldo", "numero_saques", "numero_transacoes_dia", "data_contagem",
+                 "nome", "email", "telefone", "data_cadastro", "status")
+
+_TABELA_LANCAMENTOS = """CREATE TABLE IF NOT EXISTS lancamentos (
+    cpf TEXT NOT NULL, seq INTEGER NOT NULL,
+    timestamp TEXT NOT NULL, tipo TEXT NOT NULL, valor REAL NOT NULL, saldo_apos REAL,
+    contraparte TEXT, quantidade REAL, preco REAL,
+    PRIMARY KEY (cpf, seq)
+) WITHOUT ROWID"""
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS contas (
+    cpf TEXT PRIMARY KEY,
+    senha TEXT, saldo REAL, numero_saques INTEGER, numero_transacoes_dia INTEGER,
+    data_contagem TEXT, nome TEXT, email TEXT, telefone TEXT, data_cadastro TEXT, status TEXT,
+    extras TEXT
+);
+{tabela_lancamentos};
+CREATE TABLE IF NOT EXISTS portfolio (
+    cpf TEXT NOT NULL, categoria TEXT NOT NULL, ativo TEXT NOT NULL, quantidade REAL NOT NULL,
+    PRIMARY KEY (cpf, categoria, ativo)
+) WITHOUT ROWID;
+""".format(tabela_lancamentos=_TABELA_LANCAMENTOS)
+
+class ArmazenamentoSqlite:
+    """
+    Guarda contas, lançamentos do extrato e posições do portfólio em tabelas
+    SQLite indexadas por CPF. Cada salvamento é uma única transação que toca
+    apenas as contas alteradas, e as contas são lidas sob demanda.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._conexao = None
+        self._lock = threading.RLock()
+        # cpf -> quantidade de lançamentos já gravados
+        self._persistido: Dict[str, int] = {}
+
+    def existe(self) -> bool:
+        return os.path.exists(self.caminho)
+
+    def _conectar(self) -> sqlite3.Connection:
+        if self._conexao is None:
+            self._conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+            self._migrar_extrato_textual(self._conexao)
+            self._conexao.executescript(ESQUEMA_SQLITE)
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+        return self._conexao
+
+    def _migrar_extrato_textual(self, conexao: sqlite3.Connection):
+        """Converte bancos em que `lancamentos` guardava linhas do extrato como texto."""
+        colunas = [linha[1] for linha in conexao.execute("PRAGMA table_info(lancamentos)")]
+        if "texto" not in colunas:
+            return
+        with conexao:
+            conexao.execute("ALTER TABLE lancamentos RENAME TO lancamentos_texto")
+            conexao.execute(_TABELA_LANCAMENTOS)
+            for cpf, saldo in conexao.execute("SELECT cpf, saldo FROM contas").fetchall():
+                extrato = "".join(t for (t,) in conexao.execute(
+                    "SELECT texto FROM lancamentos_texto WHERE cpf = ? ORDER BY seq", (cpf,)))
+                self._inserir_lancamentos(conexao, cpf, 0, importar_extrato(extrato, saldo or 0.0))
+            conexao.execute("DROP TABLE lancamentos_texto")
+
+    def _inserir_lancamentos(self, conexao: sqlite3.Connection, cpf: str, seq: int, lancamentos):
+        conexao.executemany(
+            "INSERT INTO lancamentos (cpf, seq, timestamp, tipo, valor, saldo_apos, contraparte, quantidade, preco) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(cpf, seq + i, *lancamento) for i, lancamento in enumerate(lancamentos)])
+
+    def carregar(self) -> ContasLazy:
+        return ContasLazy(self.buscar_conta, self.listar_cpfs)
+
+    def listar_cpfs(self) -> Iterable[str]:
+        with self._lock:
+            return [linha[0] for linha in self._conectar().execute("SELECT cpf FROM contas")]
+
+    def buscar_conta(self, cpf: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            conexao = self._conectar()
+            linha = conexao.execute(f"SELECT {', '.join(COLUNAS_CONTA)}, extras FROM contas WHERE cpf = ?", (cpf,)).fetchone()
+            if linha is None:
+                return None
+            user_data = dict(zip(COLUNAS_CONTA, linha))
+            user_data.update(json.loads(linha[-1] or "{}"))
+            user_data["lancamentos"] = [Lancamento(*linha) for linha in conexao.execute(
+                "SELECT timestamp, tipo, valor, saldo_apos, contraparte, quantidade, preco "
+                "FROM lancamentos WHERE cpf = ? ORDER BY seq", (cpf,))]
+            portfolio = {"cripto": {}, "acoes": {}}
+            for categoria, ativo, quantidade in conexao.execute(
+                    "SELECT categoria, ativo, quantidade FROM portfolio WHERE cpf = ?", (cpf,)):
+                portfolio.setdefault(categoria, {})[ativo] = quantidade
+            user_data["portfolio"] = portfolio
+            self._persistido[cpf] = len(user_data["lancamentos"])
+            return desserializar_conta(user_data)
+
+    def salvar(self, users: Dict[str, Dict[str, Any]], cpfs: Optional[Iterable[str]] = None) -> Optional[int]:
+        """Grava as contas em uma transação; o SQLite não informa os bytes escritos."""
+        if cpfs is None:
+            contas = users.carregadas() if isinstance(users, ContasLazy) else dict(users)
+        else:
+            contas = {cpf: users[cpf] for cpf in cpfs}
+        with self._lock:
+            conexao = self._conectar()
+            with conexao:
+                gravados = {cpf: self._gravar_conta(conexao, cpf, user_data) for cpf, user_data in contas.items()}
+            # Só depois do commit: se a transação for desfeita, o próximo salvamento regrava tudo
+            self._persistido.update(gravados)
+
+    def _gravar_conta(self, conexao: sqlite3.Connection, cpf: str, user_data: Dict[str, Any]) -> int:
+        """Grava a conta e retorna quantos lançamentos dela ficaram no banco."""
+        conta = serializar_conta(user_data)
+        extras = {k: v for k, v in conta.items() if k not in COLUNAS_CONTA and k not in ("lancamentos", "portfolio")}
+        conexao.execute(
+            f"INSERT OR REPLACE INTO contas (cpf, {', '.join(COLUNAS_CONTA)}, extras) "
+            f"VALUES (?, {', '.join('?' for _ in COLUNAS_CONTA)}, ?)",
+            (cpf, *(conta.get(coluna) for coluna in COLUNAS_CONTA), json.dumps(extras, ensure_ascii=False)))
+
+        lancamentos = conta.get("lancamentos", [])
+        gravados = self._persistido.get(cpf)
+        if gravados is None or gravados > len(lancamentos):
+            # Conta desconhecida ou lançamentos reescritos: regrava todos
+            conexao.execute("DELETE FROM lancamentos WHERE cpf = ?", (cpf,))
+            gravados = 0
+        # Cópia do trecho novo: lançamentos acrescentados depois dela ficam para o próximo salvamento
+        novos = lancamentos[gravados:]
+        self._inserir_lancamentos(conexao, cpf, gravados, novos)
+
+        conexao.execute("DELETE FROM portfolio WHERE cpf = ?", (cpf,))
+        conexao.executemany("INSERT INTO portfolio (cpf, categoria, ativo, quantidade) VALUES (?, ?, ?, ?)",
+                            [(cpf, categoria, ativo, quantidade)
+                             for categoria, ativos in conta.get("portfolio", {}).items()
+                             for ativo, quantidade in ativos.items()])
+        return gravados + len(novos)
+
+    def fechar(self):
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
+
+
+# --- Group Commit ---
+class _PedidoGravacao:
+    __slots__ = ("users", "cpfs", "concluido", "erro", "escritos")
+
+    def __init__(self, users, cpfs):
+        self.users = users
+        self.cpfs = cpfs
+        self.concluido = threading.Event()
+        self.erro = None
+        self.escritos = None
+
+
+class GroupCommit:
+    """
+    Envolve outro armazenamento e agrupa os salvamentos de operações
+    concorrentes em uma única gravação.
+
+    Garantia de durabilidade: `salvar` só retorna depois que uma gravação do
+    armazenamento interno iniciada *após* o pedido terminou com sucesso, ou seja,
+    o estado da operação já está no armazenamento (no disco, se o interno fizer
+    fsync). Se essa gravação falhar, o erro é propagado a todos os pedidos do lote.
+
+    Um lote fecha quando `janela_ms` se passa desde o primeiro pedido ou quando
+    chega a `max_operacoes` pedidos. A fila é limitada a `max_fila` pedidos
+    pendentes; acima disso quem chama `salvar` espera por vaga.
+    """
+
+    def __init__(self, interno, janela_ms: float = 5.0, max_operacoes: int = 64, max_fila: int = 1024):
+        self.interno = interno
+        self.caminho = interno.caminho
+        self.janela = janela_ms / 1000.0
+        self.max_operacoes = max_operacoes
+        self._fila = deque()
+        self._cond = threading.Condition()
+        self._vagas = threading.BoundedSemaphore(max_fila)
+        self._thread = None
+        self._parar = False
+
+    def existe(self) -> bool:
+        return self.interno.existe()
+
+    def carregar(self):
+        return self.interno.carregar()
+
+    def salvar(self, users: Dict[str, Dict[str, Any]], cpfs: Optional[Iterable[str]] = None) -> Optional[int]:
+        """Retorna os bytes escritos pela gravação compartilhada que cobriu o pedido."""
+        pedido = _PedidoGravacao(users, None if cpfs is None else tuple(cpfs))
+        self._vagas.acquire()
+        with self._cond:
+            if self._thread is None:
+                self._parar = False
+                self._thread = threading.Thread(target=self._executar, name="group-commit", daemon=True)
+                self._thread.start()
+            self._fila.append(pedido)
+            self._cond.notify()
+        pedido.concluido.wait()
+        if pedido.erro is not None:
+            raise pedido.erro
+        return pedido.escritos
+
+    def fechar(self):
+        """Grava os pedidos pendentes, encerra a thread de gravação e fecha o interno."""
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._parar = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+        self.interno.fechar()
+
+    def _executar(self):
+        while True:
+            with self._cond:
+                while not self._fila and not self._parar:
+                    self._cond.wait()
+                if not self._fila:
+                    return
+                prazo = time.monotonic() + self.janela
+                while len(self._fila) < self.max_operacoes and not self._parar:
+                    restante = prazo - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                lote = [self._fila.popleft() for _ in range(min(len(self._fila), self.max_operacoes))]
+            self._gravar(lote)
+
+    def _gravar(self, lote):
+        # Normalmente todos os pedidos apontam para o mesmo mapa `users`
+        grupos: Dict[int, list] = {}
+        for pedido in lote:
+            grupos.setdefault(id(pedido.users), []).append(pedido)
+        for pedidos in grupos.values():
+            if any(pedido.cpfs is None for pedido in pedidos):
+                cpfs = None
+            else:
+                cpfs = list(dict.fromkeys(cpf for pedido in pedidos for cpf in pedido.cpfs))
+            try:
+                escritos, erro = self.interno.salvar(pedidos[0].users, cpfs), None
+            except Exception as e:
+                escritos, erro = None, e
+            for pedido in pedidos:
+                pedido.escritos = escritos
+                pedido.erro = erro
+                pedido.concluido.set()
+                self._vagas.release()
+
+
+def migrar_json_para_sqlite(caminho_json: str, caminho_db: str) -> int:
+    """Importa um bank_data.json (e seu journal, se houver) para um banco SQLite."""
+    users = ArmazenamentoJournal(caminho_json).carregar()
+    destino = ArmazenamentoSqlite(caminho_db)
+    try:
+        destino.salvar(users)
+    finally:
+        destino.fechar()
+    return len(users)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "migrar":
+        print("Uso: python bank_storage.py migrar <bank_data.json> <bank_data.db>")
+        sys.exit(1)
+    total = migrar_json_para_sqlite(sys.argv[2], sys.argv[3])
+    print(f"{total} contas migradas para {sys.argv[3]}.")
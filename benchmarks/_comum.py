@@ -0,0 +1,16 @@
+"""Utilitários compartilhados pelos scripts de benchmark."""
+from typing import List
+
+
+def completar_cpf(base: List[int]) -> str:
+    """CPF válido a partir dos 9 primeiros dígitos: acrescenta os dois verificadores."""
+    digitos = list(base)
+    for pesos in (range(10, 1, -1), range(11, 1, -1)):
+        resto = sum(d * p for d, p in zip(digitos, pesos)) % 11
+        digitos.append(0 if resto < 2 else 11 - resto)
+    return "".join(map(str, digitos))
+
+
+def gerar_cpf(numero: int) -> str:
+    """CPF válido cujos 9 primeiros dígitos são `numero`: contas previsíveis e distintas."""
+    return completar_cpf([int(c) for c in f"{numero:09d}"])
@@ -0,0 +1,66 @@
+"""
+Compara operações síncronas (uma gravação por chamada) com o AsyncBank
+servindo muitas sessões concorrentes num único event loop.
+
+Uso: python benchmarks/bench_async.py [sessões] [PIX por sessão] [modo de persistência]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bank_logic as bl
+from bank_async import AsyncBank
+from _comum import gerar_cpf
+
+
+def preparar(sessoes: int, modo: str):
+    bl.DATA_FILE = os.path.join(tempfile.mkdtemp(), "bank_data.json")
+    bl.MODO_PERSISTENCIA = modo
+    bl.LIMITES.transacoes_dia = 10**9  # mede a persistência, não o limite diário
+    bl.carregar_dados()
+    bl.users = {}
+    cpfs = [gerar_cpf(100_000_000 + numero) for numero in range(sessoes)]
+    bl.registrar_usuarios_em_lote({"cpf": cpf, "nome": "Cliente", "email": "cliente@epicbank.com",
+                                   "telefone": "11999999999", "senha": "1234"} for cpf in cpfs)
+    for cpf in cpfs:
+        bl.users[cpf].saldo = 1000.0
+    bl.salvar_dados()
+    return cpfs
+
+
+async def sessao(banco: AsyncBank, origem: str, destino: str, operacoes: int):
+    for _ in range(operacoes):
+        await banco.pix(origem, destino, 1.0)
+
+
+async def servir(cpfs, operacoes: int):
+    banco = AsyncBank()
+    await asyncio.gather(*(sessao(banco, cpf, cpfs[(numero + 1) % len(cpfs)], operacoes)
+                           for numero, cpf in enumerate(cpfs)))
+    await banco.fechar()
+
+
+def main(sessoes: int, operacoes: int, modo: str):
+    cpfs = preparar(sessoes, modo)
+    # O síncrono grava a cada chamada; mede uma amostra para não demorar demais
+    amostra = min(len(cpfs), 200)
+    inicio = time.perf_counter()
+    for numero in range(amostra):
+        bl.pix(cpfs[numero], cpfs[(numero + 1) % len(cpfs)], 1.0)
+    sincrono = amostra / (time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    asyncio.run(servir(cpfs, operacoes))
+    assincrono = sessoes * operacoes / (time.perf_counter() - inicio)
+    print(f"{sessoes} sessões x {operacoes} PIX ({modo}): síncrono {sincrono:,.0f} op/s, "
+          f"AsyncBank {assincrono:,.0f} op/s ({assincrono / sincrono:.1f}x)")
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    main(int(argumentos[0]) if argumentos else 1000, int(argumentos[1]) if len(argumentos) > 1 else 10,
+         argumentos[2] if len(argumentos) > 2 else "json")
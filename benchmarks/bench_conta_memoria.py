@@ -0,0 +1,73 @@
+"""
+Compara a memória e o acesso a campos das contas como dicionários (formato
+antigo) e como Conta com __slots__.
+
+Uso: python benchmarks/bench_conta_memoria.py [100000 1000000]
+"""
+from datetime import date, timedelta
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bank_conta import Conta
+
+
+def gerar_dicts(quantidade: int):
+    users = {}
+    for numero in range(quantidade):
+        users[f"{numero:011d}"] = {
+            "senha": f"{numero % 10000:04d}", "saldo": float(numero % 5000), "lancamentos": [],
+            "numero_saques": numero % 4, "numero_transacoes_dia": numero % 11,
+            # Cada conta lida do JSON tem a sua própria data e o seu próprio "ativo"
+            "data_contagem": date(2024, 1, 1) + timedelta(days=numero % 3), "nome": f"Cliente {numero}",
+            "email": f"cliente{numero}@epicbank.com", "telefone": f"11{numero:09d}",
+            "data_cadastro": f"2024-01-01 09:{numero % 60:02d}:00", "status": "".join(["at", "ivo"]),
+            "portfolio": {"cripto": {}, "acoes": {}},
+        }
+    return users
+
+
+def gerar_contas(quantidade: int):
+    return {cpf: Conta.de_dict(user_data) for cpf, user_data in gerar_dicts(quantidade).items()}
+
+
+def medir_memoria(gerar, quantidade: int):
+    gc.collect()
+    tracemalloc.start()
+    users = gerar(quantidade)
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return atual, users
+
+
+def medir_acesso(users, ler):
+    contas = list(users.values())
+    inicio = time.perf_counter()
+    for _ in range(5):
+        for conta in contas:
+            ler(conta)
+    return (time.perf_counter() - inicio) / (5 * len(contas)) * 1e9
+
+
+def medir(quantidade: int):
+    memoria_dict, dicts = medir_memoria(gerar_dicts, quantidade)
+    acesso_dict = medir_acesso(dicts, lambda conta: conta["saldo"] + conta["numero_transacoes_dia"])
+    del dicts
+    memoria_conta, contas = medir_memoria(gerar_contas, quantidade)
+    acesso_conta = medir_acesso(contas, lambda conta: conta.saldo + conta.numero_transacoes_dia)
+    del contas
+
+    print(f"{quantidade:>9} contas | dict: {memoria_dict / 1e6:8.1f} MB ({memoria_dict / quantidade:5.0f} B/conta), "
+          f"acesso {acesso_dict:5.1f} ns | Conta: {memoria_conta / 1e6:8.1f} MB "
+          f"({memoria_conta / quantidade:5.0f} B/conta), acesso {acesso_conta:5.1f} ns | "
+          f"memória {memoria_dict / memoria_conta:.2f}x menor")
+
+
+if __name__ == "__main__":
+    tamanhos = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for quantidade in tamanhos:
+        medir(quantidade)
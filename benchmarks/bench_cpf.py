@@ -0,0 +1,75 @@
+"""
+Compara a validação de CPF antiga (regex + dois laços por chamada) com a
+versão memorizada, a versão sem cache e a validação em massa (numpy).
+
+Uso: python benchmarks/bench_cpf.py [1000000]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bank_cpf import np, validar_cpf, validar_cpf_sem_cache, validar_cpfs
+from _comum import completar_cpf
+
+
+def validar_cpf_antigo(cpf: str) -> bool:
+    cpf = re.sub(r'[^0-9]', '', cpf)
+    if len(cpf) != 11 or cpf == cpf[0] * 11: return False
+    soma = sum(int(cpf[i]) * (10 - i) for i in range(9))
+    resto = soma % 11
+    digito1 = 0 if resto < 2 else 11 - resto
+    soma = sum(int(cpf[i]) * (11 - i) for i in range(10))
+    resto = soma % 11
+    digito2 = 0 if resto < 2 else 11 - resto
+    return cpf[-2:] == f"{digito1}{digito2}"
+
+
+def gerar_cpfs(quantidade: int):
+    aleatorio = random.Random(42)
+    cpfs = []
+    for _ in range(quantidade):
+        cpf = completar_cpf([aleatorio.randint(0, 9) for _ in range(9)])
+        # Um quarto inválido e um quarto com pontuação
+        if aleatorio.random() < 0.25:
+            cpf = cpf[:10] + str((int(cpf[10]) + 1) % 10)
+        elif aleatorio.random() < 0.33:
+            cpf = f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+        cpfs.append(cpf)
+    return cpfs
+
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return time.perf_counter() - inicio, resultado
+
+
+def medir(quantidade: int):
+    cpfs = gerar_cpfs(quantidade)
+    # Rota quente de PIX: poucos destinos repetidos muitas vezes
+    destinos = [cpfs[i % 1000] for i in range(quantidade)]
+
+    t_antigo, esperado = cronometrar(lambda: [validar_cpf_antigo(cpf) for cpf in cpfs])
+    t_sem_cache, resultado = cronometrar(lambda: [validar_cpf_sem_cache(cpf) for cpf in cpfs])
+    assert resultado == esperado
+    t_massa, resultado = cronometrar(lambda: validar_cpfs(cpfs))
+    assert list(resultado) == esperado
+    t_antigo_pix, _ = cronometrar(lambda: [validar_cpf_antigo(cpf) for cpf in destinos])
+    validar_cpf.cache_clear()
+    t_cache_pix, _ = cronometrar(lambda: [validar_cpf(cpf) for cpf in destinos])
+
+    por_cpf = 1e9 / quantidade
+    print(f"{quantidade:>9} CPFs | antigo {t_antigo * por_cpf:6.0f} ns, sem cache {t_sem_cache * por_cpf:6.0f} ns, "
+          f"em massa ({'numpy' if np is not None else 'sem numpy'}) {t_massa * por_cpf:6.0f} ns "
+          f"({t_antigo / t_massa:.1f}x) | PIX repetido: antigo {t_antigo_pix * por_cpf:6.0f} ns, "
+          f"memorizado {t_cache_pix * por_cpf:6.0f} ns ({t_antigo_pix / t_cache_pix:.1f}x)")
+
+
+if __name__ == "__main__":
+    tamanhos = [int(arg) for arg in sys.argv[1:]] or [1_000_000]
+    for quantidade in tamanhos:
+        medir(quantidade)
@@ -0,0 +1,113 @@
+"""
+Vazão do MotorShards com 1, 2, 4... shards: várias threads clientes fazem
+PIX (a maioria entre shards diferentes) e depósitos. No fim confere que o
+dinheiro foi conservado, que cada shard concilia e que não ficou PIX pendente.
+Antes disso simula quedas no meio do PIX entre shards (depois da reserva e
+depois do crédito) e confere que a reinicialização conclui os dois sem
+perder nem duplicar dinheiro.
+
+Uso: python benchmarks/bench_engine.py [threads] [operações por thread] [contas] [modo de persistência]
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bank_engine import MotorShards, shard_de
+from _comum import gerar_cpf
+
+
+def trabalhar(motor: MotorShards, semente: int, cpfs, operacoes: int) -> int:
+    aleatorio = random.Random(semente)
+    depositado = 0
+    for _ in range(operacoes):
+        origem, destino = aleatorio.sample(cpfs, 2)
+        if aleatorio.random() < 0.9:
+            motor.pix(origem, destino, round(aleatorio.uniform(0.01, 20), 2))
+        elif motor.depositar(origem, 1.0)[0]:
+            depositado += 100
+    return depositado
+
+
+def medir(num_shards: int, threads: int, operacoes: int, contas: int, modo: str) -> float:
+    data_file = os.path.join(tempfile.mkdtemp(), "bank_data.json")
+    cpfs = [gerar_cpf(100_000_000 + numero) for numero in range(contas)]
+    with MotorShards(num_shards, data_file, modo) as motor:
+        motor.registrar_usuarios_em_lote({"cpf": cpf, "nome": "Cliente", "email": "cliente@epicbank.com",
+                                          "telefone": "11999999999", "senha": "1234"} for cpf in cpfs)
+        for cpf in cpfs:
+            motor.depositar(cpf, 1000.0)
+        inicial = motor.total_em_custodia()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            depositado = sum(executor.map(lambda semente: trabalhar(motor, semente, cpfs, operacoes), range(threads)))
+        segundos = time.perf_counter() - inicio
+
+        final = motor.total_em_custodia()
+        conciliado, mensagem = motor.reconciliar()
+        pendentes = sum(map(len, motor._em_todos("pix_pendentes")))
+        vazao = threads * operacoes / segundos
+        print(f"{num_shards:>2} shards: {vazao:,.0f} op/s ({segundos:.2f}s) - {mensagem}")
+        if round(final - inicial - depositado / 100, 2) != 0 or not conciliado or pendentes:
+            print(f"FALHA: inicial {inicial:.2f}, depositado {depositado / 100:.2f}, final {final:.2f}, "
+                  f"{pendentes} PIX pendentes")
+            sys.exit(1)
+    return vazao
+
+
+def derrubar(motor: MotorShards):
+    """Mata os processos dos shards sem deixá-los terminar, como numa queda."""
+    for shard in motor._shards:
+        shard.processo.kill()
+        shard.processo.join()
+    motor.fechar()
+
+
+def verificar_recuperacao(modo: str):
+    data_file = os.path.join(tempfile.mkdtemp(), "bank_data.json")
+    origem = gerar_cpf(100_000_000)
+    destino = next(cpf for cpf in map(gerar_cpf, range(100_000_001, 100_001_000))
+                   if shard_de(cpf, 2) != shard_de(origem, 2))
+    motor = MotorShards(2, data_file, modo)
+    for cpf in (origem, destino):
+        motor.registrar_usuario(cpf, "Cliente", "cliente@epicbank.com", "11999999999", "1234", "1234")
+        motor.depositar(cpf, 100.0)
+    # Queda depois da reserva: débito gravado na origem, crédito nunca enviado
+    motor._chamar(motor.shard_de(origem), "pix_reservar", "queda-reserva", origem, destino, 10.0)
+    # Queda depois do crédito: falta só a conclusão na origem, que não pode creditar de novo
+    _, _, pendencia = motor._chamar(motor.shard_de(origem), "pix_reservar", "queda-credito", origem, destino, 15.0)
+    motor._chamar(motor.shard_de(destino), "pix_creditar", "queda-credito", origem, *pendencia)
+    derrubar(motor)
+
+    with MotorShards(2, data_file, modo) as motor:
+        saldos = [motor.get_user_data(cpf).saldo for cpf in (origem, destino)]
+        pendentes = sum(map(len, motor._em_todos("pix_pendentes")))
+        conciliado, mensagem = motor.reconciliar()
+        print(f"Recuperação após queda no meio do PIX: saldos {saldos}, {pendentes} pendentes - {mensagem}")
+        if saldos != [75.0, 125.0] or pendentes or not conciliado:
+            print("FALHA: a recuperação perdeu ou duplicou dinheiro")
+            sys.exit(1)
+
+
+def main(threads: int, operacoes: int, contas: int, modo: str):
+    verificar_recuperacao(modo)
+    print(f"{threads} threads x {operacoes} operações em {contas} contas ({modo}), {os.cpu_count()} CPUs")
+    base = None
+    num_shards = 1
+    while num_shards <= max(os.cpu_count() or 1, 2):
+        vazao = medir(num_shards, threads, operacoes, contas, modo)
+        base = base or vazao
+        if num_shards > 1:
+            print(f"   {vazao / base:.2f}x em relação a 1 shard")
+        num_shards *= 2
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    numeros = [int(arg) for arg in argumentos[:3]]
+    main(*(numeros + [64, 200, 2000][len(numeros):]), argumentos[3] if len(argumentos) > 3 else "journal")
@@ -0,0 +1,48 @@
+"""
+Custo por operação de PoliticaLimites.verificar + registrar com 0 e 3
+janelas deslizantes, para bases de tamanhos diferentes: o custo não depende
+do número de contas e a virada do dia não varre nada.
+
+Uso: python benchmarks/bench_limites.py [operações]
+"""
+from datetime import datetime, timedelta
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bank_logic as bl
+from bank_conta import Conta
+from bank_limites import Janela, PoliticaLimites
+
+JANELAS = [Janela("1 minuto", frozenset({"pix"}), 60, max_operacoes=10**9),
+           Janela("1 hora", frozenset({"pix", "sacar"}), 3600, max_valor=10.0**9),
+           Janela("7 dias", frozenset({"pix"}), 7 * 86400, max_valor=10.0**9)]
+
+
+def medir(contas: int, operacoes: int, janelas) -> float:
+    politica = PoliticaLimites(10**9, 10**9, {"sacar": bl.LIMITE_SAQUE}, bl.LIMITE_PIX_NOTURNO,
+                               bl.LIMITES.inicio_noturno, janelas)
+    base = [Conta() for _ in range(contas)]
+    aleatorio = random.Random(0)
+    sorteadas = [base[aleatorio.randrange(contas)] for _ in range(operacoes)]
+    agora = datetime.now(bl.TZ)
+    passo = timedelta(seconds=86400 * 2 / operacoes)  # atravessa duas viradas de dia
+    inicio = time.perf_counter()
+    for conta in sorteadas:
+        if politica.verificar(conta, "pix", 1000, agora) is None:
+            politica.registrar(conta, "pix", 1000, agora)
+        agora += passo
+    return (time.perf_counter() - inicio) / operacoes * 1e9
+
+
+def main(operacoes: int):
+    for contas in (1_000, 100_000, 1_000_000):
+        sem, com = medir(contas, operacoes, ()), medir(contas, operacoes, JANELAS)
+        print(f"{contas:>9,} contas: {sem:,.0f} ns/op só limites diários, {com:,.0f} ns/op com 3 janelas")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,79 @@
+"""
+Pico de logins da manhã: todas as contas têm contadores de ontem e fazem o
+primeiro login do dia. Compara o login atual (que não grava nada) com o
+comportamento anterior, em que o primeiro login do dia zerava os contadores
+e chamava salvar_dados (no modo json, uma reescrita do arquivo inteiro).
+
+Uso: python benchmarks/bench_login.py [contas] [logins] [modo de persistência]
+"""
+from datetime import datetime, timedelta
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bank_logic as bl
+from _comum import gerar_cpf
+
+
+def preparar(contas: int, modo: str):
+    bl.DATA_FILE = os.path.join(tempfile.mkdtemp(), "bank_data.json")
+    bl.MODO_PERSISTENCIA = modo
+    bl.carregar_dados()
+    bl.users = {}
+    cpfs = [gerar_cpf(100_000_000 + numero) for numero in range(contas)]
+    bl.registrar_usuarios_em_lote({"cpf": cpf, "nome": "Cliente", "email": "cliente@epicbank.com",
+                                   "telefone": "11999999999", "senha": "1234"} for cpf in cpfs)
+    ontem = datetime.now(bl.TZ).date() - timedelta(days=1)
+    for cpf in cpfs:
+        conta = bl.users[cpf]
+        conta.numero_transacoes_dia, conta.numero_saques, conta.data_contagem = 7, 2, ontem
+    bl.salvar_dados()
+    return cpfs, ontem
+
+
+def login_anterior(cpf: str, senha: str):
+    """O login como era: zera os contadores num dia novo e grava a conta."""
+    sucesso, mensagem, _ = resultado = bl.login_user(cpf, senha)
+    if sucesso:
+        conta, hoje = bl.users[cpf], datetime.now(bl.TZ).date()
+        if conta.data_contagem != hoje:
+            conta.numero_transacoes_dia, conta.numero_saques, conta.data_contagem = 0, 0, hoje
+            bl.salvar_dados(cpf)
+    return resultado
+
+
+def pico(cpfs, logins: int, login) -> float:
+    inicio = time.perf_counter()
+    for cpf in cpfs[:logins]:
+        login(cpf, "1234")
+    return logins / (time.perf_counter() - inicio)
+
+
+def main(contas: int, logins: int, modo: str):
+    logins = min(logins, contas)
+    cpfs, ontem = preparar(contas, modo)
+    antes = os.path.getmtime(bl.DATA_FILE) if os.path.exists(bl.DATA_FILE) else None
+    atual = pico(cpfs, logins, bl.login_user)
+    gravou = os.path.exists(bl.DATA_FILE) and os.path.getmtime(bl.DATA_FILE) != antes
+    conta = bl.users[cpfs[0]]
+    print(f"Login atual: {atual:,.0f} logins/s; arquivo {'ALTERADO' if gravou else 'intacto'}; "
+          f"contadores lidos como {bl.get_contadores_do_dia(cpfs[0])} (gravados: "
+          f"{conta.numero_transacoes_dia}, {conta.numero_saques} em {conta.data_contagem})")
+    if gravou or conta.data_contagem != ontem:
+        print("FALHA: o login gravou dados!")
+        sys.exit(1)
+
+    # Cada login anterior reescreve o arquivo; mede uma amostra para não demorar demais
+    preparar(contas, modo)
+    anterior = pico(cpfs, min(logins, 50), login_anterior)
+    print(f"Login anterior (grava a virada do dia): {anterior:,.0f} logins/s")
+    print(f"{contas:,} contas, {logins:,} logins ({modo}): {atual / anterior:,.0f}x mais rápido")
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    numeros = [int(arg) for arg in argumentos[:2]]
+    main(*(numeros + [20_000, 500][len(numeros):]), argumentos[2] if len(argumentos) > 2 else "json")
@@ -0,0 +1,39 @@
+"""
+Custo de get_market_prices: o sorteio a cada chamada (como era) contra a
+cotação do tick servida do cache pelo FeedMercado.
+
+Uso: python benchmarks/bench_mercado.py [chamadas]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bank_logic as bl
+
+
+def sortear_a_cada_chamada():
+    """O get_market_prices anterior: novos preços aleatórios em toda chamada."""
+    return {categoria: {ativo: round(dados["price"] * (1 + random.uniform(-dados["volatility"], dados["volatility"])), 2)
+                        for ativo, dados in ativos.items()}
+            for categoria, ativos in bl.SIMULATED_MARKET.items()}
+
+
+def medir(funcao, chamadas: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(chamadas):
+        funcao()
+    return (time.perf_counter() - inicio) / chamadas * 1e9
+
+
+def main(chamadas: int):
+    anterior, atual = medir(sortear_a_cada_chamada, chamadas), medir(bl.get_market_prices, chamadas)
+    distintas = len({bl.get_cotacao().versao for _ in range(1000)})
+    print(f"Sorteio por chamada: {anterior:,.0f} ns; feed em cache: {atual:,.0f} ns ({anterior / atual:.1f}x)")
+    print(f"1000 leituras seguidas viram {distintas} versão(ões) de cotação")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
@@ -0,0 +1,71 @@
+"""
+Compara carga e gravação do snapshot JSON com o snapshot binário.
+
+Uso: python benchmarks/bench_snapshot.py [10000 100000 1000000]
+"""
+from datetime import date
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bank_ledger import DEPOSITO, Lancamento
+from bank_snapshot import SnapshotBinario, gravar_snapshot
+from bank_storage import ArmazenamentoJson, gravar_json
+
+
+def gerar_contas(quantidade: int):
+    aleatorio = random.Random(42)
+    users = {}
+    for numero in range(quantidade):
+        cpf = f"{numero:011d}"
+        users[cpf] = {
+            "senha": f"{aleatorio.randint(0, 9999):04d}", "saldo": round(aleatorio.uniform(0, 10000), 2),
+            "lancamentos": [Lancamento(f"2024-01-{dia:02d} 10:00:00", DEPOSITO, dia * 10.0, dia * (dia + 1) * 5.0)
+                            for dia in range(1, 6)],
+            "numero_saques": aleatorio.randint(0, 3), "numero_transacoes_dia": aleatorio.randint(0, 10),
+            "data_contagem": date(2024, 1, 5), "nome": f"Cliente {numero}", "email": f"cliente{numero}@epicbank.com",
+            "telefone": "11999999999", "data_cadastro": "2024-01-01 09:00:00", "status": "ativo",
+            "portfolio": {"cripto": {"BTC": 0.01}, "acoes": {}},
+        }
+    return users
+
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return time.perf_counter() - inicio, resultado
+
+
+def medir(quantidade: int, diretorio: str):
+    users = gerar_contas(quantidade)
+    caminho_json = os.path.join(diretorio, f"bench_{quantidade}.json")
+    caminho_bin = os.path.join(diretorio, f"bench_{quantidade}.bin")
+    amostra = [f"{numero:011d}" for numero in random.Random(7).sample(range(quantidade), min(1000, quantidade))]
+
+    t_json_gravar, _ = cronometrar(lambda: gravar_json(caminho_json, users, compacto=True))
+    t_json_carregar, _ = cronometrar(lambda: ArmazenamentoJson(caminho_json).carregar())
+    t_bin_gravar, _ = cronometrar(lambda: gravar_snapshot(caminho_bin, users))
+    t_bin_abrir, snapshot = cronometrar(lambda: SnapshotBinario(caminho_bin))
+    t_bin_amostra, _ = cronometrar(lambda: [snapshot.get(cpf) for cpf in amostra])
+    t_bin_tudo, _ = cronometrar(snapshot.para_dict)
+    snapshot.fechar()
+
+    print(f"{quantidade:>9} contas | JSON: grava {t_json_gravar:7.2f}s, carrega {t_json_carregar:7.2f}s "
+          f"({os.path.getsize(caminho_json) / 1e6:7.1f} MB) | binário: grava {t_bin_gravar:7.2f}s, "
+          f"abre {t_bin_abrir * 1000:6.2f}ms, {len(amostra)} contas {t_bin_amostra * 1000:7.2f}ms, "
+          f"decodifica tudo {t_bin_tudo:7.2f}s ({os.path.getsize(caminho_bin) / 1e6:7.1f} MB) | "
+          # Abrir só lê o cabeçalho: a carga comparável inclui decodificar as contas usadas
+          f"carga completa {t_json_carregar / (t_bin_abrir + t_bin_tudo):.2f}x, "
+          f"carga + {len(amostra)} acessos {t_json_carregar / (t_bin_abrir + t_bin_amostra):,.0f}x, "
+          f"gravação {t_json_gravar / t_bin_gravar:.2f}x")
+
+
+if __name__ == "__main__":
+    tamanhos = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    with tempfile.TemporaryDirectory() as diretorio:
+        for quantidade in tamanhos:
+            medir(quantidade, diretorio)
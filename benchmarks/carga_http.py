@@ -0,0 +1,107 @@
+"""
+Cliente de carga para bank_server: cada thread abre uma conexão keep-alive,
+cadastra e loga um usuário e dispara PIX, consultas de saldo e de extrato.
+Informa requisições por segundo e latências p50/p99.
+
+Sem URL, sobe um servidor local numa porta livre com dados temporários.
+
+Uso: python benchmarks/carga_http.py [clientes] [requisições por cliente] [http://host:porta]
+"""
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _comum import gerar_cpf
+
+
+class Cliente:
+    def __init__(self, host: str, porta: int):
+        self.conexao = http.client.HTTPConnection(host, porta, timeout=30)
+        self.token = None
+
+    def chamar(self, metodo: str, rota: str, corpo=None):
+        cabecalhos = {"Content-Type": "application/json"}
+        if self.token:
+            cabecalhos["Authorization"] = f"Bearer {self.token}"
+        dados = json.dumps(corpo).encode('utf-8') if corpo is not None else None
+        self.conexao.request(metodo, rota, body=dados, headers=cabecalhos)
+        resposta = self.conexao.getresponse()
+        return resposta.status, json.loads(resposta.read())
+
+
+def trabalhar(numero: int, clientes: int, requisicoes: int, host: str, porta: int, latencias, erros):
+    cliente = Cliente(host, porta)
+    cpf, destino = gerar_cpf(200_000_000 + numero), gerar_cpf(200_000_000 + (numero + 1) % clientes)
+    cliente.chamar("POST", "/registrar", {"cpf": cpf, "nome": "Carga", "email": "carga@epicbank.com",
+                                          "telefone": "11999999999", "senha": "1234"})
+    _, resposta = cliente.chamar("POST", "/login", {"cpf": cpf, "senha": "1234"})
+    cliente.token = resposta["token"]
+    cliente.chamar("POST", "/depositar", {"valor": 1000})
+    barreira.wait()
+    for i in range(requisicoes):
+        inicio = time.perf_counter()
+        if i % 4 == 0:
+            status, _ = cliente.chamar("POST", "/pix", {"destino": destino, "valor": 1})
+        elif i % 4 == 1:
+            status, _ = cliente.chamar("GET", "/extrato?limite=10")
+        else:
+            status, _ = cliente.chamar("GET", "/saldo")
+        latencias.append(time.perf_counter() - inicio)
+        if status != 200:
+            erros.append(status)
+    cliente.conexao.close()
+
+
+def percentil(valores, p: float) -> float:
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def main(clientes: int, requisicoes: int, url: str = None):
+    global barreira
+    servidor = None
+    if url is None:
+        import bank_logic as bl
+        from bank_server import iniciar
+        bl.DATA_FILE = os.path.join(tempfile.mkdtemp(), "bank_data.json")
+        bl.MODO_PERSISTENCIA = "journal"
+        bl.LIMITES.transacoes_dia = 10**9  # mede o servidor, não o limite diário
+        bl.carregar_dados()
+        bl.users = {}
+        servidor = iniciar(porta=0, workers=max(clientes, 1))
+        host, porta = servidor.server_address
+    else:
+        partes = urlsplit(url)
+        host, porta = partes.hostname, partes.port or 80
+
+    barreira = threading.Barrier(clientes + 1)
+    latencias, erros = [], []
+    threads = [threading.Thread(target=trabalhar, args=(numero, clientes, requisicoes, host, porta, latencias, erros))
+               for numero in range(clientes)]
+    for thread in threads:
+        thread.start()
+    barreira.wait()
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    segundos = time.perf_counter() - inicio
+    if servidor is not None:
+        servidor.shutdown()
+        servidor.server_close()
+
+    latencias.sort()
+    print(f"{clientes} clientes x {requisicoes} requisições: {len(latencias) / segundos:,.0f} req/s, "
+          f"p50 {percentil(latencias, 0.50) * 1000:.2f} ms, p99 {percentil(latencias, 0.99) * 1000:.2f} ms, "
+          f"{len(erros)} erros")
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    main(int(argumentos[0]) if argumentos else 16, int(argumentos[1]) if len(argumentos) > 1 else 500,
+         argumentos[2] if len(argumentos) > 2 else None)
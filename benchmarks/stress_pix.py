@@ -0,0 +1,72 @@
+"""
+Teste de estresse das travas por conta: várias threads fazem PIX, compras e
+vendas cruzados entre poucas contas ao mesmo tempo. No fim o dinheiro total
+tem de ser o inicial mais o resultado líquido das negociações, e o saldo de
+cada conta tem de bater com o seu extrato (bl.reconciliar).
+
+Uso: python benchmarks/stress_pix.py [threads] [operações por thread] [contas]
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bank_logic as bl
+from bank_conta import para_centavos
+from bank_ledger import COMPRA, VENDA
+from _comum import gerar_cpf
+
+
+def trabalhar(semente: int, cpfs, operacoes: int):
+    aleatorio = random.Random(semente)
+    for _ in range(operacoes):
+        origem, destino = aleatorio.sample(cpfs, 2)
+        sorteio = aleatorio.random()
+        if sorteio < 0.8:
+            bl.pix(origem, destino, round(aleatorio.uniform(0.01, 50), 2))
+        elif sorteio < 0.9:
+            bl.comprar_investimento(origem, "acoes", "GEM-B", 0.1)
+        else:
+            bl.vender_investimento(origem, "acoes", "GEM-B", 0.1)
+
+
+def main(threads: int, operacoes: int, contas: int):
+    diretorio = tempfile.mkdtemp()
+    bl.DATA_FILE = os.path.join(diretorio, "bank_data.json")
+    bl.MODO_PERSISTENCIA = "journal"
+    bl.LIMITES.transacoes_dia = 10**9  # o estresse é de concorrência, não do limite diário
+    bl.carregar_dados()
+    bl.users = {}
+    cpfs = [gerar_cpf(100_000_000 + numero) for numero in range(contas)]
+    for cpf in cpfs:
+        bl.registrar_usuario(cpf, "Cliente", "cliente@epicbank.com", "11999999999", "1234", "1234")
+        bl.users[cpf].saldo = 1000.0
+    inicial = sum(bl.users[cpf].saldo_centavos for cpf in cpfs)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for futuro in [executor.submit(trabalhar, semente, cpfs, operacoes) for semente in range(threads)]:
+            futuro.result()
+    segundos = time.perf_counter() - inicio
+
+    final = sum(bl.users[cpf].saldo_centavos for cpf in cpfs)
+    negociado = sum(para_centavos(lancamento.valor) for cpf in cpfs for lancamento in bl.users[cpf].lancamentos
+                    if lancamento.tipo in (COMPRA, VENDA))
+    conciliado, mensagem = bl.reconciliar()
+    print(f"{threads} threads x {operacoes} operações em {contas} contas: {segundos:.2f}s "
+          f"({threads * operacoes / segundos:,.0f} op/s)")
+    print(f"Total inicial R$ {inicial / 100:.2f}, negociações R$ {negociado / 100:.2f}, final R$ {final / 100:.2f}")
+    print(mensagem)
+    if final != inicial + negociado or not conciliado:
+        print("FALHA: dinheiro criado ou perdido!")
+        sys.exit(1)
+    print("OK: dinheiro conservado.")
+
+
+if __name__ == "__main__":
+    argumentos = [int(arg) for arg in sys.argv[1:]]
+    main(*(argumentos + [16, 2000, 20][len(argumentos):]))